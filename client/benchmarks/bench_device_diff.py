@@ -0,0 +1,68 @@
+"""Micro-benchmark of the device diffing performed by the USB detector.
+
+It compares the original list-based diffing (`device not in list`) to the
+set-based diffing implemented by DeviceSnapshot. The benchmark can be run
+from the root directory of the repository:
+
+    python -m client.benchmarks.bench_device_diff
+"""
+import argparse
+import timeit
+
+from client.src.usb_detector import detector
+
+
+def _generate_devices(count: int, offset: int = 0) -> list:
+    """Generates a list of synthetic HID devices.
+
+    :param count: number of devices to be generated
+    :param offset: offset of the serial numbers
+    :return: list of USB devices
+    """
+    return [
+        {
+            "vendor_id": "064F",
+            "product_id": "2AF9",
+            "serial_number": f"{offset + i:08X}"
+        }
+        for i in range(count)
+    ]
+
+
+def _list_based_diff(detected_devices: list, last_connected_devices: list) -> tuple:
+    """Original (quadratic) implementation of the diffing."""
+    connected = [device for device in detected_devices if device not in last_connected_devices]
+    disconnected = [device for device in last_connected_devices if device not in detected_devices]
+    return connected, disconnected
+
+
+def _set_based_diff(detected_devices: list, last_connected_devices: list) -> tuple:
+    """Current (linear) implementation of the diffing."""
+    connected = detector._get_connected_devices(detected_devices, last_connected_devices)
+    disconnected = detector._get_disconnected_devices(detected_devices, last_connected_devices)
+    return connected, disconnected
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Device diffing micro-benchmark")
+    arg_parser.add_argument("-n", "--devices", type=int, default=5000, help="Number of synthetic devices")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of repetitions")
+    args = arg_parser.parse_args()
+
+    # Shift the detected devices a bit, so that there are both
+    # connected and disconnected devices.
+    last_connected_devices = _generate_devices(args.devices)
+    detected_devices = _generate_devices(args.devices, offset=args.devices // 100)
+
+    # Make sure both implementations agree on the result.
+    assert _list_based_diff(detected_devices, last_connected_devices) == \
+           _set_based_diff(detected_devices, last_connected_devices)
+
+    for name, function in (("list-based", _list_based_diff), ("set-based", _set_based_diff)):
+        seconds = min(timeit.repeat(lambda: function(detected_devices, last_connected_devices),
+                                    number=1, repeat=args.repeat))
+        print(f"{name:>10}: {seconds * 1000:10.3f} ms ({args.devices} devices)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of reading the output of the powershell process.
+
+It feeds output recorded from the Get-PnpDevice command through the
+original byte-by-byte reader and through FramedJsonReader. The benchmark
+can be run from the root directory of the repository:
+
+    python -m client.benchmarks.bench_json_reader
+"""
+import argparse
+import io
+import json
+import timeit
+
+from client.src.usb_detector.usb_reader import FramedJsonReader, RECORD_SEPARATOR
+
+# Output of the pnp command as recorded on a workstation (one device).
+RECORDED_DEVICE = b'    {\r\n        "InstanceId":  "USB\\\\VID_064F\\u0026PID_2AF9\\\\7\\u002611EE4411\\u00261\\u00260000"\r\n    }'
+
+
+def _recorded_output(devices: int) -> bytes:
+    """Returns the recorded output of the pnp command repeated for the given number of devices.
+
+    :param devices: number of devices in the output
+    :return: output of the powershell process
+    """
+    return b"[\r\n" + b",\r\n".join([RECORDED_DEVICE] * devices) + b"\r\n]\r\n" + RECORD_SEPARATOR + b"\r\n"
+
+
+def _old_reader(stream) -> list:
+    """Original implementation of UsbReader.read_json_input."""
+    last_char = ''
+    attempt = 0
+    result = b""
+    inside_json_array = False
+
+    while attempt < 1000:
+        last_char = stream.read(1)
+        if b'[' == last_char:
+            inside_json_array = True
+            result += last_char
+            break
+        attempt += 1
+    if inside_json_array:
+        while last_char != b']':
+            last_char = stream.read(1)
+            result += last_char
+        return json.loads(result)
+    return None
+
+
+def _new_reader(stream) -> list:
+    """Current implementation (FramedJsonReader fed by PowerShellWorker)."""
+    return FramedJsonReader(stream).read_document()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Powershell output reader benchmark")
+    arg_parser.add_argument("-n", "--devices", type=int, default=50, help="Number of devices in the output")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=20, help="Number of repetitions")
+    args = arg_parser.parse_args()
+
+    output = _recorded_output(args.devices)
+
+    # Make sure both implementations agree on the result.
+    assert _old_reader(io.BufferedReader(io.BytesIO(output))) == _new_reader(io.BufferedReader(io.BytesIO(output)))
+
+    for name, function in (("old", _old_reader), ("framed", _new_reader)):
+        seconds = min(timeit.repeat(lambda: function(io.BufferedReader(io.BytesIO(output))),
+                                    number=1, repeat=args.repeat))
+        print(f"{name:>6}: {seconds * 1000:10.3f} ms ({len(output)} bytes, {args.devices} devices)")
+
+
+if __name__ == "__main__":
+    main()
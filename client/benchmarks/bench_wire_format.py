@@ -0,0 +1,94 @@
+"""Benchmark of the wire formats of the data sent to the server.
+
+It encodes a single payload and batches of payloads with all combinations
+of the encodings and compressions (see WireFormat) and prints the number
+of bytes on the wire together with the time the server needs to parse
+the body. The parsing mirrors the server: the body is decompressed
+(BodyDecodingMiddleware), and then msgpack is unpacked (MsgpackRoute)
+or JSON is parsed (FastAPI). The msgpack and zstd formats are skipped if the packages
+are not installed. The benchmark can be run from the root directory of the
+repository:
+
+    python -m client.benchmarks.bench_wire_format
+"""
+import argparse
+import gzip
+import json
+import timeit
+
+from client.src.usb_detector.wire_format import WireFormat, ENCODINGS, COMPRESSIONS, ENCODING_MSGPACK, \
+    COMPRESSION_GZIP, COMPRESSION_ZSTD
+
+
+def _payload(index: int) -> dict:
+    """Returns a payload as it is created by the client.
+
+    :param index: index of the payload (makes the payloads differ)
+    :return: payload
+    """
+    return {
+        "username": "jan.novak",
+        "hostname": "WS-PLZ-0042",
+        "timestamp": f"2022-04-07 12:{index // 60 % 60:02d}:{index % 60:02d}",
+        "device": {
+            "vendor_id": "064F",
+            "product_id": "2AF9",
+            "serial_number": f"7&11EE44{index:02X}&1&0000"
+        },
+        "status": "connected" if index % 2 == 0 else "disconnected",
+        "event_id": f"7f1c1e5c-0d43-4d8e-9c1b-{index:012x}"
+    }
+
+
+def _parser(encoding: str, compression: str):
+    """Returns a function parsing the body the same way the server does.
+
+    :param encoding: encoding of the body
+    :param compression: compression of the body
+    :return: function (body -> data)
+    """
+    if compression == COMPRESSION_GZIP:
+        decompress = gzip.decompress
+    elif compression == COMPRESSION_ZSTD:
+        import zstandard
+        decompress = zstandard.ZstdDecompressor().decompress
+    else:
+        def decompress(body):
+            return body
+
+    if encoding == ENCODING_MSGPACK:
+        import msgpack
+        return lambda body: msgpack.unpackb(decompress(body), raw=False)
+    return lambda body: json.loads(decompress(body))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Wire format benchmark")
+    arg_parser.add_argument("-b", "--batch-size", type=int, default=50, help="Number of payloads in a batch")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=20, help="Number of repetitions")
+    args = arg_parser.parse_args()
+
+    baseline = len(json.dumps(_payload(0)).encode("utf-8"))
+    print(f"original json.dumps: {baseline} bytes (single payload)")
+
+    for name, data in (("single", _payload(0)), (f"batch({args.batch_size})", [_payload(index) for index in
+                                                                            range(args.batch_size)])):
+        for encoding in ENCODINGS:
+            for compression in COMPRESSIONS:
+                try:
+                    wire_format = WireFormat(encoding, compression)
+                    parse = _parser(encoding, compression)
+                except ImportError as error:
+                    print(f"{name:>10} {encoding:>8} {compression:>5}: skipped ({error})")
+                    continue
+
+                body = wire_format.encode(data)
+                assert parse(body) == data
+                number = 1000
+                seconds = min(timeit.repeat(lambda: parse(body), number=number, repeat=args.repeat)) / number
+                print(f"{name:>10} {encoding:>8} {compression:>5}: {len(body):7d} bytes, "
+                      f"parse {seconds * 1000000:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
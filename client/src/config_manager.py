@@ -39,14 +39,41 @@ class Config:
         # Parse the 'cache' section.
         self._parse_cache_section()
 
+        # Parse the 'runtime' section.
+        self._parse_runtime_section()
+
+        # Parse the 'metrics' section.
+        self._parse_metrics_section()
+
     def _parse_usb_detector_section(self):
         """Parse the 'usb detector' section of the configuration file.
         """
         section_name = "usb_detector"
         self.scan_period_seconds = float(self.config[section_name]["scan_period_seconds"])
+        self.max_scan_period_seconds = float(self.config[section_name].get("max_scan_period_seconds",
+                                                                           str(self.scan_period_seconds)))
+        self.scan_backoff_factor = float(self.config[section_name].get("scan_backoff_factor", "2"))
         strings = self.config[section_name]["pnp_device_instance_id_suffix"]
         self.pnp_device_id_suffixes = json.loads(strings)
+        self.pnp_prefilter = self.config[section_name].get("pnp_prefilter", "true").strip().lower() in \
+            ("true", "yes", "1", "on")
         self.connected_devices_filename = self.config[section_name]["connected_devices_filename"]
+        self.state_compaction_threshold = int(self.config[section_name].get("state_compaction_threshold", "100"))
+        self.debounce_hold_seconds = float(self.config[section_name].get("debounce_hold_seconds", "0"))
+        self.listener_queue_size = int(self.config[section_name].get("listener_queue_size", "0"))
+        self.listener_overflow_policy = self.config[section_name].get("listener_overflow_policy", "spill")
+        self.usb_reader = self.config[section_name].get("reader", "powershell")
+        self.powershell_timeout_seconds = float(self.config[section_name].get("powershell_timeout_seconds", "30"))
+        self.powershell_ping_timeout_seconds = float(self.config[section_name].get("powershell_ping_timeout_seconds",
+                                                                                   "5"))
+        self.powershell_ping_idle_seconds = float(self.config[section_name].get("powershell_ping_idle_seconds", "60"))
+        self.powershell_restart_backoff_seconds = float(
+            self.config[section_name].get("powershell_restart_backoff_seconds", "1"))
+        self.powershell_max_restart_backoff_seconds = float(
+            self.config[section_name].get("powershell_max_restart_backoff_seconds", "60"))
+        self.scan_mode = self.config[section_name].get("scan_mode", "poll")
+        self.safety_scan_period_seconds = float(self.config[section_name].get("safety_scan_period_seconds", "300"))
+        self.metadata_refresh_seconds = float(self.config[section_name].get("metadata_refresh_seconds", "300"))
 
     def _parse_server_section(self):
         """Parse the 'server' section of the configuration file.
@@ -55,6 +82,14 @@ class Config:
         self.server_url = self.config[section_name]["url"]
         self.server_port = self.config[section_name]["port"]
         self.server_endpoint = self.config[section_name]["end_point"]
+        self.server_connect_timeout_seconds = float(self.config[section_name].get("connect_timeout_seconds", "3.05"))
+        self.server_read_timeout_seconds = float(self.config[section_name].get("read_timeout_seconds", "10"))
+        self.server_pool_size = int(self.config[section_name].get("pool_size", "4"))
+        self.server_batch_endpoint = self.config[section_name].get("batch_end_point", "/api/v1/usb-logs/batch")
+        self.batch_max_size = int(self.config[section_name].get("batch_max_size", "1"))
+        self.batch_window_seconds = float(self.config[section_name].get("batch_window_seconds", "1"))
+        self.server_encoding = self.config[section_name].get("encoding", "json")
+        self.server_compression = self.config[section_name].get("compression", "none")
 
     def _parse_logger_section(self):
         """Parse the 'logger' section of the configuration file.
@@ -70,3 +105,24 @@ class Config:
         self.cache_max_entries = int(self.config[section_name]["max_entries"])
         self.cache_max_retries = int(self.config[section_name]["max_retries"])
         self.cache_retry_period_seconds = float(self.config[section_name]["retry_period_seconds"])
+        self.cache_max_backoff_seconds = float(self.config[section_name].get("max_backoff_seconds", "600"))
+        self.cache_max_in_flight = int(self.config[section_name].get("max_in_flight", "1"))
+
+    def _parse_runtime_section(self):
+        """Parse the 'runtime' section of the configuration file (optional).
+        """
+        section_name = "runtime"
+        section = self.config[section_name] if self.config.has_section(section_name) else {}
+        self.runtime = section.get("mode", "threads")
+        self.runtime_queue_size = int(section.get("queue_size", "100"))
+        self.runtime_shutdown_timeout_seconds = float(section.get("shutdown_timeout_seconds", "5"))
+
+    def _parse_metrics_section(self):
+        """Parse the 'metrics' section of the configuration file (optional).
+        """
+        section_name = "metrics"
+        section = self.config[section_name] if self.config.has_section(section_name) else {}
+        self.metrics_http_port = int(section.get("http_port", "0"))
+        self.metrics_snapshot_file = section.get("snapshot_file", "")
+        self.metrics_snapshot_period_seconds = float(section.get("snapshot_period_seconds", "60"))
+        self.metrics_piggyback = section.get("piggyback", "false").strip().lower() in ("true", "yes", "1", "on")
@@ -7,10 +7,12 @@ from tendo import singleton
 from sys import exit
 
 from config_manager import Config
-from usb_detector.usb_reader import UsbReader
+from usb_detector.usb_reader import create_usb_reader
 from usb_detector.detector import register_listener, usb_detector_run, usb_detector_set_config
-from usb_detector.event_listener import usb_connected_callback, usb_disconnected_callback
+from usb_detector.event_listener import usb_connected_callback, usb_disconnected_callback, event_listener_set_config
 from usb_detector.api_client import api_client_run, api_client_set_config
+from usb_detector.async_runtime import async_runtime_run
+from usb_detector.metrics import metrics_set_config
 
 
 def init_logging(app_config: Config):
@@ -18,8 +20,9 @@ def init_logging(app_config: Config):
 
     The function checks whether the path to the logger configuration
     file is valid or not. The path is defined in the logger section of the
-    main configuration file. It also calls api_client_set_config and
-    usb_detector_set_config to fully initialize the application.
+    main configuration file. It also calls api_client_set_config,
+    usb_detector_set_config, event_listener_set_config, and
+    metrics_set_config to fully initialize the application.
 
     :param app_config: instance of Config (config manager)
     """
@@ -30,7 +33,9 @@ def init_logging(app_config: Config):
 
         # Initialize the rest of the application.
         api_client_set_config(app_config)
-        usb_detector_set_config(app_config, usbReader=UsbReader(app_config))
+        usb_detector_set_config(app_config, usbReader=create_usb_reader(app_config))
+        event_listener_set_config(app_config)
+        metrics_set_config(app_config)
     else:
         # If the file does not exist, terminate the application.
         print(f"Cannot find logger configuration \"{app_config.logger_config_file}\"! Please specify valid a path or define a new one.")
@@ -63,6 +68,12 @@ if __name__ == "__main__":
     register_listener(callback=usb_connected_callback, connected=True)
     register_listener(callback=usb_disconnected_callback, connected=False)
 
+    # Run the application on a single event loop if the asyncio runtime is selected.
+    if config.runtime == "asyncio":
+        logging.info("Starting USB detector and API communication manager (asyncio runtime).")
+        async_runtime_run(config)
+        exit(0)
+
     # Create a thread for the USB detector.
     usb_detector_thread = Thread(target=usb_detector_run)
     usb_detector_thread.setDaemon(True)
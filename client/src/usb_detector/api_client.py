@@ -1,15 +1,53 @@
-import json
 import requests
 import logging
-from time import sleep
-from diskcache import Deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter, sleep
 from requests import HTTPError, ConnectionError
-from requests.exceptions import InvalidSchema
+from requests.adapters import HTTPAdapter
+from requests.exceptions import InvalidSchema, Timeout
 
+from . import metrics
+from .backoff import ExponentialBackoff, parse_retry_after
+from .batch_sender import BatchSender
+from .outbox import Outbox
+from .wire_format import WireFormat
 
-_uri = None     # server uri (url, port, and endpoint)
-_cache = None   # cache (failed payloads)
-_config = None  # instance of Config
+# default (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# default maximum number of connections kept alive in the connection pool
+DEFAULT_POOL_SIZE = 4
+
+# client errors (4xx) meaning that the payload itself is invalid, so sending it again would not help
+# (other client errors, e.g. 404 or 415 of an older server, do not say anything about the payload)
+REJECTED_STATUS_CODES = {400, 422}
+
+# status codes whose Retry-After header is honoured
+RETRY_AFTER_STATUS_CODES = {429, 503}
+
+# results of sending data to the server
+SENT = "sent"           # the server accepted the data
+FAILED = "failed"       # the data could not be delivered, it should be sent again later
+REJECTED = "rejected"   # the server refused the data, sending it again would not help
+
+_uri = None                 # server uri (url, port, and endpoint)
+_batch_uri = None           # server uri of the batch endpoint
+_batch_sender = None        # instance of BatchSender (None if payloads are sent one by one)
+_cache = None               # cache (outbox of the failed payloads)
+_config = None              # instance of Config
+_session = None             # HTTP session (connection pool)
+_timeout = DEFAULT_TIMEOUT  # (connect, read) timeout of the requests
+_executor = None            # thread pool sending cached payloads concurrently (None if sent one by one)
+_wire_format = WireFormat() # encoding (and compression) of the data sent to the server
+_payload_sink = None        # function taking the payloads over (asyncio runtime), None if they are sent right away
+_retry_after = None         # number of seconds the server asked the client to wait (Retry-After)
+_retry_after_lock = Lock()  # lock guarding _retry_after (set from multiple threads)
+
+# metrics of the cache (see the metrics module)
+metrics.callback("cache_depth", "Number of payloads in the cache", lambda: len(_cache) if _cache is not None else None)
+metrics.callback("cache_evictions_total", "Number of payloads discarded because the cache was full",
+                 lambda: _cache.evictions if _cache is not None else None, kind="counter")
 
 
 def api_client_set_config(config):
@@ -18,20 +56,34 @@ def api_client_set_config(config):
     This function is meant to be called prior to calling any other function
     of the API module. It stores the instance of Config (config manager)
     into a private variable. It also initializes the cache for unsuccessful
-    payloads and constructs a URI (endpoint on the server side).
+    payloads, the HTTP session, and constructs a URI (endpoint on the server side).
 
     :param config: instance of Config which holds all values defined
                    in the configuration file.
     """
     # Store the variables globally within the module (file).
-    global _config, _cache, _uri
+    global _config, _cache, _uri, _batch_uri, _batch_sender, _session, _timeout, _executor, _wire_format
 
     # Store the instance of Config and initialize the cache.
     _config = config
     _cache = _init_cache()
 
+    # Initialize the HTTP session (persistent connections to the server).
+    _session = _init_session(config.server_pool_size)
+    _timeout = (config.server_connect_timeout_seconds, config.server_read_timeout_seconds)
+    _wire_format = WireFormat(config.server_encoding, config.server_compression)
+
+    # Initialize the thread pool used to empty the cache with multiple requests in flight.
+    if config.cache_max_in_flight > 1:
+        _executor = ThreadPoolExecutor(max_workers=config.cache_max_in_flight, thread_name_prefix="cache")
+
     # Creates the URI which is made of the server url, port, and path (endpoint).
     _uri = config.server_url + ":" + config.server_port + config.server_endpoint
+    _batch_uri = config.server_url + ":" + config.server_port + config.server_batch_endpoint
+
+    # Group the payloads into batches if it is enabled.
+    if config.batch_max_size > 1:
+        _batch_sender = BatchSender(config.batch_max_size, config.batch_window_seconds, send_batch)
 
 
 def _init_cache():
@@ -42,38 +94,209 @@ def _init_cache():
     them to the server. All parameters can be seen in the
     configuration file.
 
-    :return: instance of a new cache (Deque - FIFO)
+    :return: instance of a new cache (Outbox - FIFO)
     """
-    return Deque(directory=_config.cache_dir)
+    return Outbox(_config.cache_dir, _config.cache_max_entries)
+
 
+def _init_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Initializes and returns an HTTP session.
+
+    The session keeps the connections to the server alive (connection pool),
+    so a new TCP connection does not have to be established with every payload.
+
+    :param pool_size: maximum number of connections kept alive in the pool
+    :return: instance of a new HTTP session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
 
-def send_data(payload: dict):
+
+def _get_session() -> requests.Session:
+    """Returns the HTTP session (it is created if it does not exist yet).
+
+    :return: instance of the HTTP session
+    """
+    global _session
+    if _session is None:
+        _session = _init_session()
+    return _session
+
+
+def _post(uri: str, data, description: str) -> str:
+    """Posts data (JSON) to the server.
+
+    The duration and the result of the request are recorded (see the metrics module).
+
+    :param uri: server uri the data is sent to
+    :param data: data (payload or list of payloads) to be sent
+    :param description: description of the data used in the logs
+    :return: result of the request (SENT, FAILED, or REJECTED)
+    """
+    start = perf_counter()
+    result = _post_request(uri, data, description)
+    metrics.record_send(perf_counter() - start, result)
+    return result
+
+
+def _post_request(uri: str, data, description: str) -> str:
+    """Posts data to the server and classifies the response.
+
+    :param uri: server uri the data is sent to
+    :param data: data (payload or list of payloads) to be sent
+    :param description: description of the data used in the logs
+    :return: result of the request (SENT, FAILED, or REJECTED)
+    """
+    try:
+        logging.info(f"sending {description} to {uri}")
+        response = _get_session().post(url=uri, data=_wire_format.encode(data), headers=_wire_format.headers,
+                                       timeout=_timeout)
+        response.raise_for_status()
+        logging.info(f"response text: {response.text}")
+        return SENT
+    except (ConnectionError, Timeout, InvalidSchema):
+        logging.warning(f"sending {description} to {uri} failed")
+        return FAILED
+    except HTTPError as error:
+        if error.response is None:
+            return _http_error_result(uri, None, None, description, error)
+        return _http_error_result(uri, error.response.status_code, error.response.headers.get("Retry-After"),
+                                  description, error)
+
+
+def _http_error_result(uri: str, status_code, retry_after, description: str, error) -> str:
+    """Returns the result of a request the server answered with an error status code.
+
+    Only REJECTED_STATUS_CODES mean that the data was refused and sending it again
+    would not help. Other errors (e.g. an older server without the endpoint or
+    the content encoding) are treated as failures, so the data stays cached.
+    The delay requested by the server (Retry-After) is recorded.
+
+    :param uri: server uri the data was sent to
+    :param status_code: HTTP status code of the response (None if unknown)
+    :param retry_after: value of the Retry-After header (None if not present)
+    :param description: description of the data used in the logs
+    :param error: error (or status) reported in the logs
+    :return: result of the request (FAILED or REJECTED)
+    """
+    if status_code in RETRY_AFTER_STATUS_CODES:
+        _record_retry_after(retry_after)
+    if status_code in REJECTED_STATUS_CODES:
+        logging.error(f"HTTP Error ({uri}) {description} rejected by the server - discarding, {error}")
+        return REJECTED
+    logging.error(f"HTTP Error ({uri}) {description}, {error}")
+    return FAILED
+
+
+def _record_retry_after(value: str):
+    """Records the delay requested by the server (Retry-After header).
+
+    If multiple requests are rejected, the longest delay is kept.
+
+    :param value: value of the Retry-After header
+    """
+    global _retry_after
+    seconds = parse_retry_after(value)
+    if seconds is None:
+        return
+    with _retry_after_lock:
+        _retry_after = seconds if _retry_after is None else max(_retry_after, seconds)
+
+
+def _take_retry_after():
+    """Returns and clears the delay requested by the server.
+
+    :return: number of seconds to wait or None if the server did not ask for any delay
+    """
+    global _retry_after
+    with _retry_after_lock:
+        seconds, _retry_after = _retry_after, None
+    return seconds
+
+
+def send_data(payload: dict) -> bool:
     """Sends a payload off to the server.
 
     This function is called whenever a USB is connected
     or disconnected. If there is no internet connection or the
     server is not up and running, the payload will be stored
-    into the disk cache.
+    into the disk cache. If the server rejects the payload as invalid (400 or 422),
+    the payload is discarded as sending it again would not help.
+    If batches are enabled, the payload is added into the current batch
+    (see send_batch). In the asyncio runtime, the payload is handed over
+    to the runtime which sends it asynchronously.
 
     :param payload: payload to be sent to the server
+    :return: True if the payload was delivered (or rejected by the server), False otherwise
+    """
+    # In the asyncio runtime, the payloads are sent by its tasks.
+    if _payload_sink is not None:
+        _payload_sink(payload)
+        return True
+
+    if _batch_sender is not None:
+        _batch_sender.add(payload)
+        return True
+
+    if _send_payload(payload) == FAILED:
+        _cache_failed_payload(payload)
+        return False
+    return True
+
+
+def send_batch(payloads: list) -> bool:
+    """Sends a batch of payloads off to the server in a single request.
+
+    The payloads that cannot be delivered are stored into the disk cache.
+
+    :param payloads: list of the payloads to be sent to the server
+    :return: True if all payloads were delivered (or rejected by the server), False otherwise
+    """
+    delivered = True
+    for payload, result in zip(payloads, _send_batch_payloads(payloads)):
+        if result == FAILED:
+            _cache_failed_payload(payload)
+            delivered = False
+    return delivered
+
+
+def _send_payload(payload: dict) -> str:
+    """Posts a single payload to the server.
+
+    :param payload: payload to be sent to the server
+    :return: result of the request (SENT, FAILED, or REJECTED)
     """
     # Make sure that the URI has been constructed properly.
     # It is supposed to be done by calling the api_client_set_config function
     # with appropriate parameters.
     if _uri is None:
         logging.warning(f"sending payload = {payload} failed because uri is set to None")
-        _cache_failed_payload(payload)
-        return
-    try:
-        logging.info(f"sending payload = {payload} to {_uri}")
-        response = requests.post(url=_uri, data=json.dumps(payload))
-        logging.info(f"response text: {response.text}")
-    except (ConnectionError, InvalidSchema):
-        logging.warning(f"sending payload = {payload} to {_uri} failed")
-        _cache_failed_payload(payload)
-    except HTTPError as error:
-        logging.error(f"HTTP Error ({_uri}) payload = {payload}, {error}")
-        _cache_failed_payload(payload)
+        return FAILED
+    return _post(_uri, payload, f"payload = {payload}")
+
+
+def _send_batch_payloads(payloads: list) -> list:
+    """Posts a batch of payloads to the server (batch endpoint).
+
+    A single invalid payload makes the server reject the whole batch, so the payloads
+    of a rejected batch are sent once more one by one and only those rejected
+    on their own are discarded.
+
+    :param payloads: list of the payloads to be sent to the server
+    :return: list of the results (SENT, FAILED, or REJECTED), one per payload
+    """
+    if _batch_uri is None:
+        logging.warning(f"sending {len(payloads)} payloads failed because uri is set to None")
+        return [FAILED] * len(payloads)
+    result = _post(_batch_uri, payloads, f"batch of {len(payloads)} payloads")
+    if result == REJECTED and len(payloads) > 1:
+        logging.warning(f"batch of {len(payloads)} payloads rejected by the server - sending them one by one")
+        return [_send_payload(payload) for payload in payloads]
+    return [result] * len(payloads)
 
 
 def _cache_failed_payload(payload: dict):
@@ -82,51 +305,134 @@ def _cache_failed_payload(payload: dict):
     This function is called when the application fails to send a payload
     to the server. The payload gets stored into a file-based cache from which
     it will be periodically retrieved as the client will attempt to send
-    it to the server again. All parameters regarding the cache can be found
+    it to the server again. If the cache is "full", the oldest payload
+    is discarded. All parameters regarding the cache can be found
     in the configuration file.
 
     :param payload: payload to be cached
     """
-    # If the cache is "full", discard the oldest record.
-    if len(_cache) >= _config.cache_max_entries:
-        oldest_payload = _cache.pop()
-        logging.warning(f"cache is full - discarding payload = {oldest_payload}")
-
-    # Store the payload into the cache.
     logging.info(f"adding payload = {payload} into cache")
-    _cache.append(payload)
+    _cache.put(payload)
 
 
-def _resend_cached_payloads():
+def _resend_cached_payloads() -> bool:
     """Reattempts to send cached payloads to the server (API).
 
     In the configuration file, there is a predefined number of
-    payloads that can be sent to the server with each call of this function.
-    This function is called periodically from api_client_run in order
-    to resend failed payloads to the server.
+    requests that can be sent to the server with each call of this function.
+    If batches are enabled, each request carries up to a batch of payloads.
+    This function is called from api_client_run in order to resend
+    failed payloads to the server.
+
+    The payloads are only read from the cache (peek). They are removed
+    from it once the server has confirmed their delivery (ack), so no payload
+    gets lost if the application crashes in the middle of sending them.
+
+    :return: True if all payloads were delivered, False otherwise
+    """
+    return _send_all(_cached_groups(_batch_sender.max_size if _batch_sender is not None else 1))
+
+
+def _cached_groups(size: int) -> list:
+    """Reads (peeks) the cached entries that are to be resent within one period.
+
+    :param size: number of entries sent in a single request (batch size)
+    :return: list of the groups (lists) of cached entries, one per request
+    """
+    entries = _cache.peek(_config.cache_max_retries * size)
+    logging.info(f"emptying the cache ({len(entries)} records)")
+    return [entries[index:index + size] for index in range(0, len(entries), size)]
+
+
+def _resend_entries(entries: list) -> bool:
+    """Sends cached entries to the server in a single request and acknowledges them.
+
+    Delivered (or rejected) entries are removed from the cache. Entries
+    that could not be delivered stay where they are and their number
+    of attempts is incremented.
+
+    :param entries: list of OutboxEntry
+    :return: True if the entries were delivered (or rejected by the server), False otherwise
+    """
+    if _batch_sender is not None:
+        results = _send_batch_payloads([entry.payload for entry in entries])
+    else:
+        results = [_send_payload(entries[0].payload)]
+    return _acknowledge(entries, results)
+
+
+def _acknowledge(entries: list, results: list) -> bool:
+    """Acknowledges cached entries according to the results of sending them.
 
+    :param entries: list of OutboxEntry
+    :param results: list of the results (SENT, FAILED, or REJECTED), one per entry
+    :return: True if all entries were delivered (or rejected by the server), False otherwise
     """
-    # Calculate how many payload will be sent to the server
-    retries = min(_config.cache_max_retries, len(_cache))
-    logging.info(f"emptying the cache ({retries} records)")
+    delivered = True
+    for entry, result in zip(entries, results):
+        if result == FAILED:
+            _cache.nack(entry)
+            delivered = False
+        else:
+            _cache.ack(entry)
+    return delivered
 
-    # Send the payloads to the server one by one.
-    for _ in range(0, retries):
-        payload = _cache.pop()
-        send_data(payload)
+
+def _send_all(groups: list) -> bool:
+    """Sends all groups of cached entries to the server (one request per group).
+
+    If the thread pool is enabled, the groups are sent with up to the predefined number
+    of requests in flight. Otherwise, they are sent one by one and the first failure
+    stops the rest of them from being sent (they stay in the cache).
+
+    :param groups: list of the groups (lists) of cached entries
+    :return: True if all groups were delivered, False otherwise
+    """
+    if _executor is not None:
+        return all(list(_executor.map(_resend_entries, groups)))
+
+    for group in groups:
+        if not _resend_entries(group):
+            return False
+    return True
+
+
+def _resend_step(backoff: ExponentialBackoff) -> float:
+    """Reattempts to send cached payloads and returns the delay before the next attempt.
+
+    If the payloads were delivered and there are more of them in the cache,
+    the next attempt is made right away (the server is up and running). If the
+    delivery failed, the delay grows exponentially (and it is never shorter
+    than the delay requested by the server). Random jitter is applied to all
+    delays so that the clients do not retry in lockstep.
+
+    :param backoff: instance of ExponentialBackoff
+    :return: number of seconds to wait before the next attempt
+    """
+    if not _resend_cached_payloads():
+        delay = backoff.failure(_take_retry_after())
+        logging.info(f"resending cached payloads failed ({backoff.failures}x), next attempt in {delay:.1f}s")
+        return delay
+
+    backoff.success()
+    if len(_cache) > 0:
+        return 0
+    return backoff.idle_delay()
 
 
 def api_client_run():
     """ Keeps resending failed payloads to the server.
 
-    This function is instantiated as a thread that periodically
-    calls the _resend_cached_payloads function in order to empty
-    the cache (failed payloads). The period can be set in the
-    configuration file.
+    This function is instantiated as a thread that keeps calling the
+    _resend_cached_payloads function in order to empty the cache
+    (failed payloads). The base period and the maximum delay
+    can be set in the configuration file.
     """
+    backoff = ExponentialBackoff(_config.cache_retry_period_seconds, _config.cache_max_backoff_seconds)
     while True:
         # Resend a predefined amount of failed payloads to the server.
-        _resend_cached_payloads()
+        delay = _resend_step(backoff)
 
-        # Sleep for a predefined amount of seconds.
-        sleep(_config.cache_retry_period_seconds)
+        # Sleep until the next attempt.
+        if delay > 0:
+            sleep(delay)
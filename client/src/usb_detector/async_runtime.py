@@ -0,0 +1,459 @@
+import asyncio
+import logging
+import signal
+from time import perf_counter, time
+
+from . import api_client, detector, metrics
+from .api_client import FAILED, REJECTED, SENT
+from .backoff import ExponentialBackoff
+from .dispatcher import call_with_event_time
+from .hotplug import create_hotplug_monitor
+
+
+class AsyncRuntime:
+    """This class runs the whole application on a single asyncio event loop.
+
+    The work is split into cooperating tasks joined by bounded queues:
+
+    scan     - scans the connected USB devices (on a worker thread as the readers
+               and the state store block) and puts the events into the event queue
+    dispatch - calls the listeners with the events; the payloads they create
+               are put into the payload queue
+    send     - sends the payloads (in batches if enabled) to the server through
+               an asynchronous HTTP client (aiohttp); the failed ones are cached
+    drain    - resends the cached payloads with an exponential backoff
+
+    Everything else touching the disk (the cache of the payloads) runs on
+    worker threads too, so the event loop never blocks.
+
+    A full queue makes the producer wait (backpressure). The tasks wake up
+    as soon as there is something to do: a hotplug notification wakes up
+    the scan and a payload delivered after a failure wakes up the drain.
+    When the runtime is stopped, the scanning is cancelled, the pending
+    events are dispatched and sent (within the shutdown timeout), and whatever
+    has not been delivered by then is cached, so no event gets lost.
+    """
+
+    def __init__(self, config):
+        """Constructor of the class.
+
+        :param config: instance of Config (config manager)
+        """
+        self._config = config
+        self._events = asyncio.Queue(maxsize=config.runtime_queue_size)
+        self._payloads = asyncio.Queue(maxsize=config.runtime_queue_size)
+
+        # events and payloads produced by synchronous code (the detector and the listeners)
+        # waiting to be put into the queues
+        self._pending_events = []
+        self._pending_payloads = []
+
+        self._stop = asyncio.Event()
+        self._hotplug = asyncio.Event()
+        self._payload_added = asyncio.Event()
+        self._drain_wakeup = asyncio.Event()
+        self._stopping = False
+        self._hotplug_monitor = None
+        self._session = None
+        self._scan_future = None
+        self._in_flight = asyncio.Semaphore(max(1, config.cache_max_in_flight))
+
+    def stop(self):
+        """Asks the runtime to shut down gracefully (it must be called from the event loop)."""
+        self._stop.set()
+
+    def dispatch(self, callback, device):
+        """Takes an event over from the detector (see ListenerDispatcher.dispatch).
+
+        It is called from the thread running the scan, the events are put
+        into the queue by the scan task once the scan has finished. The time
+        of the event is recorded, so that the listener can tell when the event
+        happened (see dispatcher.event_time).
+
+        :param callback: listener (function) that is supposed to be called
+        :param device: USB device the listener is called with
+        """
+        self._pending_events.append((callback, device, time()))
+
+    def take_payload(self, payload: dict):
+        """Takes a payload over from the listeners (see api_client.send_data).
+
+        :param payload: payload to be sent to the server
+        """
+        self._pending_payloads.append(payload)
+
+    async def run(self):
+        """Runs all tasks until the runtime is stopped (or cancelled)."""
+        import aiohttp
+
+        detector._init_detector()
+        detector._dispatcher = self
+        api_client._payload_sink = self.take_payload
+
+        timeout = aiohttp.ClientTimeout(sock_connect=self._config.server_connect_timeout_seconds,
+                                        sock_read=self._config.server_read_timeout_seconds)
+        self._session = aiohttp.ClientSession(timeout=timeout,
+                                              connector=aiohttp.TCPConnector(limit=self._config.server_pool_size))
+        self._open_hotplug_monitor()
+
+        scan_task = asyncio.create_task(self._scan_loop(), name="scan")
+        drain_task = asyncio.create_task(self._drain_loop(), name="drain")
+        workers = [asyncio.create_task(self._dispatch_loop(), name="dispatch")] + \
+                  [asyncio.create_task(self._send_loop(), name=f"send-{index}")
+                   for index in range(max(1, self._config.cache_max_in_flight))]
+        logging.info(f"asyncio runtime is now running (scan mode: {self._config.scan_mode})")
+
+        try:
+            await self._stop.wait()
+        finally:
+            await self._shutdown(scan_task, drain_task, workers)
+
+    async def _shutdown(self, scan_task, drain_task, workers):
+        """Stops the tasks and flushes the pending events.
+
+        :param scan_task: task scanning the USB devices
+        :param drain_task: task emptying the cache
+        :param workers: tasks dispatching the events and sending the payloads
+        """
+        logging.info("asyncio runtime is shutting down")
+        await _cancel([scan_task, drain_task])
+
+        # A scan still running on a worker thread is waited for, so that its events do not get lost.
+        if self._scan_future is not None and not self._scan_future.done():
+            await asyncio.wait([self._scan_future], timeout=self._config.runtime_shutdown_timeout_seconds)
+
+        # Events held back by the debouncer are dispatched right away.
+        self._stopping = True
+        self._payload_added.set()
+        detector._dispatch_debounced_events(flush=True)
+
+        try:
+            await asyncio.wait_for(self._flush(), self._config.runtime_shutdown_timeout_seconds)
+        except asyncio.TimeoutError:
+            logging.warning("pending events could not be sent in time - caching them")
+        await _cancel(workers)
+
+        # Nothing that has not been delivered gets lost, it is cached.
+        while not self._events.empty():
+            self._pending_events.append(self._events.get_nowait())
+        for callback, device, occurred_at in self._take(self._pending_events):
+            _call_listener(callback, device, occurred_at)
+        while not self._payloads.empty():
+            self._pending_payloads.append(self._payloads.get_nowait())
+        await self._cache(self._take(self._pending_payloads))
+
+        api_client._payload_sink = None
+        detector._dispatcher = None
+        self._close_hotplug_monitor()
+        await self._session.close()
+        logging.info("asyncio runtime has shut down")
+
+    async def _flush(self):
+        """Waits until all pending events have been dispatched and sent."""
+        await self._put_pending_events()
+        await self._events.join()
+        await self._payloads.join()
+
+    async def _scan_loop(self):
+        """Keeps scanning the USB devices (task)."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # The scan is shielded, so that it is not abandoned half-way when the task is cancelled.
+            self._scan_future = loop.run_in_executor(None, detector._scan)
+            await asyncio.shield(self._scan_future)
+            await self._put_pending_events()
+
+            await self._wait_for_next_scan()
+
+    async def _wait_for_next_scan(self):
+        """Waits until the USB devices are supposed to be scanned again (see detector._wait_for_next_scan)."""
+        if self._hotplug_monitor is None:
+            await asyncio.sleep(detector._with_debounce_deadline(detector._scheduler.seconds_until_next_scan()))
+            return
+
+        if self._config.scan_mode == "event":
+            timeout = self._config.safety_scan_period_seconds
+        else:
+            timeout = detector._scheduler.seconds_until_next_scan()
+        await _wait(self._hotplug, detector._with_debounce_deadline(timeout))
+        self._hotplug.clear()
+
+    async def _dispatch_loop(self):
+        """Keeps calling the listeners with the events (task)."""
+        while True:
+            callback, device, occurred_at = await self._events.get()
+            try:
+                _call_listener(callback, device, occurred_at)
+                await self._put_pending_payloads()
+            finally:
+                self._events.task_done()
+
+    async def _send_loop(self):
+        """Keeps sending the payloads to the server (task)."""
+        while True:
+            payloads = await self._next_batch()
+            try:
+                results = await self._send(payloads)
+            except asyncio.CancelledError:
+                await self._cache(payloads)
+                raise
+            finally:
+                for _ in payloads:
+                    self._payloads.task_done()
+
+            failed = [payload for payload, result in zip(payloads, results) if result == FAILED]
+            await self._cache(failed)
+            if not failed and len(api_client._cache) > 0:
+                # The server is reachable again, so the cache is emptied right away.
+                self._drain_wakeup.set()
+
+    async def _next_batch(self) -> list:
+        """Takes the next batch of payloads from the queue.
+
+        The batch is complete once it reaches the maximum size or when
+        the time window opened by its first payload elapses.
+
+        :return: list of the payloads
+        """
+        payloads = [await self._payloads.get()]
+        if self._config.batch_max_size <= 1:
+            return payloads
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._config.batch_window_seconds
+        try:
+            while len(payloads) < self._config.batch_max_size:
+                if not self._payloads.empty():
+                    payloads.append(self._payloads.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0 or self._stopping:
+                    break
+                self._payload_added.clear()
+                await _wait(self._payload_added, remaining)
+        except asyncio.CancelledError:
+            for _ in payloads:
+                self._payloads.task_done()
+            await self._cache(payloads)
+            raise
+        return payloads
+
+    async def _drain_loop(self):
+        """Keeps resending the cached payloads to the server (task)."""
+        backoff = ExponentialBackoff(self._config.cache_retry_period_seconds, self._config.cache_max_backoff_seconds)
+        while True:
+            delay = await self._drain_step(backoff)
+            if delay > 0:
+                self._drain_wakeup.clear()
+                await _wait(self._drain_wakeup, delay)
+
+    async def _drain_step(self, backoff: ExponentialBackoff) -> float:
+        """Resends cached payloads and returns the delay before the next attempt (see api_client._resend_step).
+
+        :param backoff: instance of ExponentialBackoff
+        :return: number of seconds to wait before the next attempt
+        """
+        size = self._config.batch_max_size if self._config.batch_max_size > 1 else 1
+        groups = await asyncio.get_running_loop().run_in_executor(None, api_client._cached_groups, size)
+        results = await asyncio.gather(*(self._resend(entries) for entries in groups))
+        if not all(results):
+            delay = backoff.failure(api_client._take_retry_after())
+            logging.info(f"resending cached payloads failed ({backoff.failures}x), next attempt in {delay:.1f}s")
+            return delay
+
+        backoff.success()
+        if len(api_client._cache) > 0:
+            return 0
+        return backoff.idle_delay()
+
+    async def _resend(self, entries: list) -> bool:
+        """Resends cached entries in a single request and acknowledges them.
+
+        :param entries: list of OutboxEntry
+        :return: True if the entries were delivered (or rejected by the server), False otherwise
+        """
+        results = await self._send([entry.payload for entry in entries])
+        return await asyncio.get_running_loop().run_in_executor(None, api_client._acknowledge, entries, results)
+
+    async def _cache(self, payloads: list):
+        """Caches payloads that could not be delivered (on a worker thread as the cache writes to the disk).
+
+        :param payloads: list of the payloads
+        """
+        if payloads:
+            await asyncio.get_running_loop().run_in_executor(None, _cache_payloads, payloads)
+
+    async def _send(self, payloads: list) -> list:
+        """Sends payloads to the server (the batch endpoint is used if batches are enabled).
+
+        The payloads of a rejected batch are sent once more one by one (see api_client._send_batch_payloads).
+
+        :param payloads: list of the payloads
+        :return: list of the results (SENT, FAILED, or REJECTED), one per payload
+        """
+        if self._config.batch_max_size <= 1:
+            return [await self._post(api_client._uri, payloads[0], f"payload = {payloads[0]}")]
+
+        result = await self._post(api_client._batch_uri, payloads, f"batch of {len(payloads)} payloads")
+        if result == REJECTED and len(payloads) > 1:
+            logging.warning(f"batch of {len(payloads)} payloads rejected by the server - sending them one by one")
+            return list(await asyncio.gather(*(self._post(api_client._uri, payload, f"payload = {payload}")
+                                               for payload in payloads)))
+        return [result] * len(payloads)
+
+    async def _post(self, uri: str, data, description: str) -> str:
+        """Posts data to the server (see api_client._post).
+
+        :param uri: server uri the data is sent to
+        :param data: data (payload or list of payloads) to be sent
+        :param description: description of the data used in the logs
+        :return: result of the request (SENT, FAILED, or REJECTED)
+        """
+        if uri is None:
+            logging.warning(f"sending {description} failed because uri is set to None")
+            return FAILED
+
+        wire_format = api_client._wire_format
+        async with self._in_flight:
+            start = perf_counter()
+            result = await self._post_request(uri, wire_format.encode(data), wire_format.headers, description)
+            metrics.record_send(perf_counter() - start, result)
+            return result
+
+    async def _post_request(self, uri: str, body: bytes, headers: dict, description: str) -> str:
+        """Posts an encoded body to the server and classifies the response.
+
+        :param uri: server uri the data is sent to
+        :param body: encoded data
+        :param headers: headers describing the encoding of the data
+        :param description: description of the data used in the logs
+        :return: result of the request (SENT, FAILED, or REJECTED)
+        """
+        import aiohttp
+
+        try:
+            logging.info(f"sending {description} to {uri}")
+            async with self._session.post(uri, data=body, headers=headers) as response:
+                text = await response.text()
+                if response.status >= 400:
+                    return api_client._http_error_result(uri, response.status, response.headers.get("Retry-After"),
+                                                         description, f"{response.status} {response.reason}")
+                logging.info(f"response text: {text}")
+                return SENT
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            logging.warning(f"sending {description} to {uri} failed")
+            return FAILED
+
+    async def _put_pending_events(self):
+        """Puts the events taken over from the detector into the event queue (waits if it is full)."""
+        for event in self._take(self._pending_events):
+            await self._events.put(event)
+
+    async def _put_pending_payloads(self):
+        """Puts the payloads taken over from the listeners into the payload queue (waits if it is full)."""
+        for payload in self._take(self._pending_payloads):
+            await self._payloads.put(payload)
+            self._payload_added.set()
+
+    @staticmethod
+    def _take(items: list) -> list:
+        """Takes all items out of a list.
+
+        :param items: list of the items
+        :return: list of the taken items
+        """
+        taken = items[:]
+        items.clear()
+        return taken
+
+    def _open_hotplug_monitor(self):
+        """Opens the hotplug notifications (event and hybrid scan modes) and watches them in the event loop."""
+        if self._config.scan_mode not in ("event", "hybrid"):
+            return
+        self._hotplug_monitor = create_hotplug_monitor()
+        if self._hotplug_monitor is None:
+            logging.warning("falling back to the poll scan mode")
+            return
+        asyncio.get_running_loop().add_reader(self._hotplug_monitor.fileno(), self._on_hotplug)
+
+    def _close_hotplug_monitor(self):
+        """Stops watching the hotplug notifications and closes them."""
+        if self._hotplug_monitor is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._hotplug_monitor.fileno())
+        self._hotplug_monitor.close()
+        self._hotplug_monitor = None
+
+    def _on_hotplug(self):
+        """Wakes up the scan when a USB device is plugged or unplugged."""
+        if self._hotplug_monitor.wait(0):
+            self._hotplug.set()
+
+
+def _call_listener(callback, device, occurred_at: float):
+    """Calls a listener (an exception raised by the listener is logged).
+
+    :param callback: listener (function)
+    :param device: USB device the listener is called with
+    :param occurred_at: time of the event (seconds since the epoch)
+    """
+    try:
+        call_with_event_time(callback, device, occurred_at)
+    except Exception:
+        logging.exception(f"listener {callback} failed (device = {device})")
+
+
+def _cache_payloads(payloads: list):
+    """Caches payloads (see api_client._cache_failed_payload).
+
+    :param payloads: list of the payloads
+    """
+    for payload in payloads:
+        api_client._cache_failed_payload(payload)
+
+
+async def _wait(event: asyncio.Event, timeout: float):
+    """Waits until an event is set, but at most for the given time.
+
+    :param event: event to wait for
+    :param timeout: maximum number of seconds to wait
+    """
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def _cancel(tasks: list):
+    """Cancels tasks and waits until they finish.
+
+    :param tasks: list of the tasks
+    """
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def async_runtime_run(config):
+    """Runs the application in the asyncio runtime until it is interrupted.
+
+    SIGINT and SIGTERM shut the runtime down gracefully (on platforms
+    that do not support signal handlers in the event loop, the runtime
+    is shut down when the main task is cancelled by Ctrl+C).
+
+    :param config: instance of Config (config manager)
+    """
+    async def main():
+        runtime = AsyncRuntime(config)
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, runtime.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        await runtime.run()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
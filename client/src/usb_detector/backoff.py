@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class ExponentialBackoff:
+    """This class computes the delays between attempts to resend cached payloads.
+
+    While the attempts fail, the delay grows exponentially from the base period
+    up to the maximum. A random jitter is applied to all delays, so that the clients
+    that lost the connection to the server at the same time do not retry in lockstep.
+    A delay requested by the server (Retry-After) is always honoured.
+    """
+
+    def __init__(self, base_seconds: float, max_seconds: float, factor: float = 2, rand=random.random):
+        """Constructor of the class.
+
+        :param base_seconds: delay after the first failure (and the period when nothing fails)
+        :param max_seconds: maximum delay
+        :param factor: number by which the delay is multiplied after each failure
+        :param rand: function returning a random number in the range [0, 1)
+        """
+        self.base_seconds = base_seconds
+        self.max_seconds = max(base_seconds, max_seconds)
+        self.factor = factor
+        self._rand = rand
+
+        # number of consecutive failures
+        self.failures = 0
+
+    def failure(self, retry_after: float = None) -> float:
+        """Records a failed attempt and returns the delay before the next one.
+
+        Half of the delay is fixed and the other half is random (equal jitter),
+        so the delay grows with each failure, but the clients are spread out.
+
+        :param retry_after: number of seconds the server asked the client to wait (if any)
+        :return: number of seconds to wait
+        """
+        self.failures += 1
+        cap = min(self.max_seconds, self.base_seconds * self.factor ** (self.failures - 1))
+        delay = cap / 2 + self._rand() * cap / 2
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def success(self):
+        """Records a successful attempt (the delay is reset)."""
+        self.failures = 0
+
+    def idle_delay(self) -> float:
+        """Returns the delay before the next attempt when nothing failed.
+
+        :return: base period with a random jitter of +-50 %
+        """
+        return self.base_seconds * (0.5 + self._rand())
+
+
+def parse_retry_after(value: str, now: datetime = None):
+    """Parses the value of the Retry-After header.
+
+    The value can be either a number of seconds or an HTTP date.
+
+    :param value: value of the header
+    :param now: current time (used with HTTP dates)
+    :return: number of seconds to wait or None if the value is not valid
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max(0.0, (date - (now or datetime.now(timezone.utc))).total_seconds())
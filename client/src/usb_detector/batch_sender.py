@@ -0,0 +1,64 @@
+from threading import Lock, Timer
+
+
+class BatchSender:
+    """This class groups payloads into batches before they are sent to the server.
+
+    A batch is sent as soon as it reaches the maximum size or when the time
+    window opened by its first payload elapses, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, window_seconds: float, send):
+        """Constructor of the class.
+
+        :param max_size: maximum number of payloads in a batch
+        :param window_seconds: maximum number of seconds a payload waits for the batch to be sent
+        :param send: function that sends a batch (list of payloads) to the server
+        """
+        self.max_size = max_size
+        self.window_seconds = window_seconds
+        self._send = send
+        self._payloads = []
+        self._timer = None
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def add(self, payload: dict):
+        """Adds a payload into the current batch.
+
+        :param payload: payload to be sent to the server
+        """
+        batch = None
+        with self._lock:
+            self._payloads.append(payload)
+            if len(self._payloads) >= self.max_size:
+                batch = self._take_batch()
+            elif self._timer is None:
+                # The first payload of the batch opens the time window.
+                self._timer = Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        # The batch is sent outside of the lock, so that new payloads can be added meanwhile.
+        if batch:
+            self._send(batch)
+
+    def flush(self):
+        """Sends the current batch right away (if there are any payloads)."""
+        with self._lock:
+            batch = self._take_batch()
+        if batch:
+            self._send(batch)
+
+    def _take_batch(self) -> list:
+        """Takes all payloads of the current batch and closes its time window.
+
+        :return: list of the payloads
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._payloads = self._payloads, []
+        return batch
@@ -0,0 +1,100 @@
+import logging
+from time import monotonic
+
+from .devices import device_key
+
+CONNECTED = "connected"
+DISCONNECTED = "disconnected"
+
+
+class EventDebouncer:
+    """This class debounces and coalesces the events of flapping USB devices.
+
+    An event (connected/disconnected) is held back until the device stays
+    in its new state for the hold time. If the opposite event of the same device
+    arrives within this window, both events cancel each other out and
+    the flap is counted as suppressed.
+    """
+
+    def __init__(self, hold_seconds: float, clock=monotonic):
+        """Constructor of the class.
+
+        :param hold_seconds: number of seconds a device must stay in its new state
+        :param clock: function returning the current (monotonic) time in seconds
+        """
+        self.hold_seconds = hold_seconds
+        self._clock = clock
+
+        # pending events (device key -> (status, device, time of the event))
+        self._pending = {}
+
+        # statistics of the events
+        self.suppressed_flaps = 0
+        self.emitted_events = 0
+
+    def __len__(self):
+        return len(self._pending)
+
+    def submit(self, connected_devices: list, disconnected_devices: list):
+        """Submits the devices that were just connected/disconnected.
+
+        :param connected_devices: list of the USB devices that were just plugged in
+        :param disconnected_devices: list of the USB devices that were just unplugged
+        """
+        now = self._clock()
+        for status, devices in ((CONNECTED, connected_devices), (DISCONNECTED, disconnected_devices)):
+            for device in devices:
+                key = device_key(device)
+                pending = self._pending.get(key)
+
+                if pending is None:
+                    self._pending[key] = (status, device, now)
+                elif pending[0] != status:
+                    # The device returned to its previous state within the hold time.
+                    del self._pending[key]
+                    self.suppressed_flaps += 1
+                    logging.info(f"suppressing flap of device {device}")
+
+    def poll(self, flush: bool = False) -> tuple:
+        """Returns the events whose devices have stayed in their new state for the hold time.
+
+        The returned events are removed from the pending events.
+
+        :param flush: if True, all pending events are returned regardless of the hold time (shutdown)
+        :return: tuple (connected devices, disconnected devices)
+        """
+        now = self._clock()
+        connected_devices = []
+        disconnected_devices = []
+
+        for key, (status, device, timestamp) in list(self._pending.items()):
+            if flush or now - timestamp >= self.hold_seconds:
+                del self._pending[key]
+                if status == CONNECTED:
+                    connected_devices.append(device)
+                else:
+                    disconnected_devices.append(device)
+
+        self.emitted_events += len(connected_devices) + len(disconnected_devices)
+        return connected_devices, disconnected_devices
+
+    def seconds_until_due(self):
+        """Returns the number of seconds until the oldest pending event is due.
+
+        :return: number of seconds or None if there are no pending events
+        """
+        if not self._pending:
+            return None
+        oldest = min(timestamp for _, _, timestamp in self._pending.values())
+        return max(0.0, oldest + self.hold_seconds - self._clock())
+
+    def stats(self) -> dict:
+        """Returns statistics of the debounced events.
+
+        :return: dictionary of the statistics
+        """
+        return {
+            "pending_events": len(self._pending),
+            "emitted_events": self.emitted_events,
+            "suppressed_flaps": self.suppressed_flaps
+        }
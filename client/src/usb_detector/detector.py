@@ -1,16 +1,28 @@
-import json
 import logging
+import os
 from time import sleep
 
+from .debouncer import EventDebouncer
+from .devices import DeviceSnapshot
+from . import metrics
+from .dispatcher import ListenerDispatcher
+from .hotplug import create_hotplug_monitor
+from .scheduler import AdaptiveScheduler
+from .state_store import DeviceStateStore
+
 _listeners_connected = []       # list of listeners (USB devices is connected)
 _listeners_disconnected = []    # list of listeners (USB devices is disconnected)
 
 _last_connected_devices = []    # list of the lastly connected USB devices
 _config = None                  # instance of Config (config manager)
-_usb_reader = None
+_usb_reader = None              # instance of DeviceReader (USB device reader)
+_scheduler = None               # instance of AdaptiveScheduler (scan period)
+_debouncer = None               # instance of EventDebouncer (None if events are not debounced)
+_dispatcher = None              # instance of ListenerDispatcher (None if listeners are called synchronously)
+_state_store = None             # instance of DeviceStateStore (persistent memory)
 
 
-def usb_detector_set_config(config, usbReader):
+def usb_detector_set_config(config, usbReader=None):
     """Initializes the usb detector module (file).
 
     This function is meant to be called prior to calling
@@ -18,8 +30,8 @@ def usb_detector_set_config(config, usbReader):
     an instance of the Config class which is then used
     by other functions within this file.
 
-    :param usbReader: .]
     :param config: instance of Config (config manager)
+    :param usbReader: instance of DeviceReader used to read the connected USB devices
     """
     # Store the instance into the global variable.
     global _config, _usb_reader
@@ -67,27 +79,31 @@ def _notify_listeners(listeners: list, devices: list):
         return
 
     # Iterate over the listeners and notify them
-    # of all USB devices involved in the event.
+    # of all USB devices involved in the event. If the dispatcher
+    # is enabled, the listeners are called on threads of their own.
     for callback in listeners:
         for device in devices:
-            callback(device)
+            if _dispatcher is None:
+                callback(device)
+            else:
+                _dispatcher.dispatch(callback, device)
 
 
-def _store_connected_devices(devices: list):
-    """Stores the list of the currently connected USB devices into a file.
+def _store_connected_devices(connected_devices: list, disconnected_devices: list):
+    """Stores the changes of the currently connected USB devices on the disk.
 
     This function is called whenever a device is connected or disconnected.
-    Its main purpose is to dump the list of the currently plugged devices
+    Its main purpose is to keep the list of the currently plugged devices
     on the disk (so it is not kept in RAM when the computer shuts down). The
-    list is then loaded upon every start of the application.
+    list is then loaded upon every start of the application. Only the changes
+    are written (see DeviceStateStore), so it does not matter how many devices
+    are connected to the PC.
 
-    :param devices: list of the devices that are currently connected to the PC
+    :param connected_devices: list of the devices that were just connected to the PC
+    :param disconnected_devices: list of the devices that were just disconnected from the PC
     """
     logging.debug("storing newly connected devices")
-
-    # Dump the list into a JSON format.
-    with open(_config.connected_devices_filename, "w") as file:
-        json.dump(devices, file)
+    _state_store.apply(connected_devices, disconnected_devices)
 
 
 def _load_last_connected_devices() -> list:
@@ -101,12 +117,7 @@ def _load_last_connected_devices() -> list:
     :return: list of the lastly connected USB devices
     """
     logging.debug("loading last connected devices")
-    try:
-        with open(_config.connected_devices_filename, "r") as file:
-            return json.loads(file.read())
-    except IOError:
-        logging.error("loading of last connected devices failed")
-        return []
+    return _state_store.load()
 
 
 def _get_connected_devices(detected_devices: list, last_connected_devices: list) -> list:
@@ -130,7 +141,7 @@ def _get_connected_devices(detected_devices: list, last_connected_devices: list)
         return []
 
     # Return a list of all devices that were just plugged into the PC.
-    return [device for device in detected_devices if device not in last_connected_devices]
+    return DeviceSnapshot(detected_devices).added_since(DeviceSnapshot(last_connected_devices))
 
 
 def _get_disconnected_devices(detected_devices: list, last_connected_devices: list) -> list:
@@ -154,7 +165,7 @@ def _get_disconnected_devices(detected_devices: list, last_connected_devices: li
         return last_connected_devices
 
     # Return a list of all devices that were just disconnected.
-    return [device for device in last_connected_devices if device not in detected_devices]
+    return DeviceSnapshot(detected_devices).removed_since(DeviceSnapshot(last_connected_devices))
 
 
 def _update():
@@ -164,46 +175,211 @@ def _update():
     It uses the other functions of this file to figure out if there have
     been any changes since the last time this function was called - what
     USB devices have been connected/disconnected.
+
+    :return: True if any USB device has been connected or disconnected
+    """
+    # Retrieve a list of the currently plugged USB devices and process it.
+    with metrics.SCAN_DURATION.time():
+        return _apply_detected_devices(_usb_reader.read_connected_devices())
+
+
+def _apply_detected_devices(detected_devices: list) -> bool:
+    """Processes the list of the currently plugged USB devices.
+
+    It figures out what USB devices have been connected/disconnected
+    since the last scan, notifies the listeners (or the debouncer),
+    and stores the changes on the disk. The changes held back by the debouncer
+    are stored only once they are dispatched (see _dispatch_debounced_events),
+    so the events lost in a crash are detected again after the restart.
+
+    :param detected_devices: list of the currently plugged USB devices (None if they could not be read)
+    :return: True if any USB device has been connected or disconnected
     """
-    # Retrieve a list of the currently plugged USB devices
-    # and store it globally within the file.
     global _last_connected_devices
-    detected_devices = _usb_reader.read_connected_devices_power_shell()
 
-    # Figure out what USB devices were connected to the PC since
-    # the last time this function was called.
-    connected_devices = _get_connected_devices(detected_devices, _last_connected_devices)
+    # If the USB devices could not be read, keep the last known state
+    # rather than reporting all devices as disconnected.
+    if detected_devices is None:
+        logging.warning("failed to read the currently connected devices")
+        return False
 
-    # Figure out what USB devices were disconnected from the PC since
-    # the last time this function was called.
-    disconnected_devices = _get_disconnected_devices(detected_devices, _last_connected_devices)
+    # Figure out what USB devices were connected to/disconnected from the PC
+    # since the last time this function was called. Both snapshots are indexed
+    # by the device keys, so the comparison takes linear time.
+    connected_devices, disconnected_devices = \
+        DeviceSnapshot(detected_devices).diff(DeviceSnapshot(_last_connected_devices))
 
     # Notify both kinds of listeners (call the registered callback functions).
+    # If the events are debounced, they are held back until the devices
+    # stay in their new state for the hold time (see _dispatch_debounced_events).
+    if len(connected_devices) == 0 and len(disconnected_devices) == 0:
+        return False
+
+    # If the events are not debounced, update the file on the disk (persistent memory) right away.
+    if _debouncer is None:
+        _notify_listeners(_listeners_connected, connected_devices)
+        _notify_listeners(_listeners_disconnected, disconnected_devices)
+        _store_connected_devices(connected_devices, disconnected_devices)
+    else:
+        _debouncer.submit(connected_devices, disconnected_devices)
+    _last_connected_devices = detected_devices
+    return True
+
+
+def _scan():
+    """Updates the USB detector and measures how long it took.
+
+    The duration of the scan and whether anything has changed
+    are recorded by the scheduler which then adjusts the scan period.
+    """
+    _scheduler.scan_started()
+    changed = _update()
+    _scheduler.scan_finished(changed)
+    _dispatch_debounced_events()
+    logging.debug(f"scan finished in {_scheduler.last_scan_duration:.3f}s, next period {_scheduler.period}s")
+
+
+def _dispatch_debounced_events(flush: bool = False):
+    """Notifies the listeners of the debounced events that are due and stores them on the disk.
+
+    This function does nothing if the events are not debounced.
+
+    :param flush: if True, all pending events are dispatched regardless of the hold time (shutdown)
+    """
+    if _debouncer is None:
+        return
+
+    connected_devices, disconnected_devices = _debouncer.poll(flush)
+    if len(connected_devices) == 0 and len(disconnected_devices) == 0:
+        return
+
     _notify_listeners(_listeners_connected, connected_devices)
     _notify_listeners(_listeners_disconnected, disconnected_devices)
+    _store_connected_devices(connected_devices, disconnected_devices)
 
-    # If there have been any changes, update the file on the disk (persistent memory).
-    if len(connected_devices) > 0 or len(disconnected_devices) > 0:
-        _store_connected_devices(detected_devices)
-        _last_connected_devices = detected_devices
 
+def get_event_stats() -> dict:
+    """Returns statistics of the debounced events (pending, emitted, and suppressed flaps).
 
-def usb_detector_run():
-    """Keeps detecting what USB devices were plugged/unplugged.
+    :return: dictionary of the statistics (see EventDebouncer.stats)
+             or None if the events are not debounced
+    """
+    if _debouncer is None:
+        return None
+    return _debouncer.stats()
+
+
+def get_listener_stats() -> dict:
+    """Returns statistics of the listeners (queue depth, latency, etc.).
 
-    This function is instantiated as a thread that periodically scans
-    what USB devices are connected to the PC. The scan period can be
-    found and modified in the configuration file of the application.
+    :return: dictionary of the statistics (see ListenerDispatcher.stats)
+             or None if the listeners are called synchronously
     """
-    logging.info("USB device detector is now running")
+    if _dispatcher is None:
+        return None
+    return _dispatcher.stats()
 
+
+def get_scan_stats() -> dict:
+    """Returns the current scan period and statistics of the scan durations.
+
+    :return: dictionary of the statistics (see AdaptiveScheduler.stats)
+             or None if the detector is not running
+    """
+    if _scheduler is None:
+        return None
+    return _scheduler.stats()
+
+
+def _wait_for_next_scan(hotplug_monitor):
+    """Waits until the USB devices are supposed to be scanned again.
+
+    In the poll mode (or if hotplug notifications are not available),
+    it simply sleeps until the next scan planned by the scheduler. In the event
+    mode, it waits for a hotplug notification, but at most for the safety scan
+    period, so that a lost notification is eventually caught up with a full rescan.
+    In the hybrid mode, it waits for a notification at most until the next planned scan.
+    In all modes, the detector wakes up when a debounced event is due.
+
+    :param hotplug_monitor: monitor of hotplug notifications (None in the poll mode)
+    """
+    if hotplug_monitor is None:
+        sleep(_with_debounce_deadline(_scheduler.seconds_until_next_scan()))
+    elif _config.scan_mode == "event":
+        hotplug_monitor.wait(_with_debounce_deadline(_config.safety_scan_period_seconds))
+    else:
+        hotplug_monitor.wait(_with_debounce_deadline(_scheduler.seconds_until_next_scan()))
+
+
+def _with_debounce_deadline(seconds: float) -> float:
+    """Shortens the waiting time, so that the oldest debounced event is dispatched in time.
+
+    :param seconds: number of seconds the detector is supposed to wait
+    :return: number of seconds to wait
+    """
+    if _debouncer is None:
+        return seconds
+
+    due = _debouncer.seconds_until_due()
+    if due is None:
+        return seconds
+    return min(seconds, due)
+
+
+def _init_detector():
+    """Initializes the state of the USB detector before the first scan.
+
+    It loads the lastly connected USB devices and creates the scheduler
+    and the debouncer (if the events are to be debounced).
+    """
     # Read the list of the lastly connected USB devices from the disk (once).
-    global _last_connected_devices
+    global _last_connected_devices, _scheduler, _debouncer, _state_store
+    _state_store = DeviceStateStore(_config.connected_devices_filename, _config.state_compaction_threshold)
     _last_connected_devices = _load_last_connected_devices()
 
+    # Scan with the configured period right after a change and back off
+    # up to the maximal period while nothing changes.
+    _scheduler = AdaptiveScheduler(_config.scan_period_seconds, _config.max_scan_period_seconds,
+                                   _config.scan_backoff_factor)
+
+    # Hold the events back until the devices stay in their new state
+    # for the hold time (flapping devices).
+    if _config.debounce_hold_seconds > 0:
+        _debouncer = EventDebouncer(_config.debounce_hold_seconds)
+
+
+def usb_detector_run():
+    """Keeps detecting what USB devices were plugged/unplugged.
+
+    This function is instantiated as a thread that scans what USB devices
+    are connected to the PC. Depending on the scan mode set in the configuration
+    file, the devices are scanned periodically (poll) or whenever a hotplug
+    notification is received (event, hybrid).
+    """
+    logging.info(f"USB device detector is now running (scan mode: {_config.scan_mode})")
+    _init_detector()
+
+    # Call the listeners on threads of their own, so that a slow listener
+    # (e.g. sending data to an unreachable server) does not stall the scanning.
+    global _dispatcher
+    if _config.listener_queue_size > 0:
+        _dispatcher = ListenerDispatcher(_config.listener_queue_size, _config.listener_overflow_policy,
+                                         os.path.join(_config.cache_dir, "listeners"))
+        for callback in _listeners_connected + _listeners_disconnected:
+            _dispatcher.add_listener(callback)
+
+    # Open the hotplug notifications if they are to be used. If they
+    # are not available, fall back to scanning the devices periodically.
+    hotplug_monitor = None
+    if _config.scan_mode in ("event", "hybrid"):
+        hotplug_monitor = create_hotplug_monitor()
+        if hotplug_monitor is None:
+            logging.warning("falling back to the poll scan mode")
+
     while True:
         # Update the USB detector.
-        _update()
+        _scan()
+
+        # Wait until the devices are supposed to be scanned again.
+        _wait_for_next_scan(hotplug_monitor)
 
-        # Sleep for a predefined amount of seconds.
-        sleep(_config.scan_period_seconds)
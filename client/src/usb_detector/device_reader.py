@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+
+class DeviceReader(ABC):
+    """This class is the interface of all USB device readers.
+
+    A reader is passed in to the USB detector, which periodically
+    calls its read_connected_devices method. The reader being used
+    is selected in the configuration file (see create_usb_reader).
+    """
+
+    @abstractmethod
+    def read_connected_devices(self):
+        """Reads and returns all USB devices that are currently connected to the computer.
+
+        Each device is a dictionary which consists of a vendor id,
+        product id, and serial number.
+
+        :return: list of all USB devices connected to the PC (None if the devices
+                 could not be read)
+        """
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class DeviceKey:
+    """This class represents the identity of a USB device.
+
+    Two device records are considered to be the same device if they
+    share the same vendor id, product id, and serial number. As the class
+    is frozen, its instances are hashable and can be stored in sets.
+    """
+    vendor_id: str
+    product_id: str
+    serial_number: str
+
+    @classmethod
+    def from_device(cls, device: dict):
+        """Creates a key out of a device record (dictionary).
+
+        :param device: USB device (vendor id, product id, and serial number)
+        :return: identity of the device
+        """
+        return cls(device.get("vendor_id"), device.get("product_id"), device.get("serial_number"))
+
+
+def device_key(device):
+    """Returns a hashable key of a device.
+
+    Device records (dictionaries) are turned into an instance of DeviceKey.
+    Any other (already hashable) value is used as the key as is.
+
+    :param device: USB device
+    :return: hashable key of the device
+    """
+    if isinstance(device, dict):
+        return DeviceKey.from_device(device)
+    return device
+
+
+class DeviceSnapshot:
+    """This class holds a set of USB devices connected to the PC at a time.
+
+    The devices are indexed by their keys (see DeviceKey), so a snapshot
+    can be compared to another one in linear time. The original device
+    records are preserved (including their order) as they are passed
+    on to the listeners and stored on the disk.
+    """
+
+    def __init__(self, devices: list = None):
+        """Constructor of the class.
+
+        :param devices: list of the USB devices the snapshot is made of
+        """
+        # Map the key of each device to its record. If the same device
+        # appears in the list more than once, its first record is kept.
+        self._devices = {}
+        for device in devices or []:
+            self._devices.setdefault(device_key(device), device)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, device):
+        return device_key(device) in self._devices
+
+    @property
+    def keys(self) -> set:
+        """Returns a set of the keys of all devices in the snapshot.
+
+        :return: set of the device keys
+        """
+        return set(self._devices)
+
+    @property
+    def devices(self) -> list:
+        """Returns a list of all device records in the snapshot.
+
+        :return: list of the USB devices
+        """
+        return list(self._devices.values())
+
+    def added_since(self, previous) -> list:
+        """Returns a list of devices that do not appear in the previous snapshot.
+
+        :param previous: snapshot the current one is compared to
+        :return: list of the USB devices that were just plugged in
+        """
+        return [device for key, device in self._devices.items() if key not in previous._devices]
+
+    def removed_since(self, previous) -> list:
+        """Returns a list of devices from the previous snapshot that are no longer present.
+
+        :param previous: snapshot the current one is compared to
+        :return: list of the USB devices that were just unplugged
+        """
+        return previous.added_since(self)
+
+    def diff(self, previous) -> tuple:
+        """Compares the snapshot to the previous one.
+
+        :param previous: snapshot the current one is compared to
+        :return: tuple (connected devices, disconnected devices)
+        """
+        return self.added_since(previous), self.removed_since(previous)
@@ -0,0 +1,256 @@
+import logging
+import os
+import queue
+from threading import Lock, Thread, local
+from time import monotonic, time
+
+from diskcache import Deque
+
+# policies applied when the queue of a listener is full
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_SPILL = "spill"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_SPILL)
+
+# event the listener running on the current thread has been called with (see event_time)
+_current_event = local()
+
+
+class ListenerWorker:
+    """This class calls a single listener on a thread of its own.
+
+    The events (devices) are put into a bounded queue the worker takes them from,
+    so a slow listener does not stall the detector. What happens when the queue
+    is full is determined by the overflow policy:
+
+    block       - the detector waits until there is a free slot in the queue
+    drop_oldest - the oldest event in the queue is discarded
+    spill       - the event is stored into a disk-based queue (diskcache) which
+                  the worker empties once it has processed the in-memory queue
+    """
+
+    def __init__(self, callback, max_size: int, overflow_policy: str, spill_directory: str = None):
+        """Constructor of the class.
+
+        :param callback: listener (function) that is called with each device
+        :param max_size: maximum number of events held in the queue
+        :param overflow_policy: policy applied when the queue is full (see OVERFLOW_POLICIES)
+        :param spill_directory: directory of the disk-based queue (spill policy only)
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy \"{overflow_policy}\"")
+
+        self.callback = callback
+        self.overflow_policy = overflow_policy
+        self._queue = queue.Queue(maxsize=max_size)
+        self._spill = Deque(directory=spill_directory) if overflow_policy == OVERFLOW_SPILL else None
+        self._lock = Lock()
+
+        # statistics of the listener
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+        self._thread = Thread(target=self._run, name=f"listener-{_callback_name(callback)}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """Returns the number of events waiting to be processed (including the spilled ones).
+
+        :return: number of the pending events
+        """
+        return self._queue.qsize() + (len(self._spill) if self._spill is not None else 0)
+
+    def put(self, device):
+        """Puts an event (device) into the queue of the listener.
+
+        The time of the event is recorded, so that the listener can
+        tell when the event happened (see event_time).
+
+        :param device: USB device the listener is called with
+        """
+        item = (device, monotonic(), time())
+
+        if self.overflow_policy == OVERFLOW_BLOCK:
+            self._queue.put(item)
+            return
+
+        with self._lock:
+            # Once there are any spilled events, all new events are spilled
+            # as well, so that the order of the events is preserved.
+            if self._spill is not None and len(self._spill) > 0:
+                self._spill_item(item)
+                return
+            while True:
+                try:
+                    self._queue.put_nowait(item)
+                    return
+                except queue.Full:
+                    if self._spill is not None:
+                        self._spill_item(item)
+                        return
+                try:
+                    dropped_device = self._queue.get_nowait()[0]
+                except queue.Empty:
+                    # The worker has just taken the remaining events, so there is room now.
+                    continue
+                self.dropped += 1
+                logging.warning(f"queue of listener {_callback_name(self.callback)} is full - "
+                                f"discarding device {dropped_device}")
+
+    def stats(self) -> dict:
+        """Returns statistics of the listener.
+
+        :return: dictionary of the statistics (latencies in seconds)
+        """
+        return {
+            "queue_depth": self.depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "last_latency": self.last_latency,
+            "max_latency": self.max_latency,
+            "mean_latency": self.total_latency / self.processed if self.processed else 0.0
+        }
+
+    def _spill_item(self, item):
+        """Stores an event into the disk-based queue.
+
+        :param item: tuple (device, time the event was queued at, time of the event)
+        """
+        self._spill.append(item)
+        self.spilled += 1
+
+    def _next_item(self):
+        """Returns the next event to be processed.
+
+        The in-memory queue is emptied first, then the spilled events are processed.
+        Events are spilled only when the in-memory queue is full, so once both queues
+        are empty, the worker can simply wait for the in-memory queue.
+
+        :return: tuple (device, time the event was queued at, time of the event)
+        """
+        if self._spill is not None:
+            try:
+                return self._queue.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if len(self._spill) > 0:
+                        return self._spill.popleft()
+        return self._queue.get()
+
+    def _run(self):
+        """Keeps calling the listener with the queued events (thread)."""
+        while True:
+            device, queued_at, occurred_at = self._next_item()
+            try:
+                call_with_event_time(self.callback, device, occurred_at)
+            except Exception:
+                self.failed += 1
+                logging.exception(f"listener {_callback_name(self.callback)} failed (device = {device})")
+
+            # Latency of the event is measured from the moment it was queued
+            # (events spilled by a previous run of the application are skewed).
+            latency = max(0.0, monotonic() - queued_at)
+            self.processed += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            self.total_latency += latency
+
+
+class ListenerDispatcher:
+    """This class dispatches the events to the listeners asynchronously.
+
+    Each listener is given a worker (see ListenerWorker) which is created either
+    explicitly or with the first event the listener is supposed to be notified of.
+    """
+
+    def __init__(self, max_size: int, overflow_policy: str, spill_directory: str = None):
+        """Constructor of the class.
+
+        :param max_size: maximum number of events held in the queue of each listener
+        :param overflow_policy: policy applied when a queue is full (see OVERFLOW_POLICIES)
+        :param spill_directory: directory holding the disk-based queues of the listeners
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy \"{overflow_policy}\"")
+
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.spill_directory = spill_directory
+        self._workers = {}
+
+    def add_listener(self, callback) -> ListenerWorker:
+        """Starts the worker of a listener (if it is not running yet).
+
+        Starting the worker right away ensures that the events spilled
+        by a previous run of the application are processed.
+
+        :param callback: listener (function)
+        :return: worker of the listener
+        """
+        worker = self._workers.get(callback)
+        if worker is None:
+            spill_directory = None
+            if self.spill_directory is not None:
+                spill_directory = os.path.join(self.spill_directory, _callback_name(callback))
+            worker = ListenerWorker(callback, self.max_size, self.overflow_policy, spill_directory)
+            self._workers[callback] = worker
+        return worker
+
+    def dispatch(self, callback, device):
+        """Passes an event (device) on to the worker of the listener.
+
+        :param callback: listener (function) that is supposed to be called
+        :param device: USB device the listener is called with
+        """
+        self.add_listener(callback).put(device)
+
+    def stats(self) -> dict:
+        """Returns statistics of all listeners.
+
+        :return: dictionary (name of the listener -> statistics)
+        """
+        return {_callback_name(callback): worker.stats() for callback, worker in self._workers.items()}
+
+
+def event_time() -> float:
+    """Returns the time of the event the listener is being called with.
+
+    A listener called through a queue may run a while after the event
+    happened, so it should use this time rather than the current one.
+
+    :return: time of the event (seconds since the epoch) or None if the listener
+             is called synchronously (the event is happening right now)
+    """
+    return getattr(_current_event, "time", None)
+
+
+def call_with_event_time(callback, device, occurred_at: float):
+    """Calls a listener with an event that happened at the given time (see event_time).
+
+    :param callback: listener (function)
+    :param device: USB device the listener is called with
+    :param occurred_at: time of the event (seconds since the epoch)
+    """
+    _current_event.time = occurred_at
+    try:
+        callback(device)
+    finally:
+        _current_event.time = None
+
+
+def _callback_name(callback) -> str:
+    """Returns the name of a listener (used in logs, statistics, and names of the spill directories).
+
+    :param callback: listener (function)
+    :return: name of the listener
+    """
+    return getattr(callback, "__qualname__", repr(callback))
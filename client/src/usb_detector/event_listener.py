@@ -1,9 +1,26 @@
-import platform
+import uuid
 import logging
-import getpass
-from datetime import datetime
 
+from . import metrics
 from .api_client import send_data
+from .dispatcher import event_time
+from .metadata import MetadataProvider
+
+_metadata_provider = MetadataProvider()     # provider of the metadata (cached host identity)
+_piggyback_metrics = False                  # True if the summary of the metrics is sent with each payload
+
+
+def event_listener_set_config(config):
+    """Initializes the event listener module.
+
+    It creates the metadata provider which refreshes the host
+    identity with the period defined in the configuration file.
+
+    :param config: instance of Config (config manager)
+    """
+    global _metadata_provider, _piggyback_metrics
+    _metadata_provider = MetadataProvider(config.metadata_refresh_seconds)
+    _piggyback_metrics = config.metrics_piggyback
 
 
 def _get_metadata() -> dict:
@@ -11,23 +28,20 @@ def _get_metadata() -> dict:
 
     This metadata is sent to the server as a part
     of each payload. It includes the username, hostname,
-    and timestamp.
+    and timestamp. The username and hostname are cached
+    (see MetadataProvider). The timestamp is the time of
+    the event, even if the listener runs later (see ListenerDispatcher).
 
     :return: metadata associated with the PC
     """
-    logging.debug("getting computer metadata")
-    return {
-        "username": getpass.getuser(),                  # username
-        "hostname": platform.uname().node,              # hostname
-        "timestamp": str(datetime.now()).split('.')[0]  # timestamp (format: 2022-04-07 12:11:02)
-    }
+    return _metadata_provider.metadata(event_time())
 
 
 def _send_payload_to_server(device: dict, status: str):
     """ Creates a payload and calls the send_data function to send it to the server.
 
-    Each payload consists of metadata, status (connected/disconnected), and device,
-    which contains a vendor id, product id, and serial number.
+    Each payload consists of metadata, status (connected/disconnected), device,
+    which contains a vendor id, product id, and serial number, and a unique id of the event.
 
     :param device: USB device that has been detected
     :param status: status of the USB device (connected/disconnected)
@@ -43,6 +57,14 @@ def _send_payload_to_server(device: dict, status: str):
     # Add the status of the USB device (connected/disconnected).
     payload["status"] = status
 
+    # Add a unique id of the event, so the server does not store
+    # the same event twice if the payload is sent again (retries).
+    payload["event_id"] = str(uuid.uuid4())
+
+    # Add a compact summary of the metrics of the client (if enabled).
+    if _piggyback_metrics:
+        payload["metrics"] = metrics.summary()
+
     # Send the payload off to the server.
     send_data(payload)
 
@@ -0,0 +1,98 @@
+import logging
+import select
+import socket
+import time
+
+# netlink protocol through which the kernel broadcasts uevents (Linux)
+NETLINK_KOBJECT_UEVENT = 15
+
+# multicast group of the uevents sent by the kernel
+KERNEL_UEVENT_GROUP = 1
+
+# maximum size of a single uevent message
+UEVENT_BUFFER_SIZE = 16 * 1024
+
+# actions that indicate that a USB device was plugged or unplugged
+HOTPLUG_ACTIONS = {"add", "remove", "bind", "unbind"}
+
+
+class NetlinkHotplugMonitor:
+    """This class listens to USB hotplug notifications sent by the Linux kernel.
+
+    The kernel broadcasts a uevent through a netlink socket whenever
+    a device is added or removed. The detector waits for these notifications
+    instead of scanning the USB devices periodically.
+    """
+
+    def __init__(self):
+        """Constructor of the class.
+
+        It opens and binds the netlink socket. If the platform does not
+        support netlink sockets, OSError (or AttributeError) is raised.
+        """
+        self._socket = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        try:
+            # The port id 0 lets the kernel assign a unique one (the pid may already be taken
+            # by another netlink socket of the process).
+            self._socket.bind((0, KERNEL_UEVENT_GROUP))
+        except OSError:
+            self._socket.close()
+            raise
+
+    def close(self):
+        """Closes the netlink socket."""
+        self._socket.close()
+
+    def fileno(self) -> int:
+        """Returns the file descriptor of the netlink socket (used to wait in an event loop).
+
+        :return: file descriptor
+        """
+        return self._socket.fileno()
+
+    def wait(self, timeout: float) -> bool:
+        """Waits for a USB hotplug notification.
+
+        All notifications that arrive at the same time (plugging a single
+        device usually produces several of them) are consumed at once.
+        Notifications of other devices do not extend the waiting time.
+
+        :param timeout: maximum number of seconds to wait
+        :return: True if a USB device was plugged or unplugged, False if the timeout expired
+        """
+        deadline = time.monotonic() + timeout
+        hotplug = False
+        while True:
+            # Do not wait any longer once a notification has arrived, just drain the socket.
+            remaining = 0 if hotplug else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._socket], [], [], remaining)
+            if not readable:
+                return hotplug
+
+            hotplug = _is_usb_hotplug(self._socket.recv(UEVENT_BUFFER_SIZE)) or hotplug
+
+
+def _is_usb_hotplug(message: bytes) -> bool:
+    """Checks whether a uevent message reports a plugged or unplugged USB device.
+
+    The message consists of a header (e.g. add@/devices/...) followed
+    by KEY=VALUE pairs separated by null characters.
+
+    :param message: uevent message received from the kernel
+    :return: True if the message reports a USB hotplug event
+    """
+    fields = dict(field.split(b"=", 1) for field in message.split(b"\0") if b"=" in field)
+    return fields.get(b"SUBSYSTEM") == b"usb" and fields.get(b"ACTION", b"").decode() in HOTPLUG_ACTIONS
+
+
+def create_hotplug_monitor():
+    """Creates a monitor of USB hotplug notifications.
+
+    :return: instance of a hotplug monitor or None if notifications
+             are not available on this platform
+    """
+    try:
+        return NetlinkHotplugMonitor()
+    except (AttributeError, OSError) as error:
+        logging.warning(f"USB hotplug notifications are not available: {error}")
+        return None
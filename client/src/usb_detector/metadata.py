@@ -0,0 +1,102 @@
+import getpass
+import logging
+import platform
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+# number of seconds the wall clock may drift from the monotonic clock before the provider assumes
+# that the computer was suspended and resumed (or the system time was changed)
+CLOCK_JUMP_SECONDS = 5
+
+
+class MetadataProvider:
+    """This class provides the metadata sent to the server as a part of each payload.
+
+    The identity of the host (username and hostname) is expensive to obtain
+    (on Windows, platform.uname may spawn subprocesses or query WMI), so it is
+    computed once and refreshed only after the refresh period elapses or when
+    the session changes (see invalidate). The refresh period is measured with
+    a monotonic clock. If the wall clock moves away from it, the computer has been
+    suspended and resumed (the session may have changed in the meantime)
+    or the system time has been changed, so the identity is refreshed right away.
+    The timestamps are taken from the wall clock and formatted in ISO-8601
+    in UTC, so they do not depend on the local time zone of the client.
+    """
+
+    def __init__(self, refresh_seconds: float = 300, clock=time.monotonic, wall_clock=time.time):
+        """Constructor of the class.
+
+        :param refresh_seconds: number of seconds after which the host identity is computed again
+        :param clock: monotonic clock (used to measure the time since the last refresh)
+        :param wall_clock: wall clock (seconds since the epoch) the timestamps are taken from
+        """
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._lock = Lock()
+
+        self._identity = None
+        self._refreshed_at = None
+        self._wall_anchor = None
+
+    def invalidate(self):
+        """Makes the provider compute the host identity again (e.g. when the session changes)."""
+        with self._lock:
+            self._identity = None
+
+    def host_identity(self) -> dict:
+        """Returns the identity of the host (it is refreshed if it is out of date).
+
+        :return: dictionary with the username and hostname
+        """
+        with self._lock:
+            self._refresh_if_needed(self._clock(), self._wall_clock())
+            return dict(self._identity)
+
+    def timestamp(self) -> str:
+        """Returns the current time in ISO-8601 (UTC, milliseconds).
+
+        :return: timestamp (format: 2022-04-07T10:11:02.123+00:00)
+        """
+        return self.metadata()["timestamp"]
+
+    def metadata(self, event_time: float = None) -> dict:
+        """Returns the metadata of a payload.
+
+        :param event_time: time of the event (seconds since the epoch), the current time is used if it is None
+        :return: dictionary with the username, hostname, and timestamp
+        """
+        with self._lock:
+            wall_now = self._wall_clock()
+            self._refresh_if_needed(self._clock(), wall_now)
+            seconds = wall_now if event_time is None else event_time
+            metadata = dict(self._identity)
+        metadata["timestamp"] = datetime.fromtimestamp(seconds, timezone.utc).isoformat(timespec="milliseconds")
+        return metadata
+
+    def _refresh_if_needed(self, now: float, wall_now: float):
+        """Refreshes the host identity if it is out of date (the lock must be held).
+
+        :param now: current time of the monotonic clock
+        :param wall_now: current time of the wall clock
+        """
+        if self._identity is None or now - self._refreshed_at >= self.refresh_seconds:
+            self._refresh(now, wall_now)
+        elif abs((wall_now - self._wall_anchor) - (now - self._refreshed_at)) >= CLOCK_JUMP_SECONDS:
+            logging.info("the computer has been resumed or its time has changed - refreshing computer metadata")
+            self._refresh(now, wall_now)
+
+    def _refresh(self, now: float, wall_now: float):
+        """Computes the host identity and records the times of the refresh.
+
+        :param now: current time of the monotonic clock
+        :param wall_now: current time of the wall clock
+        """
+        logging.debug("getting computer metadata")
+        self._identity = {
+            "username": getpass.getuser(),      # username
+            "hostname": platform.uname().node   # hostname
+        }
+        self._refreshed_at = now
+        self._wall_anchor = wall_now
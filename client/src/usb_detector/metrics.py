@@ -0,0 +1,394 @@
+import bisect
+import json
+import logging
+import os
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread, Event
+from time import perf_counter
+
+# default upper bounds of the histogram buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# prefix of the names of all metrics
+PREFIX = "usb_detector_"
+
+# content type of the Prometheus text format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics = {}               # registered metrics (name -> metric)
+_metrics_lock = Lock()      # lock guarding _metrics
+_http_server = None         # local HTTP server exposing the metrics (None if disabled)
+_snapshot_writer = None     # instance of SnapshotWriter (None if disabled)
+
+
+class Histogram:
+    """This class counts observed values (durations) in buckets (see Prometheus histograms)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS):
+        """Constructor of the class.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param buckets: upper bounds of the buckets (sorted)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def observe(self, value: float):
+        """Records an observed value.
+
+        :param value: observed value
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Measures the duration of the with-block and records it."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """Returns the current state of the histogram.
+
+        :return: dictionary with the count, sum, and cumulative counts of the buckets
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "count": running,
+            "sum": total,
+            "buckets": {str(bound): count for bound, count in zip(self.buckets + ("+Inf",), cumulative)}
+        }
+
+    def mean(self):
+        """Returns the mean of the observed values.
+
+        :return: mean value or None if nothing has been observed
+        """
+        with self._lock:
+            count = sum(self._counts)
+            return self._sum / count if count else None
+
+    def render(self) -> list:
+        """Renders the histogram in the Prometheus text format.
+
+        :return: list of the lines
+        """
+        snapshot = self.snapshot()
+        lines = [f'{self.name}_bucket{{le="{bound}"}} {count}' for bound, count in snapshot["buckets"].items()]
+        lines.append(f"{self.name}_sum {snapshot['sum']}")
+        lines.append(f"{self.name}_count {snapshot['count']}")
+        return lines
+
+
+class Counter:
+    """This class counts events, optionally split by the value of a label (e.g. result)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label: str = None):
+        """Constructor of the class.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param label: name of the label the events are split by (None if they are not split)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, label_value: str = None, amount: float = 1):
+        """Increments the counter.
+
+        :param label_value: value of the label (None if the events are not split)
+        :param amount: amount the counter is incremented by
+        """
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def snapshot(self):
+        """Returns the current value(s) of the counter.
+
+        :return: value or dictionary (value of the label -> value) if the events are split
+        """
+        with self._lock:
+            if self.label is None:
+                return self._values.get(None, 0)
+            return dict(self._values)
+
+    def render(self) -> list:
+        """Renders the counter in the Prometheus text format.
+
+        :return: list of the lines
+        """
+        if self.label is None:
+            return [f"{self.name} {self.snapshot()}"]
+        return [f'{self.name}{{{self.label}="{value}"}} {count}' for value, count in sorted(self.snapshot().items())]
+
+
+class CallbackMetric:
+    """This class reads the value of a metric from a function when the metrics are exported.
+
+    It exposes values that are already tracked elsewhere (e.g. the depth of the cache).
+    """
+
+    def __init__(self, name: str, documentation: str, function, kind: str = "gauge"):
+        """Constructor of the class.
+
+        :param name: name of the metric
+        :param documentation: description of the metric
+        :param function: function returning the current value (None if it is not available)
+        :param kind: type of the metric (gauge or counter)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self._function = function
+
+    def snapshot(self):
+        """Returns the current value of the metric.
+
+        :return: value or None if it is not available
+        """
+        try:
+            return self._function()
+        except Exception:
+            logging.exception(f"reading of metric {self.name} failed")
+            return None
+
+    def render(self) -> list:
+        """Renders the metric in the Prometheus text format.
+
+        :return: list of the lines
+        """
+        value = self.snapshot()
+        return [] if value is None else [f"{self.name} {value}"]
+
+
+def _register(metric):
+    """Registers a metric (the metric registered first under the same name is kept).
+
+    :param metric: metric to be registered
+    :return: registered metric
+    """
+    with _metrics_lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def histogram(name: str, documentation: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """Registers and returns a histogram.
+
+    :param name: name of the metric (without the prefix)
+    :param documentation: description of the metric
+    :param buckets: upper bounds of the buckets
+    :return: instance of Histogram
+    """
+    return _register(Histogram(PREFIX + name, documentation, buckets))
+
+
+def counter(name: str, documentation: str, label: str = None) -> Counter:
+    """Registers and returns a counter.
+
+    :param name: name of the metric (without the prefix)
+    :param documentation: description of the metric
+    :param label: name of the label the events are split by
+    :return: instance of Counter
+    """
+    return _register(Counter(PREFIX + name, documentation, label))
+
+
+def callback(name: str, documentation: str, function, kind: str = "gauge") -> CallbackMetric:
+    """Registers and returns a metric whose value is read from a function.
+
+    :param name: name of the metric (without the prefix)
+    :param documentation: description of the metric
+    :param function: function returning the current value
+    :param kind: type of the metric (gauge or counter)
+    :return: instance of CallbackMetric
+    """
+    return _register(CallbackMetric(PREFIX + name, documentation, function, kind))
+
+
+# metrics recorded by the client
+SCAN_DURATION = histogram("scan_duration_seconds", "Duration of a scan of the USB devices")
+POWERSHELL_ROUND_TRIP = histogram("powershell_pnp_seconds", "Round trip of the pnp powershell command")
+POWERSHELL_RESTARTS = counter("powershell_restarts_total", "Number of restarts of the powershell process",
+                              label="reason")
+SEND_DURATION = histogram("send_duration_seconds", "Duration of a request sending data to the server")
+SEND_RESULTS = counter("sends_total", "Number of requests sent to the server", label="result")
+
+
+def record_send(seconds: float, result: str):
+    """Records the duration and the result of a request sent to the server.
+
+    :param seconds: duration of the request
+    :param result: result of the request (sent, failed, or rejected)
+    """
+    SEND_DURATION.observe(seconds)
+    SEND_RESULTS.inc(result)
+
+
+def render_prometheus() -> str:
+    """Renders all metrics in the Prometheus text format.
+
+    :return: text exposition of the metrics
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def snapshot() -> dict:
+    """Returns the current values of all metrics.
+
+    :return: dictionary (name of the metric -> value)
+    """
+    with _metrics_lock:
+        metrics = list(_metrics.values())
+    return {metric.name[len(PREFIX):]: metric.snapshot() for metric in metrics}
+
+
+def summary() -> dict:
+    """Returns a compact summary of the metrics (it is small enough to be sent with payloads).
+
+    :return: dictionary of the mean durations (milliseconds), results of the requests, and the cache
+    """
+    results = SEND_RESULTS.snapshot()
+    values = snapshot()
+    return {
+        "scan_ms": _milliseconds(SCAN_DURATION.mean()),
+        "ps_ms": _milliseconds(POWERSHELL_ROUND_TRIP.mean()),
+        "send_ms": _milliseconds(SEND_DURATION.mean()),
+        "sent": results.get("sent", 0),
+        "failed": results.get("failed", 0),
+        "cache": values.get("cache_depth"),
+        "evicted": values.get("cache_evictions_total")
+    }
+
+
+def _milliseconds(seconds):
+    """Converts seconds into (rounded) milliseconds.
+
+    :param seconds: number of seconds (or None)
+    :return: number of milliseconds (or None)
+    """
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Handler of the requests of the local metrics endpoint."""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Starts a local HTTP server exposing the metrics (GET /metrics) on a thread of its own.
+
+    :param port: port the server listens on (0 picks a free port)
+    :param host: address the server listens on (localhost only by default)
+    :return: instance of the server
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    thread = Thread(target=server.serve_forever, name="metrics-http")
+    thread.daemon = True
+    thread.start()
+    logging.info(f"metrics are exposed at http://{host}:{server.server_port}/metrics")
+    return server
+
+
+class SnapshotWriter:
+    """This class periodically writes the snapshot of the metrics into a JSON file.
+
+    The file is replaced atomically, so a reader never sees a partially written file.
+    """
+
+    def __init__(self, filename: str, period_seconds: float):
+        """Constructor of the class.
+
+        :param filename: path to the JSON file
+        :param period_seconds: number of seconds between two snapshots
+        """
+        self.filename = filename
+        self.period_seconds = period_seconds
+        self._stop = Event()
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self):
+        """Writes the current snapshot of the metrics into the file."""
+        temp_filename = self.filename + ".tmp"
+        with open(temp_filename, "w") as file:
+            json.dump(snapshot(), file, indent=2)
+        os.replace(temp_filename, self.filename)
+
+    def start(self):
+        """Starts writing the snapshots on a thread of its own."""
+        thread = Thread(target=self._run, name="metrics-snapshot")
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """Stops writing the snapshots."""
+        self._stop.set()
+
+    def _run(self):
+        """Keeps writing the snapshots (thread)."""
+        while not self._stop.wait(self.period_seconds):
+            try:
+                self.write()
+            except OSError as error:
+                logging.error(f"writing of the metrics snapshot failed: {error}")
+
+
+def metrics_set_config(config):
+    """Starts the exporters of the metrics enabled in the configuration file.
+
+    :param config: instance of Config (config manager)
+    """
+    global _http_server, _snapshot_writer
+    if config.metrics_http_port > 0 and _http_server is None:
+        _http_server = start_http_server(config.metrics_http_port)
+    if config.metrics_snapshot_file and _snapshot_writer is None:
+        _snapshot_writer = SnapshotWriter(config.metrics_snapshot_file, config.metrics_snapshot_period_seconds)
+        _snapshot_writer.start()
@@ -0,0 +1,123 @@
+import logging
+import time
+from collections import namedtuple
+
+from diskcache import Cache
+
+# single entry of the outbox
+OutboxEntry = namedtuple("OutboxEntry", ["key", "payload", "enqueued_at", "attempts"])
+
+
+class Outbox:
+    """This class is a durable FIFO queue of the payloads that are yet to be delivered.
+
+    It is built on top of a disk-based cache (diskcache). The payloads are not
+    removed when they are read (peek); they are removed only once the server has
+    confirmed their delivery (ack). A payload that fails to be delivered stays
+    where it is and only its attempt count is incremented (nack), so neither
+    a crash nor a failed request can lose or reorder the payloads. If the outbox
+    is full, the oldest payload is discarded.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        """Constructor of the class.
+
+        :param directory: directory the outbox is stored in
+        :param max_entries: maximum number of payloads held in the outbox (at least 1)
+        """
+        if max_entries < 1:
+            raise ValueError(f"Maximum number of cached payloads must be at least 1 (got {max_entries})")
+
+        self.max_entries = max_entries
+        self._cache = Cache(directory=directory)
+
+        # number of payloads discarded because the outbox was full
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def put(self, payload: dict):
+        """Appends a payload to the end of the queue.
+
+        If the outbox is full, the oldest payload is discarded.
+
+        :param payload: payload to be delivered
+        """
+        with self._cache.transact():
+            while len(self._cache) >= self.max_entries:
+                key, oldest = self._cache.pull()
+                if key is None:
+                    # There is nothing left to discard (the entries are not part of the queue).
+                    break
+                self.evictions += 1
+                logging.warning(f"cache is full - discarding payload = {_entry_payload(oldest)}")
+            self._cache.push({"payload": payload, "enqueued_at": time.time(), "attempts": 0})
+
+    def peek(self, count: int) -> list:
+        """Returns (without removing) up to the given number of the oldest entries.
+
+        :param count: maximum number of entries
+        :return: list of OutboxEntry
+        """
+        entries = []
+        for key in self._cache.iterkeys():
+            if len(entries) >= count:
+                break
+            value = self._cache.get(key)
+            if value is not None:
+                entries.append(_to_entry(key, value))
+        return entries
+
+    def ack(self, entry: OutboxEntry):
+        """Removes an entry whose payload has been delivered.
+
+        :param entry: entry returned by peek
+        """
+        self._cache.delete(entry.key)
+
+    def nack(self, entry: OutboxEntry):
+        """Records a failed attempt to deliver the payload of an entry.
+
+        The entry stays at its position in the queue.
+
+        :param entry: entry returned by peek
+        """
+        with self._cache.transact():
+            if entry.key in self._cache:
+                self._cache.set(entry.key, {"payload": entry.payload, "enqueued_at": entry.enqueued_at,
+                                            "attempts": entry.attempts + 1})
+
+    def stats(self) -> dict:
+        """Returns statistics of the outbox.
+
+        :return: dictionary of the statistics
+        """
+        return {
+            "depth": len(self._cache),
+            "evictions": self.evictions
+        }
+
+
+def _to_entry(key, value) -> OutboxEntry:
+    """Creates an entry out of a value stored in the cache.
+
+    The payloads cached by older versions of the application (plain
+    payloads without any metadata) are read as well.
+
+    :param key: key of the value in the cache
+    :param value: value stored in the cache
+    :return: instance of OutboxEntry
+    """
+    if isinstance(value, dict) and "payload" in value and "attempts" in value:
+        return OutboxEntry(key, value["payload"], value["enqueued_at"], value["attempts"])
+    return OutboxEntry(key, value, None, 0)
+
+
+def _entry_payload(value):
+    """Returns the payload of a value stored in the cache.
+
+    :param value: value stored in the cache
+    :return: payload
+    """
+    return _to_entry(None, value).payload
@@ -0,0 +1,87 @@
+from time import monotonic
+
+
+class AdaptiveScheduler:
+    """This class schedules the scans of the USB devices.
+
+    Right after a USB device has been connected or disconnected, the devices
+    are scanned with the minimal period. While the set of the connected devices
+    stays the same, the period is multiplied by the backoff factor up to the
+    maximal period. The next scan is always planned relative to the start
+    of the previous one, so the scans neither overlap nor drift.
+    """
+
+    def __init__(self, min_period: float, max_period: float, backoff_factor: float = 2, clock=monotonic):
+        """Constructor of the class.
+
+        :param min_period: scan period (seconds) used right after a change
+        :param max_period: maximal scan period (seconds) while nothing changes
+        :param backoff_factor: number by which the period is multiplied after each scan with no change
+        :param clock: function returning the current (monotonic) time in seconds
+        """
+        self.min_period = min_period
+        self.max_period = max(min_period, max_period)
+        self.backoff_factor = backoff_factor
+        self._clock = clock
+
+        # current scan period
+        self.period = min_period
+
+        # time the last scan started at
+        self._last_scan_start = None
+
+        # statistics of the scan durations
+        self.scan_count = 0
+        self.last_scan_duration = 0.0
+        self.min_scan_duration = None
+        self.max_scan_duration = 0.0
+        self.total_scan_duration = 0.0
+
+    def scan_started(self):
+        """Records the start of a scan."""
+        self._last_scan_start = self._clock()
+
+    def scan_finished(self, changed: bool):
+        """Records the end of a scan and adjusts the scan period.
+
+        :param changed: True if any USB device was connected or disconnected during the scan
+        """
+        duration = self._clock() - self._last_scan_start
+
+        self.scan_count += 1
+        self.last_scan_duration = duration
+        self.min_scan_duration = duration if self.min_scan_duration is None else min(self.min_scan_duration, duration)
+        self.max_scan_duration = max(self.max_scan_duration, duration)
+        self.total_scan_duration += duration
+
+        # Scan fast after a change, back off exponentially otherwise.
+        if changed:
+            self.period = self.min_period
+        else:
+            self.period = min(self.period * self.backoff_factor, self.max_period)
+
+    def seconds_until_next_scan(self) -> float:
+        """Returns the number of seconds until the next scan is supposed to start.
+
+        If the last scan took longer than the period, the next scan
+        is supposed to start right away.
+
+        :return: number of seconds to wait
+        """
+        if self._last_scan_start is None:
+            return 0.0
+        return max(0.0, self._last_scan_start + self.period - self._clock())
+
+    def stats(self) -> dict:
+        """Returns the current scan period and statistics of the scan durations.
+
+        :return: dictionary of the statistics (seconds)
+        """
+        return {
+            "period": self.period,
+            "scan_count": self.scan_count,
+            "last_scan_duration": self.last_scan_duration,
+            "min_scan_duration": self.min_scan_duration or 0.0,
+            "max_scan_duration": self.max_scan_duration,
+            "mean_scan_duration": self.total_scan_duration / self.scan_count if self.scan_count else 0.0
+        }
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+
+from .devices import device_key
+
+# suffix of the file holding the changes made since the last compaction
+JOURNAL_SUFFIX = ".journal"
+
+# suffix of the temporary file the snapshot is written into
+TEMP_SUFFIX = ".tmp"
+
+# operations recorded in the journal
+OP_ADD = "add"
+OP_REMOVE = "remove"
+
+
+class DeviceStateStore:
+    """This class persists the list of the currently connected USB devices.
+
+    The state is made of a snapshot file (JSON list of the devices) and an
+    append-only journal of the changes (one JSON object per line) made since
+    the snapshot was written. A change therefore costs only as much as the number
+    of the devices involved. Once the journal grows over the compaction threshold,
+    a new snapshot is written atomically (temporary file, fsync, rename) and
+    the journal is emptied. As the replay of the journal is idempotent,
+    a crash at any point leaves a consistent state behind.
+    """
+
+    def __init__(self, filename: str, compaction_threshold: int = 100):
+        """Constructor of the class.
+
+        :param filename: path to the snapshot file
+        :param compaction_threshold: number of journal entries after which a new snapshot is written
+        """
+        self.filename = filename
+        self.journal_filename = filename + JOURNAL_SUFFIX
+        self.compaction_threshold = compaction_threshold
+
+        # current state (device key -> device)
+        self._devices = {}
+        self._journal_entries = 0
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @property
+    def devices(self) -> list:
+        """Returns the list of the currently connected USB devices.
+
+        :return: list of the devices
+        """
+        return list(self._devices.values())
+
+    def load(self) -> list:
+        """Loads the state from the disk.
+
+        It reads the snapshot and replays the journal on top of it.
+        A journal entry that was not written completely (the application
+        crashed in the middle of writing it) is ignored. If the journal
+        is not empty, the state is compacted right away, so that no new
+        entry gets appended to a partially written line.
+
+        :return: list of the lastly connected USB devices
+        """
+        self._devices = {}
+        try:
+            with open(self.filename, "r") as file:
+                for device in json.load(file):
+                    self._devices.setdefault(device_key(device), device)
+        except FileNotFoundError:
+            logging.info(f"there is no snapshot of the connected devices ({self.filename})")
+        except (IOError, ValueError) as error:
+            logging.error(f"loading of last connected devices failed: {error}")
+
+        replayed, skipped = self._replay_journal()
+        logging.debug(f"loaded {len(self._devices)} connected devices ({replayed} journal entries replayed, "
+                      f"{skipped} skipped)")
+
+        if replayed > 0 or skipped > 0:
+            self.compact()
+        return self.devices
+
+    def apply(self, connected_devices: list, disconnected_devices: list):
+        """Records the devices that were just connected/disconnected.
+
+        :param connected_devices: list of the USB devices that were just plugged in
+        :param disconnected_devices: list of the USB devices that were just unplugged
+        """
+        entries = [(OP_ADD, device) for device in connected_devices] + \
+                  [(OP_REMOVE, device) for device in disconnected_devices]
+        if not entries:
+            return
+
+        for op, device in entries:
+            self._apply_entry(op, device)
+
+        if self._journal_entries + len(entries) >= self.compaction_threshold:
+            self.compact()
+            return
+
+        # Append the changes to the journal and make sure they hit the disk.
+        with open(self.journal_filename, "a") as file:
+            file.write("".join(json.dumps({"op": op, "device": device}) + "\n" for op, device in entries))
+            file.flush()
+            os.fsync(file.fileno())
+        self._journal_entries += len(entries)
+
+    def compact(self):
+        """Writes a new snapshot of the state atomically and empties the journal."""
+        temp_filename = self.filename + TEMP_SUFFIX
+        with open(temp_filename, "w") as file:
+            json.dump(self.devices, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_filename, self.filename)
+        _fsync_directory(self.filename)
+
+        # The journal is emptied only after the snapshot has been replaced,
+        # so that no change gets lost if the application crashes in between.
+        with open(self.journal_filename, "w"):
+            pass
+        self._journal_entries = 0
+
+    def _apply_entry(self, op: str, device):
+        """Applies a single change to the in-memory state.
+
+        :param op: operation (add/remove)
+        :param device: USB device the change concerns
+        """
+        key = device_key(device)
+        if op == OP_ADD:
+            self._devices.setdefault(key, device)
+        else:
+            self._devices.pop(key, None)
+
+    def _replay_journal(self) -> tuple:
+        """Replays the journal on top of the in-memory state.
+
+        :return: number of the replayed entries and number of the skipped (damaged) ones
+        """
+        replayed = skipped = 0
+        try:
+            with open(self.journal_filename, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                        op, device = entry["op"], entry["device"]
+                    except (ValueError, TypeError, KeyError):
+                        logging.warning(f"skipping incomplete journal entry: {line!r}")
+                        skipped += 1
+                        continue
+                    self._apply_entry(op, device)
+                    replayed += 1
+        except FileNotFoundError:
+            pass
+        return replayed, skipped
+
+
+def _fsync_directory(filename: str):
+    """Makes sure the renaming of a file in a directory is persisted (POSIX only).
+
+    :param filename: path to the file that was renamed
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,99 @@
+import logging
+import os
+
+from .device_reader import DeviceReader
+
+# directory that holds all USB devices on Linux
+SYSFS_USB_DEVICES_PATH = "/sys/bus/usb/devices"
+
+
+class SysfsUsbReader(DeviceReader):
+    """This class reads the USB devices connected to the computer from sysfs (Linux).
+
+    Each USB device is represented by a directory in /sys/bus/usb/devices
+    which contains the idVendor, idProduct, and serial files. The files
+    are read directly, so no subprocess needs to be spawned.
+    """
+
+    def __init__(self, config, devices_path: str = SYSFS_USB_DEVICES_PATH):
+        """Constructor of the class.
+
+        :param config: instance of Config (config manager)
+        :param devices_path: path to the directory that holds the USB devices
+        """
+        self.config = config
+        self.devices_path = devices_path
+        # The prefixes are compared to an instance id built in the same format
+        # as the one reported by Windows, e.g. USB\VID_064F&PID_2AF9.
+        self._instance_id_prefixes = tuple(config.pnp_device_id_suffixes)
+        # set of devices from which the application
+        # could not retrieve a serial number
+        self._invalid_devices = set()
+
+    def read_connected_devices(self):
+        """Reads and returns all USB devices that are currently connected to the computer.
+
+        It iterates over the directories in sysfs and for each device that matches
+        one of the configured instance id prefixes, it retrieves its vendor id, product id,
+        and serial number. If the application fails to retrieve the serial number
+        of a device, it will log it only once to prevent "spam" logs.
+
+        :return: list of all USB devices connected to the PC (None if the sysfs
+                 directory could not be read)
+        """
+        logging.debug("reading all currently connected devices")
+
+        try:
+            entries = list(os.scandir(self.devices_path))
+        except OSError as error:
+            logging.error(f"Failed to read the USB devices from {self.devices_path}: {error}")
+            return None
+
+        # Create an empty list of USB devices.
+        detected_devices = []
+
+        for entry in entries:
+            # Skip the interfaces of the devices (e.g. 1-1:1.0)
+            # as they do not hold any identifiers.
+            vendor_id = _read_attribute(entry.path, "idVendor")
+            product_id = _read_attribute(entry.path, "idProduct")
+            if vendor_id is None or product_id is None:
+                continue
+
+            # Use the same (upper case) format of the ids as the powershell does.
+            vendor_id = vendor_id.upper()
+            product_id = product_id.upper()
+            if not f"USB\\VID_{vendor_id}&PID_{product_id}".startswith(self._instance_id_prefixes):
+                continue
+
+            serial_number = _read_attribute(entry.path, "serial")
+            if serial_number is None:
+                if entry.name not in self._invalid_devices:
+                    logging.warning(f"Could not retrieve serial number from device {entry.path}")
+                    self._invalid_devices.add(entry.name)
+                continue
+            self._invalid_devices.discard(entry.name)
+
+            # Append the record into the list of the connected USB devices.
+            detected_devices.append({
+                "vendor_id": vendor_id,
+                "product_id": product_id,
+                "serial_number": serial_number
+            })
+
+        # Return the list of currently plugged USB devices.
+        return detected_devices
+
+
+def _read_attribute(device_path: str, name: str):
+    """Reads a single attribute (file) of a USB device in sysfs.
+
+    :param device_path: path to the directory of the device
+    :param name: name of the attribute
+    :return: value of the attribute or None if it does not exist
+    """
+    try:
+        with open(os.path.join(device_path, name), "r") as file:
+            return file.read().strip() or None
+    except OSError:
+        return None
@@ -2,29 +2,117 @@ import logging
 
 import subprocess
 import json
+import queue
 import re
+import time
+from functools import lru_cache
+from threading import Thread
 
-MAX_ATTEMPT_COUNT = 1000
+from . import metrics
+from .backoff import ExponentialBackoff
+from .device_reader import DeviceReader
+from .sysfs_reader import SysfsUsbReader
 
+# sequence printed out by the powershell after each JSON document
+RECORD_SEPARATOR = b"#USB-DETECTOR-END-OF-RECORD#"
 
-class UsbReader:
+# maximum number of bytes read from the powershell output at a time
+CHUNK_SIZE = 64 * 1024
+
+# maximum number of instance ids whose parse results are cached
+INSTANCE_ID_CACHE_SIZE = 1024
+
+# pattern of an instance id, e.g. USB\VID_064F&PID_2AF9\7&11EE4411&1&0000
+INSTANCE_ID_PATTERN = re.compile(r"VID_(?P<vendor_id>\w+)&PID_(?P<product_id>\w+)\\(?P<serial_number>\w+)")
+
+# command line of the powershell process the commands are run in
+POWERSHELL_ARGS = ("powershell.exe", "-NoLogo", "-NoProfile")
+
+
+def powershell_command(command: bytes) -> bytes:
+    """Returns a command that prints out the record separator after its output.
+
+    The record separator is concatenated by the powershell itself, so it
+    cannot be matched in the echo of the command.
+
+    :param command: powershell command (a single line)
+    :return: command terminated by the record separator and a new line
+    """
+    return command + b"; Write-Output ('" + RECORD_SEPARATOR[:14] + b"' + '" + RECORD_SEPARATOR[14:] + b"')\n"
+
+
+# command checking that the powershell responds (it prints out an empty record)
+PING_COMMAND = powershell_command(b"$null")
+
+# characters with a special meaning in the patterns of the -like operator
+WILDCARD_CHARACTERS = re.compile(r"([\[\]*?`])")
+
+
+def build_pnp_command(prefixes: list, prefilter: bool = True) -> bytes:
+    """Builds the command listing the instance ids of the connected devices.
+
+    If prefilter is set, the devices are filtered by the powershell itself
+    (Where-Object on the instance id prefixes), so only the devices that
+    should be detected are serialized, sent through the pipe, and parsed.
+    The result is still checked by InstanceIdParser.
+
+    :param prefixes: instance id prefixes of the devices that should be detected
+    :param prefilter: True if the devices should be filtered by the powershell
+    :return: command terminated by the record separator (see powershell_command)
+    """
+    command = "Get-PnpDevice -Class 'HIDClass' -Status 'OK'"
+    if prefilter and prefixes:
+        conditions = " -or ".join(f"$_.InstanceId -like '{_like_pattern(prefix)}*'" for prefix in prefixes)
+        command += f" | Where-Object {{ {conditions} }}"
+    command += " | Select-Object InstanceId | ConvertTo-Json -Compress"
+    return powershell_command(command.encode("utf-8"))
+
+
+def _like_pattern(text: str) -> str:
+    """Escapes the text, so it is matched literally in a single-quoted -like pattern.
+
+    :param text: text to be escaped
+    :return: escaped text
+    """
+    return WILDCARD_CHARACTERS.sub(r"`\1", text).replace("'", "''")
+
+
+def create_usb_reader(config) -> DeviceReader:
+    """Creates the USB device reader selected in the configuration file.
+
+    :param config: instance of Config (config manager)
+    :return: instance of the USB device reader
+    """
+    if config.usb_reader == "sysfs":
+        return SysfsUsbReader(config)
+    if config.usb_reader == "powershell":
+        return UsbReader(config)
+    raise ValueError(f"Unknown USB reader \"{config.usb_reader}\"")
+
+
+class UsbReader(DeviceReader):
 
     def __init__(self, config):
-        self.powershell_process = subprocess.Popen(["powershell.exe"],
-                                                   stdout=subprocess.PIPE,
-                                                   stdin=subprocess.PIPE,
-                                                   stderr=subprocess.PIPE,
-                                                   startupinfo=None)
-        self.pnp_command = b"Get-PnpDevice -Class 'HIDClass' -Status 'OK' |" \
-                           b" Select-Object InstanceId | ConvertTo-Json\n"
+        self.pnp_command = build_pnp_command(config.pnp_device_id_suffixes, config.pnp_prefilter)
         self.config = config
-        # list of devices from which the application
-        # could not retrieve a serial number
-        self._invalid_devices = []
+        self._instance_id_parser = InstanceIdParser(config.pnp_device_id_suffixes)
+        self._worker = PowerShellWorker(timeout_seconds=config.powershell_timeout_seconds,
+                                        ping_timeout_seconds=config.powershell_ping_timeout_seconds,
+                                        ping_idle_seconds=config.powershell_ping_idle_seconds,
+                                        backoff=ExponentialBackoff(config.powershell_restart_backoff_seconds,
+                                                                   config.powershell_max_restart_backoff_seconds))
+        # Start the powershell right away, so it warms up before the first scan.
+        self._worker.start()
+
+    def __enter__(self):
+        return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        self.powershell_process.stdin.close()
-        self.powershell_process.stdout.close()
+        self.close()
+
+    def close(self):
+        """Stops the powershell process."""
+        self._worker.close()
 
 #    def read_connected_devices(self):
         """Reads and returns all USB devices that are currently connected to the computer.
@@ -81,70 +169,406 @@ class UsbReader:
         # Return the list of currently plugged USB devices.
         # return detected_devices
 
+    def read_connected_devices(self):
+        return self.read_connected_devices_power_shell()
+
     def read_connected_devices_power_shell(self):
         """Reads and returns all USB devices that are currently connected to the computer.
 
         It iterates over devices detected by powershell Get-PnpDevice command
         and for each of them, it tries to retrieve its vendor id, product id, and serial number.
-        If the application fails to retrieve the serial number of a device, it
-        will store it into an in-RAM list to prevent "spam" logs. Once the application
-        manages to read the serial number, the device will be removed from the list.
+        The instance ids are parsed by InstanceIdParser, which caches the results,
+        so a device that stays plugged in is parsed (and possibly logged as invalid) only once.
 
-        :return: list of all USB devices connected to the PC
+        :return: list of all USB devices connected to the PC (None if the output
+                 of the powershell could not be read)
         """
         logging.debug("reading all currently connected devices")
 
         # Create an empty list of USB devices.
         detected_devices = []
-        self.powershell_process.stdin.write(self.pnp_command)
-        self.powershell_process.stdin.flush()
-
-        out = self.read_json_input()
+        json_devices = self._worker.execute(self.pnp_command, "pnp")
+        if json_devices is None:
+            return None
 
-        json_devices = json.loads(out)
         for json_device in json_devices:
-            for id_suffix in self.config.pnp_device_id_suffixes:
-                if id_suffix in json_device['InstanceId']:
-                    detected_device = {}
-                    try:
-                        detected_device['vendor_id'] = re.search("(?<=VID_)[\\d\\w]+", json_device['InstanceId']).group(0)
-                        detected_device['product_id'] = pid = re.search("(?<=PID_)[\\d\\w]+",
-                                                                        json_device['InstanceId']).group(0)
-                        detected_device['serial_number'] = re.search("(?<=PID_" + pid + "\\\\)[\\d\\w]+",
-                                                                     json_device['InstanceId']).group(0)
-
-                        if detected_device in self._invalid_devices:
-                            self._invalid_devices.remove(detected_device)
-
-                        # Append the record into the list of the connected USB devices.
-                        detected_devices.append(detected_device)
-                    except ValueError:
-                        # If you fail, store the device into the in-RAM list (if it is not already there).
-                        logging.warning(f"Could not retrieve serial number from device {json_device}")
+            # Skip all devices that are not supposed to be detected
+            # or whose serial number could not be retrieved.
+            detected_device = self._instance_id_parser.parse(json_device['InstanceId'])
+            if detected_device is not None:
+                # Append the record into the list of the connected USB devices.
+                detected_devices.append(detected_device)
 
         # Return the list of currently plugged USB devices.
         return detected_devices
 
-    def read_json_input(self):
 
-        last_char = ''
-        attempt = 0
-        result = b""
-        inside_json_array = False
+class PowerShellWorker:
+    """This class supervises a long-lived powershell process the commands are run in.
+
+    Starting the powershell takes seconds, so a single process is kept running
+    and the commands are written into its standard input. The standard output
+    is read by a thread of its own into a queue, so each command can be given
+    a deadline instead of blocking on the pipe forever. If the process exits
+    or does not respond in time, it is killed and started again once the
+    (exponentially growing) restart delay elapses. Before a command is run
+    in a process that has been idle for a while, a cheap ping is sent to it,
+    so a hung process is detected within the (short) ping deadline. The standard
+    error output is drained by another thread and logged, so the pipe cannot fill
+    up and block the process. The round trip of each command is recorded
+    in a histogram of its own (see metrics).
+    """
+
+    def __init__(self, args=POWERSHELL_ARGS, timeout_seconds: float = 30, ping_timeout_seconds: float = 5,
+                 ping_idle_seconds: float = 60, backoff: ExponentialBackoff = None, clock=time.monotonic):
+        """Constructor of the class.
+
+        :param args: command line of the powershell process
+        :param timeout_seconds: number of seconds a command may take
+        :param ping_timeout_seconds: number of seconds a ping may take
+        :param ping_idle_seconds: number of seconds without a response after which the process is pinged
+        :param backoff: instance of ExponentialBackoff (delays between restarts of the process)
+        :param clock: monotonic clock
+        """
+        self.args = list(args)
+        self.timeout_seconds = timeout_seconds
+        self.ping_timeout_seconds = ping_timeout_seconds
+        self.ping_idle_seconds = ping_idle_seconds
+        self._backoff = backoff if backoff is not None else ExponentialBackoff(1, 60)
+        self._clock = clock
+
+        self._process = None        # running powershell process (None if it is not running)
+        self._output = None         # queue of the chunks read from the standard output of the process
+        self._json_reader = None    # instance of FramedJsonReader (documents printed out by the process)
+        self._last_response = None  # time of the last response of the process
+        self._restart_at = 0        # time after which the process may be started again
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self) -> bool:
+        """Starts the powershell process unless it is already running.
+
+        :return: True if the process is running, False if it could not be started
+                 (or the restart delay has not elapsed yet)
+        """
+        if self._process is not None:
+            if self._process.poll() is None:
+                return True
+            self._fail(f"powershell exited with code {self._process.returncode}", "exited")
+
+        if self._clock() < self._restart_at:
+            logging.debug("waiting before the powershell is started again")
+            return False
+
+        try:
+            process = subprocess.Popen(self.args, stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+        except OSError as error:
+            logging.error(f"Failed to start the powershell: {error}")
+            self._restart_at = self._clock() + self._backoff.failure()
+            return False
+
+        logging.info(f"powershell started (pid {process.pid})")
+        self._process = process
+        self._output = queue.Queue()
+        # The output is fed into the reader by the pump thread, not read from the stream.
+        self._json_reader = FramedJsonReader(None)
+        self._last_response = self._clock()
+        Thread(target=_pump_output, args=(process.stdout, self._output), name="powershell-stdout",
+               daemon=True).start()
+        Thread(target=_drain_errors, args=(process.stderr,), name="powershell-stderr", daemon=True).start()
+        return True
 
-        while attempt < MAX_ATTEMPT_COUNT:
-            last_char = self.powershell_process.stdout.read(1)
-            if b'[' == last_char:
-                inside_json_array = True
-                result += last_char
+    def execute(self, command: bytes, name: str = "command"):
+        """Runs a command and returns the JSON document it printed out.
+
+        :param command: command terminated by the record separator (see powershell_command)
+        :param name: name of the command (used in the logs and in the name of its latency histogram)
+        :return: parsed JSON document or None if the powershell is not running or did not respond in time
+        """
+        if not self.start():
+            return None
+        if self._clock() - self._last_response >= self.ping_idle_seconds and self.ping() is None:
+            return None
+        return self._run(command, name, self.timeout_seconds)
+
+    def ping(self):
+        """Checks that the powershell responds.
+
+        :return: empty list or None if the powershell is not running or did not respond in time
+        """
+        if not self.start():
+            return None
+        return self._run(PING_COMMAND, "ping", self.ping_timeout_seconds)
+
+    def close(self):
+        """Stops the powershell process (it is given a moment to exit on its own)."""
+        self._stop(graceful=True)
+
+    def _run(self, command: bytes, name: str, timeout_seconds: float):
+        """Writes a command into the running process and waits for its output.
+
+        :param command: command terminated by the record separator
+        :param name: name of the command
+        :param timeout_seconds: number of seconds the command may take
+        :return: parsed JSON document or None if the process did not respond in time
+                 (or its output could not be parsed)
+        """
+        start = self._clock()
+        try:
+            self._process.stdin.write(command)
+            self._process.stdin.flush()
+        except OSError as error:
+            self._fail(f"Failed to write the {name} command to the powershell: {error}", "exited")
+            return None
+
+        deadline = start + timeout_seconds
+        while True:
+            try:
+                document = self._json_reader.next_document()
+            except ValueError as error:
+                # The process is still in sync (the record has been consumed), only its output is unusable.
+                logging.error(f"Failed to parse the output of the {name} command: {error}")
+                self._last_response = self._clock()
+                return None
+            if document is not None:
                 break
-            attempt += 1
-        if inside_json_array:
-            while last_char != b']':
-                last_char = self.powershell_process.stdout.read(1)
-                result += last_char
-            return result
-        else:
-            logging.error("Message output from the powershell is in invalid format! Please check the output of the "
-                          "powershell process")
+
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                self._fail(f"powershell did not respond to the {name} command in {timeout_seconds} s", "timeout")
+                return None
+            try:
+                chunk = self._output.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if not chunk:
+                self._fail(f"powershell closed its output while running the {name} command", "exited")
+                return None
+            self._json_reader.feed(chunk)
+
+        self._last_response = self._clock()
+        self._backoff.success()
+        metrics.histogram(f"powershell_{name}_seconds",
+                          f"Round trip of the {name} powershell command").observe(self._last_response - start)
+        return document
+
+    def _fail(self, message: str, reason: str):
+        """Kills the process after a failure and postpones its restart.
+
+        :param message: description of the failure
+        :param reason: reason of the restart (exited or timeout)
+        """
+        logging.error(message)
+        metrics.POWERSHELL_RESTARTS.inc(reason)
+        self._stop(graceful=False)
+        self._restart_at = self._clock() + self._backoff.failure()
+
+    def _stop(self, graceful: bool):
+        """Stops the process.
+
+        :param graceful: True if the process should be given a moment to exit on its own
+        """
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=2 if graceful else 0)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                logging.error(f"powershell (pid {process.pid}) could not be killed")
+
+
+def _pump_output(stream, output: queue.Queue):
+    """Moves the standard output of the powershell into a queue (thread).
+
+    An empty chunk is put into the queue once the end of the stream is reached.
+
+    :param stream: standard output of the process
+    :param output: queue the chunks are put into
+    """
+    with stream:
+        while True:
+            try:
+                chunk = stream.read1(CHUNK_SIZE)
+            except (OSError, ValueError):
+                chunk = b""
+            output.put(chunk)
+            if not chunk:
+                return
+
+
+def _drain_errors(stream):
+    """Logs the standard error output of the powershell (thread).
+
+    :param stream: standard error output of the process
+    """
+    with stream:
+        try:
+            for line in iter(stream.readline, b""):
+                line = line.decode(errors="replace").rstrip()
+                if line:
+                    logging.warning(f"powershell: {line}")
+        except (OSError, ValueError):
+            pass
+
+
+class FramedJsonReader:
+    """This class reads JSON documents separated by a record separator from a stream.
+
+    Data is read from the stream in large chunks into a reusable buffer
+    instead of byte by byte. Any data that follows a complete record is kept
+    in the buffer, so the reader can be resumed with the next call.
+    """
+
+    def __init__(self, stream, separator: bytes = RECORD_SEPARATOR, chunk_size: int = CHUNK_SIZE):
+        """Constructor of the class.
+
+        :param stream: binary stream the documents are read from
+        :param separator: sequence of bytes that terminates each document
+        :param chunk_size: maximum number of bytes read from the stream at a time
+        """
+        self._stream = stream
+        self._separator = separator
+        self._chunk = bytearray(chunk_size)
+        self._chunk_view = memoryview(self._chunk)
+        self._buffer = bytearray()
+        # position in the buffer from which the separator is searched for
+        self._search_start = 0
+
+    def feed(self, data: bytes):
+        """Appends data to the internal buffer.
+
+        :param data: data read from the stream
+        """
+        self._buffer += data
+
+    def next_document(self):
+        """Returns the next complete document held in the buffer.
+
+        A single JSON object (powershell does not wrap a single result
+        into an array) is returned as a list with one element. An empty
+        record (no devices found) is returned as an empty list.
+
+        :return: parsed JSON document or None if there is no complete record yet
+        :raises ValueError: if the record is not a valid JSON document (the record is skipped)
+        """
+        end = self._buffer.find(self._separator, self._search_start)
+        if end < 0:
+            # Make sure the separator is found even if it is split across two chunks.
+            self._search_start = max(0, len(self._buffer) - len(self._separator) + 1)
             return None
+
+        record = bytes(self._buffer[:end])
+        del self._buffer[:end + len(self._separator)]
+        self._search_start = 0
+        return _parse_record(record)
+
+    def read_document(self):
+        """Reads the stream until a complete document is available.
+
+        :return: parsed JSON document or None if the end of the stream was reached
+        :raises ValueError: if the record is not a valid JSON document (the record is skipped)
+        """
+        while True:
+            document = self.next_document()
+            if document is not None:
+                return document
+
+            # Read as much data as is available (at most the size of the chunk).
+            count = self._stream.readinto1(self._chunk_view)
+            if not count:
+                return None
+            self.feed(self._chunk_view[:count])
+
+
+def _parse_record(record: bytes) -> list:
+    """Parses a single record read from the powershell process.
+
+    Any output preceding the JSON document (e.g. the powershell banner)
+    is skipped. An empty record means that the command found nothing.
+
+    :param record: data of the record (without the separator)
+    :return: list of parsed JSON objects
+    :raises ValueError: if the record holds something else than a JSON document
+    """
+    if not record.strip():
+        return []
+
+    starts = [index for index in (record.find(b"["), record.find(b"{")) if index >= 0]
+    if not starts:
+        raise ValueError(f"no JSON document in the output of the powershell: {record}")
+    document = json.loads(record[min(starts):])
+
+    if isinstance(document, dict):
+        return [document]
+    return document
+
+
+class InstanceIdParser:
+    """This class parses instance ids of the devices reported by the powershell.
+
+    Only the instance ids that start with one of the configured prefixes
+    are parsed. The vendor id, product id, and serial number are retrieved
+    using a single precompiled regular expression. The results are kept
+    in a bounded LRU cache, so the devices that stay connected to the PC
+    are parsed only once.
+    """
+
+    def __init__(self, prefixes: list, cache_size: int = INSTANCE_ID_CACHE_SIZE):
+        """Constructor of the class.
+
+        :param prefixes: instance id prefixes of the devices that should be detected
+        :param cache_size: maximum number of instance ids whose parse results are cached
+        """
+        self._prefixes = tuple(prefixes)
+        self._parse_cached = lru_cache(maxsize=cache_size)(self._parse)
+
+    def parse(self, instance_id: str):
+        """Returns a record of the device identified by the instance id.
+
+        :param instance_id: instance id of the device (e.g. USB\\VID_064F&PID_2AF9\\7&11EE4411&1&0000)
+        :return: USB device (vendor id, product id, and serial number) or None if the device
+                 should not be detected or its instance id could not be parsed
+        """
+        device = self._parse_cached(instance_id)
+        if device is None:
+            return None
+
+        # Return a new record, so the cached values cannot be modified by the caller.
+        return dict(zip(("vendor_id", "product_id", "serial_number"), device))
+
+    def cache_info(self):
+        """Returns statistics of the parse cache (hits, misses, maxsize, currsize).
+
+        :return: statistics of the cache
+        """
+        return self._parse_cached.cache_info()
+
+    def _parse(self, instance_id: str):
+        """Parses the instance id (without using the cache).
+
+        :param instance_id: instance id of the device
+        :return: tuple (vendor id, product id, serial number) or None
+        """
+        if not instance_id.startswith(self._prefixes):
+            return None
+
+        match = INSTANCE_ID_PATTERN.search(instance_id)
+        if match is None:
+            # This is logged only once per device as the result is cached.
+            logging.warning(f"Could not retrieve serial number from device {instance_id}")
+            return None
+
+        return match.group("vendor_id", "product_id", "serial_number")
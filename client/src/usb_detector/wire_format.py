@@ -0,0 +1,96 @@
+import gzip
+import json
+
+# encodings of the data sent to the server
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+ENCODINGS = (ENCODING_JSON, ENCODING_MSGPACK)
+
+# compressions of the data sent to the server (Content-Encoding)
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+
+# content types of the encodings
+CONTENT_TYPES = {
+    ENCODING_JSON: "application/json",
+    ENCODING_MSGPACK: "application/msgpack"
+}
+
+# level of the gzip compression
+GZIP_LEVEL = 6
+
+# level of the zstd compression
+ZSTD_LEVEL = 3
+
+
+class WireFormat:
+    """This class encodes the data (payloads or batches) sent to the server.
+
+    The data is encoded either as JSON or as msgpack (a compact binary
+    format) and it can be compressed with gzip or zstd. The headers
+    of the request (Content-Type, Content-Encoding) tell the server
+    how to decode the body. The msgpack and zstd formats require
+    the msgpack and zstandard packages respectively.
+    """
+
+    def __init__(self, encoding: str = ENCODING_JSON, compression: str = COMPRESSION_NONE):
+        """Constructor of the class.
+
+        :param encoding: encoding of the data (see ENCODINGS)
+        :param compression: compression of the encoded data (see COMPRESSIONS)
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding \"{encoding}\"")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression \"{compression}\"")
+
+        self.encoding = encoding
+        self.compression = compression
+        self.headers = {"Content-Type": CONTENT_TYPES[encoding]}
+
+        if encoding == ENCODING_MSGPACK:
+            import msgpack
+            self._dumps = msgpack.packb
+        else:
+            self._dumps = _json_dumps
+
+        if compression == COMPRESSION_GZIP:
+            self._compress = _gzip_compress
+            self.headers["Content-Encoding"] = COMPRESSION_GZIP
+        elif compression == COMPRESSION_ZSTD:
+            import zstandard
+            self._compress = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress
+            self.headers["Content-Encoding"] = COMPRESSION_ZSTD
+        else:
+            self._compress = None
+
+    def encode(self, data) -> bytes:
+        """Encodes data into the body of a request.
+
+        :param data: data (payload or list of payloads) to be sent
+        :return: body of the request
+        """
+        body = self._dumps(data)
+        if self._compress is not None:
+            body = self._compress(body)
+        return body
+
+
+def _json_dumps(data) -> bytes:
+    """Encodes data as compact JSON.
+
+    :param data: data to be encoded
+    :return: UTF-8 encoded JSON
+    """
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _gzip_compress(body: bytes) -> bytes:
+    """Compresses a body with gzip.
+
+    :param body: body to be compressed
+    :return: compressed body
+    """
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,60 @@
+from client.src.usb_detector.scheduler import AdaptiveScheduler
+
+
+class ClockMock:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def _scan(scheduler, clock, duration, changed):
+    scheduler.scan_started()
+    clock.time += duration
+    scheduler.scan_finished(changed)
+
+
+def test_adaptive_scheduler_1():
+    clock = ClockMock()
+    scheduler = AdaptiveScheduler(1, 8, clock=clock)
+
+    assert scheduler.seconds_until_next_scan() == 0
+
+    for expected_period in (2, 4, 8, 8):
+        _scan(scheduler, clock, 0, changed=False)
+        assert scheduler.period == expected_period
+
+    _scan(scheduler, clock, 0, changed=True)
+    assert scheduler.period == 1
+
+
+def test_adaptive_scheduler_2():
+    clock = ClockMock()
+    scheduler = AdaptiveScheduler(1, 8, clock=clock)
+
+    # The next scan is planned relative to the start of the previous one.
+    _scan(scheduler, clock, 0.5, changed=False)
+    assert scheduler.seconds_until_next_scan() == 1.5
+
+    # A scan that takes longer than the period is followed by another one right away.
+    _scan(scheduler, clock, 10, changed=True)
+    assert scheduler.seconds_until_next_scan() == 0
+
+
+def test_adaptive_scheduler_3():
+    clock = ClockMock()
+    scheduler = AdaptiveScheduler(1, 1, clock=clock)
+
+    _scan(scheduler, clock, 0.25, changed=False)
+    _scan(scheduler, clock, 0.75, changed=False)
+
+    assert scheduler.stats() == {
+        "period": 1,
+        "scan_count": 2,
+        "last_scan_duration": 0.75,
+        "min_scan_duration": 0.25,
+        "max_scan_duration": 0.75,
+        "mean_scan_duration": 0.5
+    }
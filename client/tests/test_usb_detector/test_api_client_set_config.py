@@ -10,9 +10,23 @@ def test_api_client_set_config_1(_init_cache_mock):
             self.server_url = "127.0.0.1"
             self.server_port = "54444"
             self.server_endpoint = "/api/v1/usb-logs"
+            self.server_connect_timeout_seconds = 3
+            self.server_read_timeout_seconds = 10
+            self.server_pool_size = 4
+            self.server_batch_endpoint = "/api/v1/usb-logs/batch"
+            self.batch_max_size = 1
+            self.batch_window_seconds = 1
+            self.cache_max_in_flight = 1
+            self.server_encoding = "json"
+            self.server_compression = "none"
 
     config = Config()
     api_client.api_client_set_config(config)
 
     assert api_client._config is config
     assert api_client._uri == "127.0.0.1:54444/api/v1/usb-logs"
+    assert api_client._timeout == (3, 10)
+    assert api_client._session is not None
+    assert api_client._batch_uri == "127.0.0.1:54444/api/v1/usb-logs/batch"
+    assert api_client._batch_sender is None
+    assert api_client._wire_format.headers == {"Content-Type": "application/json"}
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from client.src.usb_detector import api_client, detector
+from client.src.usb_detector.async_runtime import AsyncRuntime
+from client.src.usb_detector.event_listener import usb_connected_callback, usb_disconnected_callback
+from client.src.usb_detector.outbox import Outbox
+
+pytest.importorskip("aiohttp")
+
+
+class ConfigMock:
+
+    def __init__(self, directory, debounce_hold_seconds=0):
+        self.connected_devices_filename = os.path.join(directory, "devices.json")
+        self.state_compaction_threshold = 100
+        self.scan_period_seconds = 0.01
+        self.max_scan_period_seconds = 0.01
+        self.scan_backoff_factor = 2
+        self.scan_mode = "poll"
+        self.safety_scan_period_seconds = 300
+        self.debounce_hold_seconds = debounce_hold_seconds
+        self.server_connect_timeout_seconds = 1
+        self.server_read_timeout_seconds = 1
+        self.server_pool_size = 2
+        self.batch_max_size = 1
+        self.batch_window_seconds = 0.1
+        self.cache_max_entries = 100
+        self.cache_max_retries = 5
+        self.cache_max_in_flight = 2
+        self.cache_retry_period_seconds = 0.05
+        self.cache_max_backoff_seconds = 0.1
+        self.runtime_queue_size = 10
+        self.runtime_shutdown_timeout_seconds = 2
+
+
+class UsbReaderMock:
+
+    def __init__(self, scans):
+        self._scans = scans
+
+    def read_connected_devices(self):
+        if len(self._scans) > 1:
+            return self._scans.pop(0)
+        return self._scans[0]
+
+
+class FakeServer(ThreadingHTTPServer):
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeRequestHandler)
+        self.payloads = []
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.server.payloads.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _device(serial_number):
+    return {
+        "vendor_id": "064F",
+        "product_id": "2AF9",
+        "serial_number": serial_number
+    }
+
+
+def _run(config, until):
+    async def main():
+        runtime = AsyncRuntime(config)
+        task = asyncio.create_task(runtime.run())
+        for _ in range(200):
+            if until():
+                break
+            await asyncio.sleep(0.01)
+        runtime.stop()
+        await task
+
+    asyncio.run(main())
+
+
+def _patch(config, uri, reader, tmp_path):
+    return mock.patch.multiple(detector, _config=config, _usb_reader=reader, _debouncer=None, _dispatcher=None,
+                               _scheduler=None, _state_store=None, _last_connected_devices=[],
+                               _listeners_connected=[usb_connected_callback],
+                               _listeners_disconnected=[usb_disconnected_callback]), \
+        mock.patch.multiple(api_client, _uri=uri, _config=config, _payload_sink=None,
+                            _cache=Outbox(str(tmp_path / "cache"), config.cache_max_entries))
+
+
+def test_async_runtime_1(fake_server, tmp_path):
+    config = ConfigMock(str(tmp_path))
+    reader = UsbReaderMock([[_device("A")], [_device("A"), _device("B")], [_device("B")]])
+    detector_patch, api_client_patch = _patch(config, f"http://127.0.0.1:{fake_server.server_port}/api/v1/usb-logs",
+                                              reader, tmp_path)
+
+    with detector_patch, api_client_patch:
+        _run(config, lambda: len(fake_server.payloads) >= 3)
+
+        assert [(payload["device"]["serial_number"], payload["status"]) for payload in fake_server.payloads] == \
+               [("A", "connected"), ("B", "connected"), ("A", "disconnected")]
+        assert len(api_client._cache) == 0
+        assert api_client._payload_sink is None
+
+
+def test_async_runtime_2(tmp_path):
+    config = ConfigMock(str(tmp_path))
+    reader = UsbReaderMock([[_device("A")]])
+    detector_patch, api_client_patch = _patch(config, "http://127.0.0.1:1/api/v1/usb-logs", reader, tmp_path)
+
+    with detector_patch, api_client_patch:
+        _run(config, lambda: len(api_client._cache) > 0)
+
+        # The server is not reachable, so the payload is cached.
+        entry, = api_client._cache.peek(10)
+        assert entry.payload["device"] == _device("A")
+
+
+def test_async_runtime_3(fake_server, tmp_path):
+    config = ConfigMock(str(tmp_path), debounce_hold_seconds=60)
+    reader = UsbReaderMock([[_device("A")]])
+    detector_patch, api_client_patch = _patch(config, f"http://127.0.0.1:{fake_server.server_port}/api/v1/usb-logs",
+                                              reader, tmp_path)
+
+    with detector_patch, api_client_patch:
+        _run(config, lambda: detector._debouncer is not None and len(detector._debouncer) > 0)
+
+        # The events held back by the debouncer are sent when the runtime shuts down.
+        assert [payload["device"] for payload in fake_server.payloads] == [_device("A")]
+
+
+def test_async_runtime_4(tmp_path):
+    config = ConfigMock(str(tmp_path))
+    config.batch_max_size = 3
+    runtime = AsyncRuntime(config)
+
+    async def post_mock(uri, data, description):
+        # The batch is rejected because of its second payload.
+        if isinstance(data, list) or data == 1:
+            return api_client.REJECTED
+        return api_client.SENT
+
+    with mock.patch.object(runtime, "_post", post_mock):
+        results = asyncio.run(runtime._send([0, 1, 2]))
+
+    assert results == [api_client.SENT, api_client.REJECTED, api_client.SENT]
+
+
+def test_async_runtime_5(tmp_path):
+    config = ConfigMock(str(tmp_path))
+    scan_threads = []
+    cache_threads = []
+
+    class RecordingReader(UsbReaderMock):
+        def read_connected_devices(self):
+            scan_threads.append(threading.current_thread())
+            return super().read_connected_devices()
+
+    def cache_mock(payload):
+        cache_threads.append(threading.current_thread())
+
+    detector_patch, api_client_patch = _patch(config, "http://127.0.0.1:1/api/v1/usb-logs",
+                                              RecordingReader([[_device("A")]]), tmp_path)
+
+    with detector_patch, api_client_patch, mock.patch.object(api_client, "_cache_failed_payload", cache_mock):
+        _run(config, lambda: len(cache_threads) > 0)
+
+    # Neither the scan nor the cache block the event loop.
+    assert scan_threads and cache_threads
+    assert threading.main_thread() not in scan_threads + cache_threads
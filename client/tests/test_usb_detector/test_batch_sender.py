@@ -0,0 +1,42 @@
+import threading
+
+from client.src.usb_detector.batch_sender import BatchSender
+
+
+def test_batch_sender_1():
+    batches = []
+    sender = BatchSender(3, 60, batches.append)
+
+    for payload in range(7):
+        sender.add(payload)
+
+    assert batches == [[0, 1, 2], [3, 4, 5]]
+    assert len(sender) == 1
+
+    sender.flush()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert len(sender) == 0
+
+
+def test_batch_sender_2():
+    sent = threading.Event()
+    batches = []
+
+    def send(batch):
+        batches.append(batch)
+        sent.set()
+
+    sender = BatchSender(10, 0.05, send)
+    sender.add(1)
+    sender.add(2)
+
+    assert sent.wait(5)
+    assert batches == [[1, 2]]
+
+
+def test_batch_sender_3():
+    batches = []
+    sender = BatchSender(10, 60, batches.append)
+
+    sender.flush()
+    assert batches == []
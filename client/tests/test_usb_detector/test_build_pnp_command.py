@@ -0,0 +1,40 @@
+from client.src.usb_detector.usb_reader import build_pnp_command, RECORD_SEPARATOR
+
+prefixes = ["USB\\VID_064F&PID_2AF9", "USB\\VID_355F&PID_8946"]
+
+
+def test_build_pnp_command_1():
+    command = build_pnp_command(prefixes)
+
+    assert command == b"Get-PnpDevice -Class 'HIDClass' -Status 'OK' |" \
+                      b" Where-Object { $_.InstanceId -like 'USB\\VID_064F&PID_2AF9*' -or" \
+                      b" $_.InstanceId -like 'USB\\VID_355F&PID_8946*' } |" \
+                      b" Select-Object InstanceId | ConvertTo-Json -Compress;" \
+                      b" Write-Output ('#USB-DETECTOR-' + 'END-OF-RECORD#')\n"
+
+
+def test_build_pnp_command_2():
+    command = build_pnp_command(prefixes, prefilter=False)
+
+    assert b"Where-Object" not in command
+    assert command.startswith(b"Get-PnpDevice -Class 'HIDClass' -Status 'OK' | Select-Object InstanceId")
+
+
+def test_build_pnp_command_3():
+    # Without any prefixes, nothing is filtered out by the powershell.
+    assert b"Where-Object" not in build_pnp_command([])
+
+
+def test_build_pnp_command_4():
+    command = build_pnp_command(["USB\\VID_[1]*?", "O'Brien"])
+
+    assert b"-like 'USB\\VID_`[1`]`*`?*'" in command
+    assert b"-like 'O''Brien*'" in command
+
+
+def test_build_pnp_command_5():
+    command = build_pnp_command(prefixes)
+
+    # The command is a single line and the separator is not echoed literally.
+    assert command.count(b"\n") == 1 and command.endswith(b"\n")
+    assert RECORD_SEPARATOR not in command
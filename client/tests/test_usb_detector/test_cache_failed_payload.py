@@ -1,19 +1,5 @@
 from client.src.usb_detector import api_client
-
-
-class CacheMock:
-
-    def __init__(self):
-        self._data = []
-
-    def pop(self):
-        return self._data.pop()
-
-    def append(self, payload):
-        self._data.append(payload)
-
-    def __len__(self):
-        return len(self._data)
+from client.src.usb_detector.outbox import Outbox
 
 
 class ConfigMock:
@@ -22,15 +8,14 @@ class ConfigMock:
         self.cache_max_entries = 5
 
 
-def test_cache_failed_payload_1():
+def test_cache_failed_payload_1(tmp_path):
     payload_mock = {
         "vendor_id": 1,
         "product_id": 2
     }
-    cache = CacheMock()
     config = ConfigMock()
 
-    api_client._cache = cache
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
     api_client._config = config
 
     for _ in range(0, config.cache_max_entries + 1):
@@ -39,15 +24,14 @@ def test_cache_failed_payload_1():
     assert len(api_client._cache) == config.cache_max_entries
 
 
-def test_cache_failed_payload_2():
+def test_cache_failed_payload_2(tmp_path):
     payload_mock = {
         "vendor_id": 1,
         "product_id": 2
     }
-    cache = CacheMock()
     config = ConfigMock()
 
-    api_client._cache = cache
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
     api_client._config = config
     count = int(config.cache_max_entries / 2)
 
@@ -56,3 +40,16 @@ def test_cache_failed_payload_2():
 
     assert len(api_client._cache) == count
 
+
+def test_cache_failed_payload_3(tmp_path):
+    config = ConfigMock()
+
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
+    api_client._config = config
+
+    for index in range(0, config.cache_max_entries + 2):
+        api_client._cache_failed_payload({"index": index})
+
+    # The oldest payloads are discarded.
+    payloads = [entry.payload for entry in api_client._cache.peek(config.cache_max_entries)]
+    assert payloads == [{"index": index} for index in range(2, config.cache_max_entries + 2)]
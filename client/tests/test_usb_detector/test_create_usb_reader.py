@@ -0,0 +1,20 @@
+import pytest
+
+from client.src.usb_detector.sysfs_reader import SysfsUsbReader
+from client.src.usb_detector.usb_reader import create_usb_reader
+
+
+class ConfigMock:
+
+    def __init__(self, usb_reader):
+        self.usb_reader = usb_reader
+        self.pnp_device_id_suffixes = []
+
+
+def test_create_usb_reader_1():
+    assert isinstance(create_usb_reader(ConfigMock("sysfs")), SysfsUsbReader)
+
+
+def test_create_usb_reader_2():
+    with pytest.raises(ValueError):
+        create_usb_reader(ConfigMock("libusb"))
@@ -0,0 +1,46 @@
+from client.src.usb_detector.devices import DeviceKey, DeviceSnapshot, device_key
+
+
+def _device(vendor_id, product_id, serial_number):
+    return {
+        "vendor_id": vendor_id,
+        "product_id": product_id,
+        "serial_number": serial_number
+    }
+
+
+def test_device_key_1():
+    assert device_key(_device("064F", "2AF9", "ABC")) == DeviceKey("064F", "2AF9", "ABC")
+    assert hash(device_key(_device("064F", "2AF9", "ABC"))) == hash(DeviceKey("064F", "2AF9", "ABC"))
+
+
+def test_device_key_2():
+    assert device_key(_device("064F", "2AF9", "ABC")) != device_key(_device("064F", "2AF9", "ABD"))
+
+
+def test_device_key_3():
+    assert device_key(5) == 5
+
+
+def test_device_snapshot_1():
+    snapshot = DeviceSnapshot([_device(1, 2, 3), _device(1, 2, 3), _device(4, 5, 6)])
+
+    assert len(snapshot) == 2
+    assert _device(4, 5, 6) in snapshot
+    assert snapshot.keys == {DeviceKey(1, 2, 3), DeviceKey(4, 5, 6)}
+    assert snapshot.devices == [_device(1, 2, 3), _device(4, 5, 6)]
+
+
+def test_device_snapshot_2():
+    assert len(DeviceSnapshot(None)) == 0
+    assert DeviceSnapshot([]).diff(DeviceSnapshot(None)) == ([], [])
+
+
+def test_device_snapshot_3():
+    previous = DeviceSnapshot([_device(1, 2, 3), _device(4, 5, 6)])
+    current = DeviceSnapshot([_device(4, 5, 6), _device(7, 8, 9)])
+
+    connected, disconnected = current.diff(previous)
+
+    assert connected == [_device(7, 8, 9)]
+    assert disconnected == [_device(1, 2, 3)]
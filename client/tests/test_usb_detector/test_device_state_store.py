@@ -0,0 +1,81 @@
+import json
+import os
+
+from client.src.usb_detector.state_store import DeviceStateStore
+
+
+def _device(serial_number):
+    return {
+        "vendor_id": "064F",
+        "product_id": "2AF9",
+        "serial_number": serial_number
+    }
+
+
+def test_device_state_store_1(tmp_path):
+    filename = str(tmp_path / "data" / "devices.json")
+    store = DeviceStateStore(filename)
+
+    assert store.load() == []
+
+    store.apply([_device("A"), _device("B")], [])
+    store.apply([_device("C")], [_device("A")])
+
+    # Only the journal has been written so far.
+    assert not os.path.exists(filename)
+    assert DeviceStateStore(filename).load() == [_device("B"), _device("C")]
+
+    # Loading the state compacts the journal into the snapshot.
+    with open(filename, "r") as file:
+        assert json.load(file) == [_device("B"), _device("C")]
+    assert os.path.getsize(filename + ".journal") == 0
+
+
+def test_device_state_store_2(tmp_path):
+    filename = str(tmp_path / "devices.json")
+    store = DeviceStateStore(filename, compaction_threshold=3)
+    store.load()
+
+    store.apply([_device("A"), _device("B")], [])
+    store.apply([], [_device("B")])
+
+    with open(filename, "r") as file:
+        assert json.load(file) == [_device("A")]
+    assert os.path.getsize(filename + ".journal") == 0
+
+
+def test_device_state_store_3(tmp_path):
+    filename = str(tmp_path / "devices.json")
+    with open(filename, "w") as file:
+        json.dump([_device("A")], file)
+    with open(filename + ".journal", "w") as file:
+        file.write(json.dumps({"op": "add", "device": _device("B")}) + "\n")
+        file.write(json.dumps({"op": "add", "device": _device("A")}) + "\n")
+        file.write('{"op": "remove", "dev')
+
+    assert DeviceStateStore(filename).load() == [_device("A"), _device("B")]
+
+
+def test_device_state_store_4(tmp_path):
+    filename = str(tmp_path / "devices.json")
+    with open(filename, "w") as file:
+        file.write('[{"vendor_id": "06')
+
+    assert DeviceStateStore(filename).load() == []
+
+
+def test_device_state_store_5(tmp_path):
+    filename = str(tmp_path / "devices.json")
+    with open(filename, "w") as file:
+        json.dump([_device("A")], file)
+    # The journal holds only a partially written entry.
+    with open(filename + ".journal", "w") as file:
+        file.write('{"op": "add", "dev')
+
+    store = DeviceStateStore(filename)
+    assert store.load() == [_device("A")]
+    assert os.path.getsize(filename + ".journal") == 0
+
+    # New entries are not glued onto the damaged line.
+    store.apply([_device("B")], [])
+    assert DeviceStateStore(filename).load() == [_device("A"), _device("B")]
@@ -0,0 +1,59 @@
+from client.src.usb_detector.debouncer import EventDebouncer
+
+
+class ClockMock:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def _device(serial_number):
+    return {
+        "vendor_id": "064F",
+        "product_id": "2AF9",
+        "serial_number": serial_number
+    }
+
+
+def test_event_debouncer_1():
+    clock = ClockMock()
+    debouncer = EventDebouncer(2, clock=clock)
+
+    debouncer.submit([_device("A")], [_device("B")])
+    assert debouncer.poll() == ([], [])
+    assert debouncer.seconds_until_due() == 2
+
+    clock.time = 2
+    assert debouncer.poll() == ([_device("A")], [_device("B")])
+    assert debouncer.seconds_until_due() is None
+    assert debouncer.stats() == {"pending_events": 0, "emitted_events": 2, "suppressed_flaps": 0}
+
+
+def test_event_debouncer_2():
+    clock = ClockMock()
+    debouncer = EventDebouncer(2, clock=clock)
+
+    debouncer.submit([], [_device("A")])
+    clock.time = 1
+    debouncer.submit([_device("A")], [])
+
+    clock.time = 5
+    assert debouncer.poll() == ([], [])
+    assert debouncer.stats() == {"pending_events": 0, "emitted_events": 0, "suppressed_flaps": 1}
+
+
+def test_event_debouncer_3():
+    clock = ClockMock()
+    debouncer = EventDebouncer(2, clock=clock)
+
+    debouncer.submit([_device("A")], [])
+    clock.time = 3
+    assert debouncer.poll() == ([_device("A")], [])
+
+    # The window of the first event is over, so the disconnection is reported.
+    debouncer.submit([], [_device("A")])
+    clock.time = 5
+    assert debouncer.poll() == ([], [_device("A")])
@@ -0,0 +1,40 @@
+import random
+from datetime import datetime, timezone
+
+from client.src.usb_detector.backoff import ExponentialBackoff, parse_retry_after
+
+
+def test_exponential_backoff_1():
+    backoff = ExponentialBackoff(10, 60, rand=lambda: 1)
+
+    assert [backoff.failure() for _ in range(5)] == [10, 20, 40, 60, 60]
+
+    backoff.success()
+    assert backoff.failure() == 10
+
+
+def test_exponential_backoff_2():
+    backoff = ExponentialBackoff(10, 60, rand=lambda: 0)
+
+    assert backoff.failure() == 5
+    assert backoff.failure(retry_after=30) == 30
+    assert backoff.idle_delay() == 5
+
+
+def test_exponential_backoff_3():
+    # The delays of clients that failed at the same time are spread out.
+    delays = [ExponentialBackoff(20, 600, rand=random.Random(seed).random).failure() for seed in range(100)]
+
+    assert all(10 <= delay <= 20 for delay in delays)
+    assert len(set(delays)) == 100
+    assert max(delays) - min(delays) > 5
+
+
+def test_parse_retry_after_1():
+    now = datetime(2022, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Sun, 01 May 2022 12:00:30 GMT", now=now) == 30
+    assert parse_retry_after("Sun, 01 May 2022 11:00:00 GMT", now=now) == 0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,65 @@
+import io
+
+import pytest
+
+from client.src.usb_detector.usb_reader import FramedJsonReader, RECORD_SEPARATOR
+
+
+def _reader(data: bytes, chunk_size: int = 4):
+    return FramedJsonReader(io.BytesIO(data), chunk_size=chunk_size)
+
+
+def test_framed_json_reader_1():
+    data = b'Windows PowerShell\r\n[{"InstanceId":"A"},{"InstanceId":"B"}]\r\n' + RECORD_SEPARATOR + b"\r\n"
+    reader = _reader(data)
+
+    assert reader.read_document() == [{"InstanceId": "A"}, {"InstanceId": "B"}]
+    assert reader.read_document() is None
+
+
+def test_framed_json_reader_2():
+    data = b'{"InstanceId":"A"}\r\n' + RECORD_SEPARATOR + b"\r\n"
+
+    assert _reader(data).read_document() == [{"InstanceId": "A"}]
+
+
+def test_framed_json_reader_3():
+    data = b"\r\n" + RECORD_SEPARATOR + b"\r\n"
+
+    assert _reader(data).read_document() == []
+
+
+def test_framed_json_reader_4():
+    data = b'[{"InstanceId":"A","Ids":[1,[2]]}]' + RECORD_SEPARATOR + b'{"InstanceId":"B"}' + RECORD_SEPARATOR
+    reader = _reader(data, chunk_size=3)
+
+    assert reader.read_document() == [{"InstanceId": "A", "Ids": [1, [2]]}]
+    assert reader.read_document() == [{"InstanceId": "B"}]
+    assert reader.read_document() is None
+
+
+def test_framed_json_reader_5():
+    reader = _reader(b"")
+    reader.feed(b'[{"InstanceId":"A"}]' + RECORD_SEPARATOR[:5])
+
+    assert reader.next_document() is None
+
+    reader.feed(RECORD_SEPARATOR[5:])
+    assert reader.next_document() == [{"InstanceId": "A"}]
+
+
+def test_framed_json_reader_6():
+    assert _reader(b'[{"InstanceId":"A"}]').read_document() is None
+
+
+def test_framed_json_reader_7():
+    data = b"Get-PnpDevice : access denied\r\n" + RECORD_SEPARATOR + b'[{"InstanceId":"A"}' + RECORD_SEPARATOR + \
+        b'{"InstanceId":"B"}' + RECORD_SEPARATOR
+    reader = _reader(data)
+
+    # Unparseable records are reported, not mistaken for "no devices", and the stream stays in sync.
+    with pytest.raises(ValueError):
+        reader.read_document()
+    with pytest.raises(ValueError):
+        reader.read_document()
+    assert reader.read_document() == [{"InstanceId": "B"}]
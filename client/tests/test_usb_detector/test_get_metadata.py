@@ -1,6 +1,6 @@
 import getpass
 import platform
-from datetime import datetime
+from datetime import datetime, timezone
 
 from client.src.usb_detector import event_listener
 
@@ -8,12 +8,14 @@ from client.src.usb_detector import event_listener
 def test_get_metadata_1():
     expected_metadata = {
         "username": getpass.getuser(),
-        "hostname": platform.uname().node,
-        "timestamp": str(datetime.now()).split('.')[0]
+        "hostname": platform.uname().node
     }
 
     actual_metadata = event_listener._get_metadata()
 
     assert actual_metadata["username"] == expected_metadata["username"]
     assert actual_metadata["hostname"] == expected_metadata["hostname"]
-    assert actual_metadata["timestamp"] == expected_metadata["timestamp"]
+
+    timestamp = datetime.fromisoformat(actual_metadata["timestamp"])
+    assert timestamp.utcoffset().total_seconds() == 0
+    assert abs((datetime.now(timezone.utc) - timestamp).total_seconds()) < 5
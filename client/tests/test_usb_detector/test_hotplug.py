@@ -0,0 +1,64 @@
+import socket
+import threading
+import time
+
+from client.src.usb_detector import hotplug
+
+
+def test_is_usb_hotplug_1():
+    message = b"add@/devices/pci0000:00/0000:00:14.0/usb1/1-1\0ACTION=add\0DEVPATH=/devices/pci0000:00/" \
+              b"0000:00:14.0/usb1/1-1\0SUBSYSTEM=usb\0DEVTYPE=usb_device\0PRODUCT=64f/2af9/100\0"
+    assert hotplug._is_usb_hotplug(message)
+
+
+def test_is_usb_hotplug_2():
+    message = b"remove@/devices/pci0000:00/0000:00:14.0/usb1/1-1\0ACTION=remove\0SUBSYSTEM=usb\0"
+    assert hotplug._is_usb_hotplug(message)
+
+
+def test_is_usb_hotplug_3():
+    message = b"change@/devices/virtual/net/eth0\0ACTION=change\0SUBSYSTEM=net\0"
+    assert not hotplug._is_usb_hotplug(message)
+
+
+def test_is_usb_hotplug_4():
+    message = b"change@/devices/pci0000:00/0000:00:14.0/usb1/1-1\0ACTION=change\0SUBSYSTEM=usb\0"
+    assert not hotplug._is_usb_hotplug(message)
+
+
+def _monitor():
+    monitor = hotplug.NetlinkHotplugMonitor.__new__(hotplug.NetlinkHotplugMonitor)
+    monitor._socket, sender = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    return monitor, sender
+
+
+def test_netlink_hotplug_monitor_1():
+    monitor, sender = _monitor()
+    stop = threading.Event()
+
+    def send_noise():
+        while not stop.wait(0.02):
+            sender.send(b"change@/devices/virtual/power_supply/BAT0\0ACTION=change\0SUBSYSTEM=power_supply\0")
+
+    thread = threading.Thread(target=send_noise)
+    thread.start()
+    try:
+        # Notifications of other devices keep arriving, but the timeout is not extended.
+        start = time.monotonic()
+        assert monitor.wait(0.3) is False
+        assert time.monotonic() - start < 0.6
+    finally:
+        stop.set()
+        thread.join()
+        monitor.close()
+        sender.close()
+
+
+def test_netlink_hotplug_monitor_2():
+    monitor, sender = _monitor()
+    sender.send(b"change@/devices/virtual/net/eth0\0ACTION=change\0SUBSYSTEM=net\0")
+    sender.send(b"add@/devices/usb1/1-1\0ACTION=add\0SUBSYSTEM=usb\0")
+
+    assert monitor.wait(1) is True
+    monitor.close()
+    sender.close()
@@ -0,0 +1,48 @@
+from client.src.usb_detector.usb_reader import InstanceIdParser
+
+prefixes = ["USB\\VID_064F&PID_2AF9", "USB\\VID_355F&PID_8946"]
+
+
+def test_instance_id_parser_1():
+    parser = InstanceIdParser(prefixes)
+
+    assert parser.parse("USB\\VID_064F&PID_2AF9\\7&11EE4411&1&0000") == {
+        "vendor_id": "064F",
+        "product_id": "2AF9",
+        "serial_number": "7"
+    }
+    assert parser.parse("USB\\VID_355F&PID_8946\\A1B2C3") == {
+        "vendor_id": "355F",
+        "product_id": "8946",
+        "serial_number": "A1B2C3"
+    }
+
+
+def test_instance_id_parser_2():
+    parser = InstanceIdParser(prefixes)
+
+    assert parser.parse("USB\\VID_A123&PID_455E&MI_00\\7&11EE4411&1&0000") is None
+    assert parser.parse("HID\\VID_064F&PID_2AF9\\7&11EE4411&1&0000") is None
+
+
+def test_instance_id_parser_3():
+    parser = InstanceIdParser(prefixes)
+
+    # The device matches the prefix, but there is no serial number right after the product id.
+    assert parser.parse("USB\\VID_064F&PID_2AF9&MI_00\\7&11EE4411&1&0000") is None
+
+
+def test_instance_id_parser_4():
+    parser = InstanceIdParser(prefixes, cache_size=2)
+    instance_id = "USB\\VID_064F&PID_2AF9\\ABC"
+
+    device = parser.parse(instance_id)
+    device["serial_number"] = "modified"
+
+    assert parser.parse(instance_id)["serial_number"] == "ABC"
+    assert parser.cache_info().hits == 1
+    assert parser.cache_info().misses == 1
+
+    parser.parse("USB\\VID_064F&PID_2AF9\\DEF")
+    parser.parse("USB\\VID_064F&PID_2AF9\\GHI")
+    assert parser.cache_info().currsize == 2
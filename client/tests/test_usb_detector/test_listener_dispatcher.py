@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from client.src.usb_detector.dispatcher import ListenerDispatcher, ListenerWorker, event_time
+
+
+class BlockingListener:
+
+    def __init__(self):
+        self.devices = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, device):
+        self.started.set()
+        self.release.wait(5)
+        self.devices.append(device)
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_listener_worker_1():
+    listener = BlockingListener()
+    worker = ListenerWorker(listener, 2, "drop_oldest")
+
+    worker.put(0)
+    listener.started.wait(5)
+    for device in range(1, 5):
+        worker.put(device)
+
+    assert worker.depth == 2
+    assert worker.stats()["dropped"] == 2
+
+    listener.release.set()
+    _wait_until(lambda: worker.processed == 3)
+    assert listener.devices == [0, 3, 4]
+
+
+def test_listener_worker_2(tmp_path):
+    listener = BlockingListener()
+    worker = ListenerWorker(listener, 2, "spill", str(tmp_path))
+
+    worker.put(0)
+    listener.started.wait(5)
+    for device in range(1, 6):
+        worker.put(device)
+
+    assert worker.depth == 5
+    assert worker.stats()["spilled"] == 3
+
+    listener.release.set()
+    _wait_until(lambda: worker.processed == 6)
+    assert listener.devices == [0, 1, 2, 3, 4, 5]
+    assert worker.depth == 0
+
+
+def test_listener_worker_3():
+    def failing_listener(device):
+        raise RuntimeError(device)
+
+    worker = ListenerWorker(failing_listener, 2, "block")
+    worker.put(1)
+    worker.put(2)
+
+    _wait_until(lambda: worker.processed == 2)
+    assert worker.stats()["failed"] == 2
+
+
+def test_listener_worker_4():
+    with pytest.raises(ValueError):
+        ListenerWorker(print, 2, "ignore")
+
+
+def test_listener_dispatcher_1():
+    devices = []
+
+    def listener(device):
+        devices.append(device)
+
+    dispatcher = ListenerDispatcher(10, "block")
+    dispatcher.dispatch(listener, 1)
+    dispatcher.dispatch(listener, 2)
+
+    _wait_until(lambda: len(devices) == 2)
+    stats = dispatcher.stats()
+    assert list(stats) == ["test_listener_dispatcher_1.<locals>.listener"]
+    assert stats["test_listener_dispatcher_1.<locals>.listener"]["queue_depth"] == 0
+
+
+def test_listener_worker_5():
+    listener = BlockingListener()
+    worker = ListenerWorker(listener, 1, "drop_oldest")
+    worker.put(0)
+    listener.started.wait(5)
+    worker.put(1)
+
+    # The worker takes the oldest event right after the queue has been found full.
+    put_nowait = worker._queue.put_nowait
+
+    def put_nowait_mock(item):
+        if worker._queue.full():
+            worker._queue.get_nowait()
+            raise queue.Full
+        put_nowait(item)
+
+    worker._queue.put_nowait = put_nowait_mock
+    worker.put(2)
+
+    assert worker.depth == 1
+    assert worker.stats()["dropped"] == 0
+    listener.release.set()
+
+
+def test_listener_worker_6():
+    times = []
+
+    def listener(device):
+        time.sleep(0.2)
+        times.append((event_time(), time.time()))
+
+    worker = ListenerWorker(listener, 10, "block")
+    before = time.time()
+    worker.put(1)
+    worker.put(2)
+
+    _wait_until(lambda: len(times) == 2)
+    # The listener is told when the event happened, not when it was called.
+    assert before <= times[1][0] <= times[1][1] - 0.3
+    assert event_time() is None
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from client.src.usb_detector.metadata import MetadataProvider
+
+
+class ClockMock:
+
+    def __init__(self, time):
+        self.time = time
+
+    def __call__(self):
+        return self.time
+
+
+@mock.patch('client.src.usb_detector.metadata.platform.uname')
+def test_metadata_provider_1(uname_mock):
+    uname_mock.return_value.node = "pc"
+    clock = ClockMock(100.0)
+    wall_clock = ClockMock(1649326262.0)
+    provider = MetadataProvider(60, clock=clock, wall_clock=wall_clock)
+
+    provider.metadata()
+    clock.time = 159.5
+    wall_clock.time = 1649326321.5
+    metadata = provider.metadata()
+
+    # The host identity is computed only once within the refresh period.
+    assert uname_mock.call_count == 1
+    assert metadata["hostname"] == "pc"
+    assert metadata["timestamp"] == "2022-04-07T10:12:01.500+00:00"
+
+
+@mock.patch('client.src.usb_detector.metadata.platform.uname')
+def test_metadata_provider_2(uname_mock):
+    clock = ClockMock(100.0)
+    wall_clock = ClockMock(1649326262.0)
+    provider = MetadataProvider(60, clock=clock, wall_clock=wall_clock)
+
+    provider.metadata()
+    clock.time = 160.0
+    wall_clock.time = 1649326400.0
+    metadata = provider.metadata()
+
+    # Once the refresh period elapses, the identity is computed again and the clock is re-anchored.
+    assert uname_mock.call_count == 2
+    assert metadata["timestamp"] == "2022-04-07T10:13:20.000+00:00"
+
+    provider.invalidate()
+    provider.host_identity()
+    assert uname_mock.call_count == 3
+
+
+@mock.patch('client.src.usb_detector.metadata.platform.uname')
+def test_metadata_provider_3(uname_mock):
+    provider = MetadataProvider(60, clock=ClockMock(100.0), wall_clock=ClockMock(1649326262.0))
+
+    # The timestamp of an event that happened earlier is the time of the event.
+    assert provider.metadata(1649326200.25)["timestamp"] == "2022-04-07T10:10:00.250+00:00"
+
+
+@mock.patch('client.src.usb_detector.metadata.platform.uname')
+def test_metadata_provider_4(uname_mock):
+    clock = ClockMock(100.0)
+    wall_clock = ClockMock(1649326262.0)
+    provider = MetadataProvider(300, clock=clock, wall_clock=wall_clock)
+
+    provider.metadata()
+    # The computer was suspended for an hour (the monotonic clock did not move).
+    clock.time = 101.0
+    wall_clock.time = 1649329863.0
+    metadata = provider.metadata()
+
+    # The session may have changed while it was suspended, so the identity is computed again.
+    assert uname_mock.call_count == 2
+    assert metadata["timestamp"] == "2022-04-07T11:11:03.000+00:00"
@@ -0,0 +1,93 @@
+import json
+import urllib.request
+
+from client.src.usb_detector import metrics
+from client.src.usb_detector.metrics import Histogram, Counter, SnapshotWriter
+
+
+def test_histogram_1():
+    histogram = Histogram("scan_seconds", "Duration of a scan", buckets=(0.1, 1))
+
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 3
+    assert snapshot["sum"] == 5.55
+    assert snapshot["buckets"] == {"0.1": 1, "1": 2, "+Inf": 3}
+
+
+def test_histogram_2():
+    histogram = Histogram("scan_seconds", "Duration of a scan", buckets=(0.1, 1))
+
+    assert histogram.mean() is None
+    with histogram.time():
+        pass
+
+    assert histogram.snapshot()["count"] == 1
+    assert histogram.render() == [
+        'scan_seconds_bucket{le="0.1"} 1',
+        'scan_seconds_bucket{le="1"} 1',
+        'scan_seconds_bucket{le="+Inf"} 1',
+        f"scan_seconds_sum {histogram.snapshot()['sum']}",
+        "scan_seconds_count 1"
+    ]
+
+
+def test_counter_1():
+    counter = Counter("sends_total", "Number of requests", label="result")
+
+    counter.inc("sent")
+    counter.inc("sent")
+    counter.inc("failed")
+
+    assert counter.snapshot() == {"sent": 2, "failed": 1}
+    assert counter.render() == ['sends_total{result="failed"} 1', 'sends_total{result="sent"} 2']
+
+
+def test_render_prometheus_1():
+    metrics.record_send(0.01, "sent")
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE usb_detector_send_duration_seconds histogram" in text
+    assert "# TYPE usb_detector_sends_total counter" in text
+    assert 'usb_detector_sends_total{result="sent"}' in text
+
+
+def test_summary_1():
+    metrics.record_send(0.02, "failed")
+
+    summary = metrics.summary()
+
+    assert set(summary) == {"scan_ms", "ps_ms", "send_ms", "sent", "failed", "cache", "evicted"}
+    assert summary["failed"] >= 1
+    assert summary["send_ms"] is not None
+
+
+def test_snapshot_writer_1(tmp_path):
+    filename = str(tmp_path / "metrics" / "snapshot.json")
+    writer = SnapshotWriter(filename, 60)
+
+    writer.write()
+
+    with open(filename) as file:
+        snapshot = json.load(file)
+    assert "scan_duration_seconds" in snapshot
+    assert "sends_total" in snapshot
+
+
+def test_start_http_server_1():
+    server = metrics.start_http_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+            content_type = response.headers["Content-Type"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert content_type == metrics.PROMETHEUS_CONTENT_TYPE
+    assert "usb_detector_scan_duration_seconds_count" in body
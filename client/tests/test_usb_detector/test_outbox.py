@@ -0,0 +1,79 @@
+import pytest
+from diskcache import Cache
+
+from client.src.usb_detector.outbox import Outbox
+
+
+def test_outbox_1(tmp_path):
+    outbox = Outbox(str(tmp_path), 10)
+    for index in range(3):
+        outbox.put({"index": index})
+
+    entries = outbox.peek(2)
+
+    # Peeking does not remove anything.
+    assert [entry.payload for entry in entries] == [{"index": 0}, {"index": 1}]
+    assert len(outbox) == 3
+    assert all(entry.attempts == 0 and entry.enqueued_at is not None for entry in entries)
+
+
+def test_outbox_2(tmp_path):
+    outbox = Outbox(str(tmp_path), 10)
+    for index in range(3):
+        outbox.put({"index": index})
+
+    first, second = outbox.peek(2)
+    outbox.nack(first)
+    outbox.ack(second)
+
+    entries = outbox.peek(10)
+    assert [entry.payload for entry in entries] == [{"index": 0}, {"index": 2}]
+    assert [entry.attempts for entry in entries] == [1, 0]
+    assert entries[0].enqueued_at == first.enqueued_at
+
+
+def test_outbox_3(tmp_path):
+    outbox = Outbox(str(tmp_path), 2)
+    for index in range(4):
+        outbox.put({"index": index})
+
+    assert [entry.payload for entry in outbox.peek(10)] == [{"index": 2}, {"index": 3}]
+    assert outbox.stats() == {"depth": 2, "evictions": 2}
+
+
+def test_outbox_4(tmp_path):
+    outbox = Outbox(str(tmp_path), 10)
+    outbox.put({"index": 0})
+
+    # The entries survive a restart of the application.
+    entries = Outbox(str(tmp_path), 10).peek(10)
+    assert [entry.payload for entry in entries] == [{"index": 0}]
+
+
+def test_outbox_5(tmp_path):
+    # payloads cached by older versions of the application (plain values)
+    cache = Cache(directory=str(tmp_path))
+    cache.push({"index": 0})
+    cache.close()
+
+    outbox = Outbox(str(tmp_path), 10)
+    entry, = outbox.peek(10)
+    assert entry.payload == {"index": 0}
+    assert entry.attempts == 0
+
+    outbox.ack(entry)
+    assert len(outbox) == 0
+
+
+def test_outbox_6(tmp_path):
+    with pytest.raises(ValueError):
+        Outbox(str(tmp_path), 0)
+
+
+def test_outbox_7(tmp_path):
+    outbox = Outbox(str(tmp_path), 1)
+    # An entry that is not part of the queue cannot be discarded, the payload is still stored.
+    outbox._cache.set("foreign", "entry")
+    outbox.put({"index": 0})
+
+    assert [entry.payload for entry in outbox.peek(10) if entry.key != "foreign"] == [{"index": 0}]
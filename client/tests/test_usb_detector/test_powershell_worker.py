@@ -0,0 +1,89 @@
+import sys
+
+from client.src.usb_detector import metrics
+from client.src.usb_detector.backoff import ExponentialBackoff
+from client.src.usb_detector.usb_reader import PowerShellWorker, RECORD_SEPARATOR, powershell_command
+
+# Script emulating the powershell: it answers each command with a JSON
+# document followed by the record separator. The "hang" command is never
+# answered, the "exit" command terminates the process and the "garbage"
+# command is answered with something else than JSON.
+FAKE_POWERSHELL = f"""
+import sys, time
+for line in sys.stdin:
+    if line.startswith("hang"):
+        time.sleep(60)
+    elif line.startswith("exit"):
+        sys.exit(3)
+    elif line.startswith("garbage"):
+        sys.stdout.write("access denied\\n{RECORD_SEPARATOR.decode()}\\n")
+    elif line.startswith("$null"):
+        sys.stdout.write("{RECORD_SEPARATOR.decode()}\\n")
+    else:
+        sys.stderr.write("warning\\n")
+        sys.stdout.write('[{{"InstanceId": "A"}}]\\n{RECORD_SEPARATOR.decode()}\\n')
+    sys.stdout.flush()
+"""
+
+
+def _worker(**kwargs):
+    return PowerShellWorker(args=[sys.executable, "-u", "-c", FAKE_POWERSHELL],
+                            backoff=ExponentialBackoff(0, 0), **kwargs)
+
+
+def test_powershell_worker_1():
+    with _worker(timeout_seconds=5) as worker:
+        assert worker.execute(powershell_command(b"Get-PnpDevice"), "pnp") == [{"InstanceId": "A"}]
+        assert worker.ping() == []
+        assert worker.execute(powershell_command(b"Get-PnpDevice"), "pnp") == [{"InstanceId": "A"}]
+
+
+def test_powershell_worker_2():
+    with _worker(timeout_seconds=0.5) as worker:
+        assert worker.execute(b"hang\n") is None
+        # The hung process is replaced by a new one.
+        assert worker.execute(powershell_command(b"Get-PnpDevice")) == [{"InstanceId": "A"}]
+
+
+def test_powershell_worker_3():
+    with _worker(timeout_seconds=5) as worker:
+        assert worker.execute(b"exit\n") is None
+        assert worker.execute(powershell_command(b"Get-PnpDevice")) == [{"InstanceId": "A"}]
+
+
+def test_powershell_worker_4():
+    now = [0.0]
+    worker = PowerShellWorker(args=["/nonexistent/powershell.exe"], backoff=ExponentialBackoff(10, 10, rand=lambda: 0),
+                              clock=lambda: now[0])
+
+    assert worker.execute(powershell_command(b"Get-PnpDevice")) is None
+    worker.args = [sys.executable, "-u", "-c", FAKE_POWERSHELL]
+    # The process is not started again before the restart delay elapses.
+    assert worker.start() is False
+    now[0] = 5.0
+    assert worker.start() is True
+    worker.close()
+
+
+def test_powershell_worker_5():
+    now = [0.0]
+    pings = metrics.histogram("powershell_ping_seconds", "")
+    with PowerShellWorker(args=[sys.executable, "-u", "-c", FAKE_POWERSHELL], timeout_seconds=5,
+                          ping_idle_seconds=10, clock=lambda: now[0]) as worker:
+        assert worker.execute(powershell_command(b"Get-PnpDevice")) == [{"InstanceId": "A"}]
+        count = pings.snapshot()["count"]
+
+        # The process has been idle for too long, so it is pinged before the command is run.
+        now[0] = 20.0
+        assert worker.execute(powershell_command(b"Get-PnpDevice")) == [{"InstanceId": "A"}]
+        assert pings.snapshot()["count"] == count + 1
+
+
+def test_powershell_worker_6():
+    with _worker(timeout_seconds=5) as worker:
+        # Output that is not JSON is a failed read, not an empty list of devices.
+        assert worker.execute(b"garbage\n") is None
+        # The same process keeps answering the following commands.
+        pid = worker._process.pid
+        assert worker.execute(powershell_command(b"Get-PnpDevice")) == [{"InstanceId": "A"}]
+        assert worker._process.pid == pid
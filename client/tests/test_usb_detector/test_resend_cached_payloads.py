@@ -1,23 +1,9 @@
 from client.src.usb_detector import api_client
+from client.src.usb_detector.outbox import Outbox
 
 from unittest import mock
 
 
-class CacheMock:
-
-    def __init__(self):
-        self._data = []
-
-    def pop(self):
-        return self._data.pop()
-
-    def append(self, payload):
-        self._data.append(payload)
-
-    def __len__(self):
-        return len(self._data)
-
-
 class ConfigMock:
 
     def __init__(self):
@@ -33,19 +19,19 @@ payload_mock = {
 }
 
 
-@mock.patch('client.src.usb_detector.api_client.send_data')
-def test_resend_cached_payloads_1(send_data_mock):
-    cache = CacheMock()
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._post', return_value=api_client.SENT)
+def test_resend_cached_payloads_1(post_mock, tmp_path):
     config = ConfigMock()
 
-    api_client._cache = cache
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
     api_client._config = config
 
     for _ in range(0, config.cache_max_entries + 1):
         api_client._cache_failed_payload(payload_mock)
 
     api_client._resend_cached_payloads()
-    send_data_mock.assert_called()
+    post_mock.assert_called()
     assert len(api_client._cache) == 2
 
     api_client._resend_cached_payloads()
@@ -55,25 +41,25 @@ def test_resend_cached_payloads_1(send_data_mock):
     assert len(api_client._cache) == 0
 
 
-@mock.patch('client.src.usb_detector.api_client.send_data')
-def test_resend_cached_payloads_2(send_data_mock):
-    cache = CacheMock()
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._post', return_value=api_client.SENT)
+def test_resend_cached_payloads_2(post_mock, tmp_path):
     config = ConfigMock()
 
-    api_client._cache = cache
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
     api_client._config = config
 
     api_client._resend_cached_payloads()
-    send_data_mock.assert_not_called()
+    post_mock.assert_not_called()
     assert len(api_client._cache) == 0
 
 
-@mock.patch('client.src.usb_detector.api_client.send_data')
-def test_resend_cached_payloads_3(send_data_mock):
-    cache = CacheMock()
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._post', return_value=api_client.SENT)
+def test_resend_cached_payloads_3(post_mock, tmp_path):
     config = ConfigMock()
 
-    api_client._cache = cache
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
     api_client._config = config
 
     for _ in range(0, 2):
@@ -81,6 +67,25 @@ def test_resend_cached_payloads_3(send_data_mock):
 
     assert len(api_client._cache) == 2
     api_client._resend_cached_payloads()
-    send_data_mock.assert_called()
+    post_mock.assert_called()
     assert len(api_client._cache) == 0
 
+
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._post', side_effect=[api_client.SENT, api_client.FAILED])
+def test_resend_cached_payloads_4(post_mock, tmp_path):
+    config = ConfigMock()
+
+    api_client._cache = Outbox(str(tmp_path), config.cache_max_entries)
+    api_client._config = config
+
+    for index in range(0, 3):
+        api_client._cache_failed_payload({"index": index})
+
+    assert not api_client._resend_cached_payloads()
+
+    # Only the delivered payload is removed, the order of the rest is preserved.
+    assert post_mock.call_count == 2
+    entries = api_client._cache.peek(3)
+    assert [entry.payload for entry in entries] == [{"index": 1}, {"index": 2}]
+    assert [entry.attempts for entry in entries] == [1, 0]
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from client.src.usb_detector import api_client
+from client.src.usb_detector.backoff import ExponentialBackoff
+from client.src.usb_detector.outbox import Outbox
+
+
+class ConfigMock:
+
+    def __init__(self):
+        self.cache_max_entries = 100
+        self.cache_max_retries = 6
+
+
+class FakeServer(ThreadingHTTPServer):
+    """Local server that answers with 503 (Retry-After) first and then accepts all payloads."""
+
+    def __init__(self, failures):
+        super().__init__(("127.0.0.1", 0), FakeRequestHandler)
+        self.failures = failures
+        self.received = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+
+class FakeRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+            fail = self.server.failures > 0
+            self.server.failures -= 1
+        time.sleep(0.02)
+        with self.server.lock:
+            self.server.in_flight -= 1
+            if not fail:
+                self.server.received += 1
+
+        self.send_response(503 if fail else 200)
+        if fail:
+            self.send_header("Retry-After", "30")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer(failures=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_resend_step_1(fake_server, tmp_path):
+    cache = Outbox(str(tmp_path), ConfigMock().cache_max_entries)
+    for index in range(30):
+        cache.put({"index": index})
+
+    with mock.patch.multiple(api_client, _uri=f"http://127.0.0.1:{fake_server.server_port}/api/v1/usb-logs",
+                             _cache=cache, _config=ConfigMock(), _batch_sender=None,
+                             _session=api_client._init_session(3), _executor=ThreadPoolExecutor(max_workers=3)):
+        backoff = ExponentialBackoff(20, 600)
+
+        # The server is overloaded, so the client backs off for (at least) the requested time.
+        assert api_client._resend_step(backoff) >= 30
+        assert len(cache) == 26
+
+        # Once the server answers, the rest of the cache is drained right away.
+        delays = []
+        while len(cache) > 0:
+            delays.append(api_client._resend_step(backoff))
+
+    assert delays[:-1] == [0] * (len(delays) - 1)
+    assert 10 <= delays[-1] <= 30
+    assert len(delays) == 5
+    assert fake_server.received == 30
+    assert fake_server.max_in_flight <= 3
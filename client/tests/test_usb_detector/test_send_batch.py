@@ -0,0 +1,99 @@
+from unittest import mock
+
+import requests
+
+from client.src.usb_detector import api_client
+from client.src.usb_detector.outbox import Outbox
+
+
+class ConfigMock:
+
+    def __init__(self):
+        self.cache_max_entries = 100
+        self.cache_max_retries = 2
+
+
+class BatchSenderMock:
+
+    def __init__(self):
+        self.max_size = 3
+
+
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_batch_1(_cache_failed_payload_mock, session_mock):
+    assert api_client.send_batch([{"status": "connected"}, {"status": "disconnected"}])
+
+    _cache_failed_payload_mock.assert_not_called()
+    assert session_mock.post.call_args.kwargs["url"] == "127.0.0.1:54444/api/v1/usb-logs/batch"
+
+
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_batch_2(_cache_failed_payload_mock, session_mock):
+    session_mock.post.side_effect = requests.exceptions.ConnectionError()
+
+    assert not api_client.send_batch([{"status": "connected"}, {"status": "disconnected"}])
+    assert _cache_failed_payload_mock.call_count == 2
+
+
+@mock.patch('client.src.usb_detector.api_client._batch_sender', BatchSenderMock())
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._post', return_value=api_client.SENT)
+def test_resend_cached_batches_1(post_mock, tmp_path):
+    api_client._config = ConfigMock()
+    api_client._cache = Outbox(str(tmp_path), api_client._config.cache_max_entries)
+    for payload in range(8):
+        api_client._cache.put(payload)
+
+    api_client._resend_cached_payloads()
+
+    assert post_mock.call_count == 2
+    assert post_mock.call_args_list[0].args[1] == [0, 1, 2]
+    assert len(api_client._cache) == 2
+
+
+@mock.patch('client.src.usb_detector.api_client._batch_sender', BatchSenderMock())
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._post', return_value=api_client.FAILED)
+def test_resend_cached_batches_2(post_mock, tmp_path):
+    api_client._config = ConfigMock()
+    api_client._cache = Outbox(str(tmp_path), api_client._config.cache_max_entries)
+    for payload in range(8):
+        api_client._cache.put(payload)
+
+    api_client._resend_cached_payloads()
+
+    post_mock.assert_called_once()
+    assert len(api_client._cache) == 8
+
+
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._post',
+            side_effect=[api_client.REJECTED, api_client.SENT, api_client.REJECTED, api_client.FAILED])
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_batch_3(_cache_failed_payload_mock, post_mock):
+    assert not api_client.send_batch([0, 1, 2])
+
+    assert post_mock.call_count == 4
+    assert [call.args[1] for call in post_mock.call_args_list[1:]] == [0, 1, 2]
+    _cache_failed_payload_mock.assert_called_once_with(2)
+
+
+@mock.patch('client.src.usb_detector.api_client._batch_sender', BatchSenderMock())
+@mock.patch('client.src.usb_detector.api_client._uri', "127.0.0.1:54444/api/v1/usb-logs")
+@mock.patch('client.src.usb_detector.api_client._batch_uri', "127.0.0.1:54444/api/v1/usb-logs/batch")
+@mock.patch('client.src.usb_detector.api_client._post',
+            side_effect=[api_client.REJECTED, api_client.SENT, api_client.FAILED, api_client.REJECTED])
+def test_resend_cached_batches_3(post_mock, tmp_path):
+    api_client._config = ConfigMock()
+    api_client._cache = Outbox(str(tmp_path), api_client._config.cache_max_entries)
+    for payload in range(3):
+        api_client._cache.put(payload)
+
+    assert not api_client._resend_cached_payloads()
+
+    assert [entry.payload for entry in api_client._cache.peek(10)] == [1]
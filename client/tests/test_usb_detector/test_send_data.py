@@ -38,9 +38,9 @@ def test_send_data_2(_cache_failed_payload_mock):
     assert args[0] == payload_mock
 
 
-@mock.patch('client.src.usb_detector.api_client.requests.post')
+@mock.patch('client.src.usb_detector.api_client._session')
 @mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
-def test_send_data_3(_cache_failed_payload_mock, post_mock):
+def test_send_data_3(_cache_failed_payload_mock, session_mock):
     payload_mock = {
         "device": {
             "vendor_id": 1,
@@ -54,16 +54,16 @@ def test_send_data_3(_cache_failed_payload_mock, post_mock):
     _cache_failed_payload_mock.assert_not_called()
 
 
-@mock.patch('client.src.usb_detector.api_client.requests.post')
+@mock.patch('client.src.usb_detector.api_client._session')
 @mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
-def test_send_data_4(_cache_failed_payload_mock, post_mock):
+def test_send_data_4(_cache_failed_payload_mock, session_mock):
     payload_mock = {
         "device": {
             "vendor_id": 1,
             "product_id": 2
         }
     }
-    post_mock.side_effect = requests.exceptions.HTTPError()
+    session_mock.post.side_effect = requests.exceptions.HTTPError()
 
     api_client._uri = "127.0.0.1:54444/api/v1/usb-logs"
     api_client.send_data(payload_mock)
@@ -71,3 +71,76 @@ def test_send_data_4(_cache_failed_payload_mock, post_mock):
     args = _cache_failed_payload_mock.call_args.args
     _cache_failed_payload_mock.assert_called()
     assert args[0] == payload_mock
+
+
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_data_5(_cache_failed_payload_mock, session_mock):
+    payload_mock = {
+        "device": {
+            "vendor_id": 1,
+            "product_id": 2
+        }
+    }
+    response_mock = mock.Mock(status_code=503)
+    session_mock.post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response_mock)
+
+    api_client._uri = "127.0.0.1:54444/api/v1/usb-logs"
+    api_client.send_data(payload_mock)
+
+    _cache_failed_payload_mock.assert_called()
+
+
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_data_6(_cache_failed_payload_mock, session_mock):
+    payload_mock = {
+        "device": {
+            "vendor_id": 1,
+            "product_id": 2
+        }
+    }
+    response_mock = mock.Mock(status_code=422)
+    session_mock.post.return_value.raise_for_status.side_effect = requests.exceptions.HTTPError(response=response_mock)
+
+    api_client._uri = "127.0.0.1:54444/api/v1/usb-logs"
+    api_client.send_data(payload_mock)
+
+    _cache_failed_payload_mock.assert_not_called()
+
+
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_data_7(_cache_failed_payload_mock, session_mock):
+    payload_mock = {
+        "device": {
+            "vendor_id": 1,
+            "product_id": 2
+        }
+    }
+    session_mock.post.side_effect = requests.exceptions.ReadTimeout()
+
+    api_client._uri = "127.0.0.1:54444/api/v1/usb-logs"
+    api_client.send_data(payload_mock)
+
+    _cache_failed_payload_mock.assert_called()
+
+
+@mock.patch('client.src.usb_detector.api_client._session')
+@mock.patch('client.src.usb_detector.api_client._cache_failed_payload')
+def test_send_data_8(_cache_failed_payload_mock, session_mock):
+    payload_mock = {
+        "device": {
+            "vendor_id": 1,
+            "product_id": 2
+        }
+    }
+    for status_code in (404, 413, 415):
+        response_mock = mock.Mock(status_code=status_code)
+        session_mock.post.return_value.raise_for_status.side_effect = \
+            requests.exceptions.HTTPError(response=response_mock)
+
+        api_client._uri = "127.0.0.1:54444/api/v1/usb-logs"
+        assert not api_client.send_data(payload_mock)
+
+    assert _cache_failed_payload_mock.call_count == 3
@@ -1,13 +1,13 @@
 import platform
 import getpass
 from unittest import mock
-from datetime import datetime
 
 import client.src.usb_detector.event_listener
 
 
+@mock.patch('client.src.usb_detector.event_listener.uuid.uuid4', return_value="7f1c1e5c-0d43-4d8e-9c1b-1f6f0a4d7e21")
 @mock.patch('client.src.usb_detector.event_listener.send_data')
-def test_send_payload_to_server_1(send_data_mock):
+def test_send_payload_to_server_1(send_data_mock, uuid4_mock):
     device_mock = {
         "vendor_id": 1,
         "product_id": 2
@@ -15,15 +15,28 @@ def test_send_payload_to_server_1(send_data_mock):
     metadata_mock = {
         "username": getpass.getuser(),
         "hostname": platform.uname().node,
-        "timestamp": str(datetime.now()).split('.')[0]
+        "timestamp": "2022-04-07T10:11:02.000+00:00"
     }
     status_mock = "connected"
 
+    with mock.patch.object(client.src.usb_detector.event_listener._metadata_provider, "metadata",
+                           return_value=dict(metadata_mock)):
+        client.src.usb_detector.event_listener._send_payload_to_server(device_mock, status_mock)
+
     metadata_mock["device"] = device_mock
     metadata_mock["status"] = status_mock
-
-    client.src.usb_detector.event_listener._send_payload_to_server(device_mock, status_mock)
+    metadata_mock["event_id"] = "7f1c1e5c-0d43-4d8e-9c1b-1f6f0a4d7e21"
 
     args = send_data_mock.call_args.args
     send_data_mock.assert_called()
     assert args[0] == metadata_mock
+
+
+@mock.patch('client.src.usb_detector.event_listener.metrics.summary', return_value={"sent": 1})
+@mock.patch('client.src.usb_detector.event_listener._piggyback_metrics', True)
+@mock.patch('client.src.usb_detector.event_listener.send_data')
+def test_send_payload_to_server_2(send_data_mock, summary_mock):
+    client.src.usb_detector.event_listener._send_payload_to_server({"vendor_id": 1}, "connected")
+
+    args = send_data_mock.call_args.args
+    assert args[0]["metrics"] == {"sent": 1}
@@ -0,0 +1,44 @@
+import os
+
+from client.src.usb_detector.sysfs_reader import SysfsUsbReader
+
+
+class ConfigMock:
+
+    def __init__(self):
+        self.pnp_device_id_suffixes = ["USB\\VID_064F&PID_2AF9", "USB\\VID_355F&PID_8946"]
+
+
+def _create_device(devices_path, name, **attributes):
+    device_path = os.path.join(devices_path, name)
+    os.makedirs(device_path)
+    for attribute, value in attributes.items():
+        with open(os.path.join(device_path, attribute), "w") as file:
+            file.write(value + "\n")
+
+
+def test_sysfs_reader_1(tmp_path):
+    _create_device(tmp_path, "usb1", idVendor="1d6b", idProduct="0002", serial="0000:00:14.0")
+    _create_device(tmp_path, "1-1", idVendor="064f", idProduct="2af9", serial="ABC123")
+    _create_device(tmp_path, "1-1:1.0", bInterfaceClass="03")
+    _create_device(tmp_path, "1-2", idVendor="355f", idProduct="8946", serial="XYZ")
+    _create_device(tmp_path, "1-3", idVendor="046d", idProduct="c077")
+
+    devices = SysfsUsbReader(ConfigMock(), devices_path=str(tmp_path)).read_connected_devices()
+
+    assert sorted(devices, key=lambda device: device["serial_number"]) == [
+        {"vendor_id": "064F", "product_id": "2AF9", "serial_number": "ABC123"},
+        {"vendor_id": "355F", "product_id": "8946", "serial_number": "XYZ"}
+    ]
+
+
+def test_sysfs_reader_2(tmp_path):
+    _create_device(tmp_path, "1-1", idVendor="064f", idProduct="2af9")
+
+    assert SysfsUsbReader(ConfigMock(), devices_path=str(tmp_path)).read_connected_devices() == []
+
+
+def test_sysfs_reader_3(tmp_path):
+    reader = SysfsUsbReader(ConfigMock(), devices_path=str(tmp_path / "missing"))
+
+    assert reader.read_connected_devices() is None
@@ -2,11 +2,21 @@ from unittest import mock
 from unittest.mock import Mock
 
 from client.src.usb_detector import detector
+from client.src.usb_detector.debouncer import EventDebouncer
+
+
+class ClockMock:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
 
 
 @mock.patch('client.src.usb_detector.detector._store_connected_devices')
-@mock.patch('client.src.usb_detector.detector.read_connected_devices', return_value=[1, 2, 3])
-def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
+@mock.patch('client.src.usb_detector.detector._usb_reader', **{'read_connected_devices.return_value': [1, 2, 3]})
+def test_update_1(usb_reader_mock, _store_connected_devices_mock):
     connected_mocks = [Mock() for _ in range(10)]
     detector._listeners_connected = [listener_mock.listener for listener_mock in connected_mocks]
 
@@ -22,8 +32,8 @@ def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
 
 
 @mock.patch('client.src.usb_detector.detector._store_connected_devices')
-@mock.patch('client.src.usb_detector.detector.read_connected_devices', return_value=[1, 2, 3])
-def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
+@mock.patch('client.src.usb_detector.detector._usb_reader', **{'read_connected_devices.return_value': [1, 2, 3]})
+def test_update_2(usb_reader_mock, _store_connected_devices_mock):
     detector._last_connected_devices = [1, 2, 3]
     connected_mocks = [Mock() for _ in range(10)]
     detector._listeners_connected = [listener_mock.listener for listener_mock in connected_mocks]
@@ -40,8 +50,8 @@ def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
 
 
 @mock.patch('client.src.usb_detector.detector._store_connected_devices')
-@mock.patch('client.src.usb_detector.detector.read_connected_devices', return_value=[])
-def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
+@mock.patch('client.src.usb_detector.detector._usb_reader', **{'read_connected_devices.return_value': []})
+def test_update_3(usb_reader_mock, _store_connected_devices_mock):
     detector._last_connected_devices = [1, 2, 3]
     connected_mocks = [Mock() for _ in range(10)]
     detector._listeners_connected = [listener_mock.listener for listener_mock in connected_mocks]
@@ -58,8 +68,8 @@ def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
 
 
 @mock.patch('client.src.usb_detector.detector._store_connected_devices')
-@mock.patch('client.src.usb_detector.detector.read_connected_devices', return_value=[2, 3, 4])
-def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
+@mock.patch('client.src.usb_detector.detector._usb_reader', **{'read_connected_devices.return_value': [2, 3, 4]})
+def test_update_4(usb_reader_mock, _store_connected_devices_mock):
     detector._last_connected_devices = [1, 2, 3, 5]
     connected_mocks = [Mock() for _ in range(10)]
     detector._listeners_connected = [listener_mock.listener for listener_mock in connected_mocks]
@@ -73,3 +83,27 @@ def test_update_1(read_connected_devices_mock, _store_connected_devices_mock):
         listener_mock.listener.assert_called()
     for listener_mock in disconnected_mocks:
         listener_mock.listener.assert_called()
+
+
+@mock.patch('client.src.usb_detector.detector._store_connected_devices')
+@mock.patch('client.src.usb_detector.detector._usb_reader', **{'read_connected_devices.return_value': [2, 3]})
+def test_update_5(usb_reader_mock, _store_connected_devices_mock):
+    clock = ClockMock()
+    detector._last_connected_devices = [1, 2]
+    detector._listeners_connected = [Mock()]
+    detector._listeners_disconnected = [Mock()]
+
+    with mock.patch('client.src.usb_detector.detector._debouncer', EventDebouncer(2, clock=clock)):
+        detector._update()
+        detector._dispatch_debounced_events()
+
+        # The changes held back by the debouncer are not stored yet.
+        assert detector._last_connected_devices == [2, 3]
+        _store_connected_devices_mock.assert_not_called()
+
+        clock.time = 2
+        detector._dispatch_debounced_events()
+
+    _store_connected_devices_mock.assert_called_once_with([3], [1])
+    detector._listeners_connected[0].assert_called_once_with(3)
+    detector._listeners_disconnected[0].assert_called_once_with(1)
@@ -0,0 +1,42 @@
+from unittest import mock
+from unittest.mock import Mock
+
+from client.src.usb_detector import detector
+from client.src.usb_detector.scheduler import AdaptiveScheduler
+
+
+class ConfigMock:
+
+    def __init__(self, scan_mode):
+        self.scan_mode = scan_mode
+        self.scan_period_seconds = 1
+        self.safety_scan_period_seconds = 300
+
+
+@mock.patch('client.src.usb_detector.detector.sleep')
+def test_wait_for_next_scan_1(sleep_mock):
+    detector._config = ConfigMock("poll")
+    detector._scheduler = AdaptiveScheduler(1, 8, clock=lambda: 10)
+    detector._scheduler.scan_started()
+    detector._wait_for_next_scan(None)
+    sleep_mock.assert_called_with(1)
+
+
+@mock.patch('client.src.usb_detector.detector.sleep')
+def test_wait_for_next_scan_2(sleep_mock):
+    hotplug_monitor = Mock()
+    detector._config = ConfigMock("event")
+    detector._wait_for_next_scan(hotplug_monitor)
+    hotplug_monitor.wait.assert_called_with(300)
+    sleep_mock.assert_not_called()
+
+
+@mock.patch('client.src.usb_detector.detector.sleep')
+def test_wait_for_next_scan_3(sleep_mock):
+    hotplug_monitor = Mock()
+    detector._config = ConfigMock("hybrid")
+    detector._scheduler = AdaptiveScheduler(1, 8, clock=lambda: 10)
+    detector._scheduler.scan_started()
+    detector._wait_for_next_scan(hotplug_monitor)
+    hotplug_monitor.wait.assert_called_with(1)
+    sleep_mock.assert_not_called()
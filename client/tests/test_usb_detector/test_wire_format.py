@@ -0,0 +1,49 @@
+import gzip
+import json
+
+import pytest
+
+from client.src.usb_detector.wire_format import WireFormat
+
+payload_mock = {
+    "username": "user",
+    "hostname": "pc",
+    "timestamp": "2022-04-07 12:11:02",
+    "device": {
+        "vendor_id": "1",
+        "product_id": "2",
+        "serial_number": "3"
+    },
+    "status": "connected"
+}
+
+
+def test_wire_format_1():
+    wire_format = WireFormat()
+
+    assert wire_format.headers == {"Content-Type": "application/json"}
+    assert json.loads(wire_format.encode(payload_mock)) == payload_mock
+
+
+def test_wire_format_2():
+    wire_format = WireFormat("json", "gzip")
+
+    assert wire_format.headers == {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    assert json.loads(gzip.decompress(wire_format.encode([payload_mock] * 3))) == [payload_mock] * 3
+
+
+def test_wire_format_3():
+    msgpack = pytest.importorskip("msgpack")
+    zstandard = pytest.importorskip("zstandard")
+    wire_format = WireFormat("msgpack", "zstd")
+
+    assert wire_format.headers == {"Content-Type": "application/msgpack", "Content-Encoding": "zstd"}
+    body = zstandard.ZstdDecompressor().decompress(wire_format.encode(payload_mock))
+    assert msgpack.unpackb(body) == payload_mock
+
+
+def test_wire_format_4():
+    with pytest.raises(ValueError):
+        WireFormat("xml")
+    with pytest.raises(ValueError):
+        WireFormat("json", "brotli")
@@ -0,0 +1,78 @@
+"""
+Throughput benchmark of web views with concurrent clients.
+
+Concurrent clients (threads) request given pages of a running server while a probe measures latency
+of a trivial endpoint. A handler declared async def that makes blocking database calls stalls the event loop,
+so the requests are served one at a time and the probe waits for each of them. Handlers that await the async
+database layer (or plain def handlers run in the thread pool) let the event loop serve other requests meanwhile.
+Run it against the server before and after the change:
+
+    python -m benchmarks.bench_web_concurrency --url http://127.0.0.1:8000 --clients 16 --requests 400
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+
+def _get(url: str):
+    """
+    Requests given url and returns number of seconds it took (None if the request failed)
+    """
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=60) as response:
+            response.read()
+    except (HTTPError, OSError):
+        return None
+    return time.perf_counter() - start
+
+
+def _probe(url: str, stop: threading.Event, latencies: list):
+    """
+    Keeps requesting the probe url until stopped (thread)
+    """
+    while not stop.is_set():
+        latency = _get(url)
+        if latency is not None:
+            latencies.append(latency)
+        stop.wait(0.05)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Web views concurrency benchmark")
+    arg_parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL of the server")
+    arg_parser.add_argument("--pages", nargs="+", default=["/logs-web", "/ldlogs-web"], help="Requested pages")
+    arg_parser.add_argument("--probe", default="/api/v1/identity-cache", help="Trivial endpoint used as probe")
+    arg_parser.add_argument("-c", "--clients", type=int, default=16, help="Number of concurrent clients")
+    arg_parser.add_argument("-n", "--requests", type=int, default=400, help="Number of requests")
+    args = arg_parser.parse_args()
+
+    base = args.url.rstrip("/")
+    urls = [base + args.pages[index % len(args.pages)] for index in range(args.requests)]
+
+    stop = threading.Event()
+    probe_latencies = []
+    probe = threading.Thread(target=_probe, args=(base + args.probe, stop, probe_latencies))
+    probe.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as executor:
+        latencies = [latency for latency in executor.map(_get, urls) if latency is not None]
+    seconds = time.perf_counter() - start
+    stop.set()
+    probe.join()
+
+    latencies.sort()
+    probe_latencies.sort()
+    print(f"{len(latencies)}/{len(urls)} requests, {args.clients} clients: {len(latencies) / seconds:.1f} requests/s, "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms" if latencies else "all requests failed")
+    if probe_latencies:
+        print(f"probe: p50 {probe_latencies[len(probe_latencies) // 2] * 1000:.1f} ms, "
+              f"max {probe_latencies[-1] * 1000:.1f} ms ({len(probe_latencies)} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Load test of /api/v1/usb-logs simulating a morning login spike.
+
+Concurrent clients (threads) send logs as fast as the server accepts them and the test prints throughput,
+latency percentiles and counts of response status codes. Run it once against a server started normally
+and once against a server started in write-behind mode to see the difference:
+
+    uvicorn main:app --port 8000
+    INGEST_WRITE_BEHIND=1 INGEST_SPOOL_DIR=/tmp/usb-spool uvicorn main:app --port 8000
+
+    python -m benchmarks.load_ingest --url http://127.0.0.1:8000 --events 5000 --clients 32
+
+Rejected logs (503 when the queue is full) are counted, not retried. Logs accepted in write-behind mode
+(202) are saved in the background, their progress can be followed at /api/v1/ingest-queue.
+"""
+import argparse
+import json
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+def _payload(run: str, index: int, devices: int, pcs: int):
+    """
+    Returns payload sent by keyman detecting client
+    """
+    return {
+        "username": f"{run}-user-{index % pcs}",
+        "hostname": f"{run}-pc-{index % pcs}",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "device": {"vendor_id": "064F", "product_id": "2AF9", "serial_number": f"{run}-{index % devices}"},
+        "status": "connected" if index % 2 == 0 else "disconnected",
+        "event_id": f"{run}-{index}"
+    }
+
+
+def _send(url: str, payload: dict):
+    """
+    Sends one payload and returns status code of the response and number of seconds it took
+    """
+    request = Request(url, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urlopen(request, timeout=30) as response:
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    except OSError:
+        status = "error"
+    return status, time.perf_counter() - start
+
+
+def _percentile(values: list, percent: float):
+    """
+    Returns given percentile of sorted values
+    """
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Ingest load test")
+    arg_parser.add_argument("--url", default="http://127.0.0.1:8000", help="URL of the server")
+    arg_parser.add_argument("-n", "--events", type=int, default=5000, help="Number of logs")
+    arg_parser.add_argument("-c", "--clients", type=int, default=32, help="Number of concurrent clients")
+    arg_parser.add_argument("-d", "--devices", type=int, default=200, help="Number of distinct devices")
+    arg_parser.add_argument("-p", "--pcs", type=int, default=300, help="Number of distinct pcs")
+    args = arg_parser.parse_args()
+
+    url = args.url.rstrip("/") + "/api/v1/usb-logs"
+    run = f"load-{uuid.uuid4().hex[:8]}"
+    payloads = [_payload(run, index, args.devices, args.pcs) for index in range(args.events)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.clients) as executor:
+        results = list(executor.map(lambda payload: _send(url, payload), payloads))
+    seconds = time.perf_counter() - start
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = Counter(status for status, _ in results)
+    print(f"{len(payloads)} logs, {args.clients} clients: {len(payloads) / seconds:.1f} requests/s")
+    print(f"latency p50 {_percentile(latencies, 50) * 1000:.1f} ms, p95 {_percentile(latencies, 95) * 1000:.1f} ms, "
+          f"p99 {_percentile(latencies, 99) * 1000:.1f} ms")
+    print("status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items(), key=str)))
+
+
+if __name__ == "__main__":
+    main()
@@ -84,7 +84,7 @@ async def signup_get(request: Request):
 
 
 @auth.post("/signup", response_class=HTMLResponse)
-async def signup(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+def signup(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
     """
     Endpoint called form signup template. Creates new user with role guest that can be changed by admin user
     """
@@ -133,8 +133,8 @@ async def login_get(request: Request):
 
 
 @auth.post("/login", response_class=HTMLResponse)
-async def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db),
-                Authorize: AuthJWT = Depends()):
+def login(username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db),
+          Authorize: AuthJWT = Depends()):
     """
     Endpoint called from login template. Checks if given username and password aligns with admin
     username and password and returns token for browser according to given username and password
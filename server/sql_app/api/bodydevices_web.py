@@ -30,8 +30,8 @@ def get_db():
 
 
 @body_device_web.get("/body-devices-web", response_class=HTMLResponse)
-async def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Returns template with all body devices and necessary attributes
     """
@@ -93,8 +93,8 @@ async def read_devices(request: Request, skip: int = 0, db: Session = Depends(ge
 
 
 @body_device_web.get("/body-device-lbtype/{device_id}", response_class=HTMLResponse)
-async def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
-                          Authorize: AuthJWT = Depends()):
+def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
+                    Authorize: AuthJWT = Depends()):
     """
     Returns template with one body device and all available licenses that can be assigned to it. Plus available teams
     that can be assigned to device, inventory number and comment text input for this device.
@@ -111,8 +111,8 @@ async def connect_dev_lic(request: Request, device_id: int, db: Session = Depend
 
 
 @body_device_web.post("/body-devices-web-lbt/{device_id}")
-async def connect_post(device_id: int, ltype: str = Form(...), db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def connect_post(device_id: int, ltype: str = Form(...), db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template from body_device_lbtype.html template. Connects body device with license
     and redirects to body-devices-web endpoint
@@ -126,8 +126,8 @@ async def connect_post(device_id: int, ltype: str = Form(...), db: Session = Dep
 
 
 @body_device_web.post("/body-devices-web-team/{device_id}")
-async def delete_post(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
-                      Authorize: AuthJWT = Depends()):
+def delete_post(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
+                Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template from body_device_license.html template, connects device with new team
     and redirects to body-devices-web endpoint
@@ -141,8 +141,8 @@ async def delete_post(device_id: int, team_con: str = Form(...), db: Session = D
 
 
 @body_device_web.post("/body-devices-inv/{device_id}")
-async def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
-                     Authorize: AuthJWT = Depends()):
+def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
+               Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template from body_device_license.html template, updates devices inventory number
     and redirects to body-devices-web endpoint
@@ -156,8 +156,8 @@ async def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Dep
 
 
 @body_device_web.post("/body-devices-comm/{device_id}")
-async def device_inv(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
-                     Authorize: AuthJWT = Depends()):
+def device_inv(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
+               Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template from body_device_license.html template, updates devices comment
     and redirects to body-devices-web endpoint
@@ -30,8 +30,8 @@ def get_db():
 
 
 @device_web.get("/devices-web", response_class=HTMLResponse)
-async def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Returns template with all devices and its necessary attributes
     """
@@ -63,10 +63,10 @@ async def read_devices(request: Request, skip: int = 0, db: Session = Depends(ge
 
 
 @device_web.post("/devices-web", response_class=HTMLResponse)
-async def filter_devices(request: Request, skip: int = 0,
-                         keyman_id: str = Form("all"), lic_name: str = Form("all"),
-                         lic_id: str = Form("all"), team: str = Form("all"),
-                         db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def filter_devices(request: Request, skip: int = 0,
+                   keyman_id: str = Form("all"), lic_name: str = Form("all"),
+                   lic_id: str = Form("all"), team: str = Form("all"),
+                   db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
     """
     Endpoint used for filtering devices by user given inputs. returns html template with only
     devices that has assigned license defined by user input
@@ -110,8 +110,8 @@ async def filter_devices(request: Request, skip: int = 0,
 
 
 @device_web.get("/device-license/{device_id}", response_class=HTMLResponse)
-async def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
-                          Authorize: AuthJWT = Depends()):
+def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
+                    Authorize: AuthJWT = Depends()):
     """
     Returns template with one device and all available licenses that can be assigned to it. Plus all teams that can
     be assigned to device, inventory number text input and comment text input
@@ -140,8 +140,8 @@ async def connect_dev_lic(request: Request, device_id: int, db: Session = Depend
 
 
 @device_web.post("/devices-web/{device_id}")
-async def connect_post(device_id: int, lic: str = Form(...), db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def connect_post(device_id: int, lic: str = Form(...), db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Endpoint called from devicelicense.html template. Adds entry to devices_licenses
     table and redirects to devices-web endpoint
@@ -155,8 +155,8 @@ async def connect_post(device_id: int, lic: str = Form(...), db: Session = Depen
 
 
 @device_web.post("/devices-web-del/{device_id}")
-async def delete_post(device_id: int, lic_del: str = Form(...), db: Session = Depends(get_db),
-                      Authorize: AuthJWT = Depends()):
+def delete_post(device_id: int, lic_del: str = Form(...), db: Session = Depends(get_db),
+                Authorize: AuthJWT = Depends()):
     """
     Endpoint called from devicelicense.html template for deleting device-license connection. Deletes entry in
     bodydevices_licenses table and redirects to devices-web endpoint
@@ -170,8 +170,8 @@ async def delete_post(device_id: int, lic_del: str = Form(...), db: Session = De
 
 
 @device_web.post("/devices-web-team/{device_id}")
-async def dev_team_con(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def dev_team_con(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Endpoint called from devicelicense.html template, connects device with team and redirects to devices-web endpoint
     """
@@ -184,8 +184,8 @@ async def dev_team_con(device_id: int, team_con: str = Form(...), db: Session =
 
 
 @device_web.post("/devices-web-inv/{device_id}")
-async def dev_inv_new(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
-                      Authorize: AuthJWT = Depends()):
+def dev_inv_new(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
+                Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template devicelicense.html, updates inventory number of device and redirects to devices-web
     endpoint
@@ -199,8 +199,8 @@ async def dev_inv_new(device_id: int, dev_inv: str = Form(...), db: Session = De
 
 
 @device_web.post("/devices-web-comment/{device_id}")
-async def dev_comm_new(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def dev_comm_new(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template devicelicense.html, updates comment of device and redirects to devices-web
     endpoint
@@ -30,8 +30,8 @@ def get_db():
 
 
 @head_device_web.get("/head-devices-web", response_class=HTMLResponse)
-async def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Returns template with all head devices and necessary attributes
     """
@@ -92,8 +92,8 @@ async def read_devices(request: Request, skip: int = 0, db: Session = Depends(ge
 
 
 @head_device_web.get("/head-device-lbtype/{device_id}", response_class=HTMLResponse)
-async def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
-                          Authorize: AuthJWT = Depends()):
+def connect_dev_lic(request: Request, device_id: int, db: Session = Depends(get_db),
+                    Authorize: AuthJWT = Depends()):
     """
     Returns template with one head device and all available licenses that can be assigned to it, plus team and comment
     and inventory number inputs.
@@ -110,8 +110,8 @@ async def connect_dev_lic(request: Request, device_id: int, db: Session = Depend
 
 
 @head_device_web.post("/head-devices-web-lbt/{device_id}")
-async def connect_post(device_id: int, ltype: str = Form(...), db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def connect_post(device_id: int, ltype: str = Form(...), db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template for connecting head device with license and redirects to head-devices-web endpoint
     """
@@ -124,8 +124,8 @@ async def connect_post(device_id: int, ltype: str = Form(...), db: Session = Dep
 
 
 @head_device_web.post("/head-devices-web-team/{device_id}")
-async def delete_post(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
-                      Authorize: AuthJWT = Depends()):
+def delete_post(device_id: int, team_con: str = Form(...), db: Session = Depends(get_db),
+                Authorize: AuthJWT = Depends()):
     """
     Endpoint called from template for connecting head device with team and redirects to body-devices-web endpoint
     """
@@ -138,8 +138,8 @@ async def delete_post(device_id: int, team_con: str = Form(...), db: Session = D
 
 
 @head_device_web.post("/head-devices-inv/{device_id}")
-async def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
-                     Authorize: AuthJWT = Depends()):
+def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Depends(get_db),
+               Authorize: AuthJWT = Depends()):
     """
     Endpoint called from within from headlicense.html template. Changes head devices inventory number with new one
     given from user
@@ -153,8 +153,8 @@ async def device_inv(device_id: int, dev_inv: str = Form(...), db: Session = Dep
 
 
 @head_device_web.post("/head-devices-comm/{device_id}")
-async def device_inv(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
-                     Authorize: AuthJWT = Depends()):
+def device_inv(device_id: int, dev_com: str = Form(...), db: Session = Depends(get_db),
+               Authorize: AuthJWT = Depends()):
     """
     Endpoint called from within from headlicense.html template. Changes head devices comment with new one
     given from user
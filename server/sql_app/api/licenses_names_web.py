@@ -42,8 +42,8 @@ async def licenses_create_web(request: Request, Authorize: AuthJWT = Depends()):
 
 
 @lauterbach_types_web.get("/lauterbach-types-web", response_class=HTMLResponse)
-async def read_licenses_web(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                            Authorize: AuthJWT = Depends()):
+def read_licenses_web(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                      Authorize: AuthJWT = Depends()):
     """
     Returns template with all lauterbach names currently saved in database
     """
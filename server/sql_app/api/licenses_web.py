@@ -43,8 +43,8 @@ async def licenses_create_web(request: Request, Authorize: AuthJWT = Depends()):
 
 
 @licenses_web.get("/licenses-web", response_class=HTMLResponse)
-async def read_licenses_web(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                            Authorize: AuthJWT = Depends()):
+def read_licenses_web(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                      Authorize: AuthJWT = Depends()):
     """
     Returns template with all licenses currently saved in database
     """
@@ -28,8 +28,8 @@ def get_db():
 
 
 @pcs_web.get("/pcs-web", response_class=HTMLResponse)
-async def read_pcs(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                   Authorize: AuthJWT = Depends()):
+def read_pcs(request: Request, skip: int = 0, db: Session = Depends(get_db),
+             Authorize: AuthJWT = Depends()):
     """
     Returns template with all pcs currently saved in database
     """
@@ -29,8 +29,8 @@ def get_db():
 
 
 @teams_web.get("/teams-web", response_class=HTMLResponse)
-async def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                       Authorize: AuthJWT = Depends()):
+def read_devices(request: Request, skip: int = 0, db: Session = Depends(get_db),
+                 Authorize: AuthJWT = Depends()):
     """
     Returns template with all teams currently saved in database
     """
@@ -77,8 +77,8 @@ def create_team(name: str = Form(...), db: Session = Depends(get_db), Authorize:
 
 
 @teams_web.get("/team-change/{team_id}", response_class=HTMLResponse)
-async def team_change_web(request: Request, team_id: int, db: Session = Depends(get_db),
-                          Authorize: AuthJWT = Depends()):
+def team_change_web(request: Request, team_id: int, db: Session = Depends(get_db),
+                    Authorize: AuthJWT = Depends()):
     """
     Returns template with form for changing teams name
     """
@@ -90,8 +90,8 @@ async def team_change_web(request: Request, team_id: int, db: Session = Depends(
     return templates.TemplateResponse("team_change.html", {"request": request, "team": team})
 
 @teams_web.post("/teams-change-process/{team_id}")
-async def team_change_process(team_id: int, db:Session = Depends(get_db), name: str = Form(...),
-                              Authorize: AuthJWT = Depends()):
+def team_change_process(team_id: int, db:Session = Depends(get_db), name: str = Form(...),
+                        Authorize: AuthJWT = Depends()):
     """
     Changes teams name to a new one given by user
     """
@@ -1,14 +1,24 @@
+import hashlib
 from typing import List
 from fastapi import Depends, FastAPI, HTTPException, APIRouter, Form
-from datetime import datetime
+from fastapi.responses import JSONResponse
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sql_app import crud, models, schemas
-from ..database import SessionLocal, engine
+from sql_app import crud, ingest, models, schemas, write_behind
+from ..database import ReadSessionLocal, SessionLocal, engine, pool_stats
+from ..identity_cache import identity_cache
+from ..middleware import MsgpackRoute
 
 models.Base.metadata.create_all(bind=engine)
 
-# prefix used for all endpoints in this file
-usblogs = APIRouter(prefix="/api/v1")
+# prefix used for all endpoints in this file, clients may send bodies encoded with msgpack
+usblogs = APIRouter(prefix="/api/v1", route_class=MsgpackRoute)
+
+# writer saving logs in the background (None unless write-behind mode is enabled, see write_behind.py)
+writer = write_behind.create_writer(SessionLocal)
+if writer is not None:
+    usblogs.add_event_handler("startup", writer.start)
+    usblogs.add_event_handler("shutdown", writer.stop)
 
 
 # Dependency
@@ -20,22 +30,54 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
 @usblogs.post("/usb-logs", response_model=schemas.USBLog)
 def create_device_logs(log: schemas.USBTempBase, db: Session = Depends(get_db)):
     """
     Endpoint called from keyman detecting client. Parses timestamp into datetime object.
     Finds if device and pc defined in message already exists and creates them if necessary.
-    Saves log into database
+    Saves log into database. A log of an event that has already been saved is not saved again.
+    On PostgreSQL all of this is done by a single upsert statement (see ingest.py).
+    In write-behind mode the log is only queued and 202 is returned
     """
-    dev = crud.find_device(db, log.device)
-    dat = datetime.strptime(log.timestamp, '%Y-%m-%d %H:%M:%S')
-    if dev is None:
-        dev = crud.create_device(db=db, device=log.device)
-    pc = crud.find_pc(db, log.username, log.hostname)
-    if pc is None:
-        pc = crud.create_pc(db=db, user=log.username, host=log.hostname)
+    log.event_id = usb_log_event_id(log)
+    dat = parse_timestamp(log.timestamp)
+    if writer is not None:
+        return enqueue_logs([log], [dat])
+    if ingest.supports_upsert(db):
+        return ingest.ingest_usb_log(db, log, dat)
+
+    existing = crud.find_log_by_event_id(db, log.event_id)
+    if existing is not None:
+        return existing
+
+    dev_id = ingest.resolve_device_id(db, log.device)
+    pc_id = ingest.resolve_pc_id(db, log.username, log.hostname)
+    return crud.create_device_logs(db=db, item=log, dev_id=dev_id, pc_id=pc_id, date=dat)
 
-    print(crud.create_device_logs(db=db, item=log, dev_id=dev.id, pc_id=pc.id, date=dat))
+
+@usblogs.post("/usb-logs/batch", response_model=schemas.USBTempBatchResult)
+def create_device_logs_batch(logs: List[schemas.USBTempBase], db: Session = Depends(get_db)):
+    """
+    Endpoint called from keyman detecting client with multiple logs at once. Parses timestamps
+    into datetime objects and saves all logs (including new devices and pcs) in one transaction
+    (see ingest.py). Logs of events that have already been saved are skipped. In write-behind mode
+    the logs are only queued and 202 is returned
+    """
+    for log in logs:
+        log.event_id = usb_log_event_id(log)
+    dates = [parse_timestamp(log.timestamp) for log in logs]
+    if writer is not None:
+        return enqueue_logs(logs, dates)
+    created = ingest.ingest_usb_logs(db, logs, dates)
+    return {"created": created, "duplicates": len(logs) - created}
 
 
 @usblogs.post("/ld-logs", response_model=schemas.LDLog)
@@ -43,24 +85,99 @@ def create_ld_logs(log: schemas.LDTempBase, db: Session = Depends(get_db)):
     """
     Endpoint called from debugger detecting client. Parses timestamp into datetime object.
     Finds if head device and body device defined in message already exists and creates them if necessary.
-    Saves log into database
+    Saves log into database. A log of an event that has already been saved is not saved again
     """
-    head_dev = crud.find_head_device(db, log.head_device)
-    body_dev = crud.find_body_device(db, log.body_device)
-    if head_dev is None:
-        head_dev = crud.create_head_device(db, log.head_device)
-    if body_dev is None:
-        body_dev = crud.create_body_device(db, log.body_device)
+    log.event_id = ld_log_event_id(log)
+    existing = crud.find_ld_log_by_event_id(db, log.event_id)
+    if existing is not None:
+        return existing
 
-    pc = crud.find_pc(db, log.username, log.hostname)
-    if pc is None:
-        pc = crud.create_pc(db=db, user=log.username, host=log.hostname)
-    dat = datetime.strptime(log.timestamp, '%Y-%m-%d %H:%M:%S')
-    print(crud.create_ld_logs(db=db, item=log, head_id=head_dev.id, body_id=body_dev.id, pc_id=pc.id, date=dat))
+    head_id = ingest.resolve_head_device_id(db, log.head_device)
+    body_id = ingest.resolve_body_device_id(db, log.body_device)
+    pc_id = ingest.resolve_pc_id(db, log.username, log.hostname)
+    dat = parse_timestamp(log.timestamp)
+    return crud.create_ld_logs(db=db, item=log, head_id=head_id, body_id=body_id, pc_id=pc_id, date=dat)
+
+
+def enqueue_logs(logs: List[schemas.USBTempBase], dates: List[datetime]):
+    """
+    Queues validated logs for the write-behind writer. Returns 202 once they are queued (and spooled),
+    or 503 asking the client to retry later if the queue is full
+    """
+    if not writer.submit(list(zip(logs, dates))):
+        raise HTTPException(status_code=503, detail="Ingest queue is full", headers={"Retry-After": "1"})
+    return JSONResponse(status_code=202, content={"queued": len(logs)})
+
+
+@usblogs.get("/ingest-queue")
+def read_ingest_queue_stats():
+    """
+    Returns counters of write-behind writer of this worker (empty if write-behind mode is disabled)
+    """
+    return writer.stats() if writer is not None else {}
+
+
+def parse_timestamp(value: str):
+    """
+    Parses timestamp sent by client. ISO-8601 timestamps with time zone (2022-04-07T10:11:02.123+00:00)
+    as well as timestamps of older clients (2022-04-07 12:11:02, local time of the server) are accepted.
+    The result is always in UTC, so all logs are stored the same way
+    """
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=422, detail=f"Invalid timestamp {value}")
+    # astimezone treats naive timestamp as local time
+    return parsed.astimezone(timezone.utc)
+
+
+def usb_log_event_id(log: schemas.USBTempBase):
+    """
+    Returns unique id of the event given log was created from. Clients that do not send the id
+    get one made of hash of the message (hostname, device, status and timestamp)
+    """
+    if log.event_id:
+        return log.event_id
+    return _content_hash(log.hostname, log.device.vendor_id, log.device.product_id, log.device.serial_number,
+                         log.status, log.timestamp)
+
+
+def ld_log_event_id(log: schemas.LDTempBase):
+    """
+    Returns unique id of the event given log was created from. Clients that do not send the id
+    get one made of hash of the message (hostname, head and body devices, status and timestamp)
+    """
+    if log.event_id:
+        return log.event_id
+    return _content_hash(log.hostname, log.head_device.serial_number, log.body_device.serial_number,
+                         log.status, log.timestamp)
+
+
+def _content_hash(*values):
+    """
+    Returns sha256 hash of given values
+    """
+    return hashlib.sha256("\x1f".join(str(value) for value in values).encode("utf-8")).hexdigest()
+
+
+@usblogs.get("/identity-cache")
+def read_identity_cache_stats():
+    """
+    Returns hit and miss counters of cache of device and pc ids used by endpoints above (this worker only)
+    """
+    return identity_cache.stats()
+
+
+@usblogs.get("/pool-stats")
+def read_pool_stats():
+    """
+    Returns usage of database connection pools and time spent waiting for a connection (this worker only)
+    """
+    return pool_stats()
 
 
 @usblogs.get("/logs", response_model=List[schemas.USBLog])
-def read_logs(skip: int = 0, db: Session = Depends(get_db)):
+def read_logs(skip: int = 0, db: Session = Depends(get_read_db)):
     """
     Returns all usb logs saved in database
     """
@@ -69,7 +186,7 @@ def read_logs(skip: int = 0, db: Session = Depends(get_db)):
 
 
 @usblogs.get("/logs/{device_id}", response_model=List[schemas.USBLog])
-def read_log(device_id: int, db: Session = Depends(get_db)):
+def read_log(device_id: int, db: Session = Depends(get_read_db)):
     """
     Returns one specific log by given id
     """
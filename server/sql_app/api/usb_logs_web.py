@@ -1,9 +1,10 @@
 from typing import List
 from fastapi import Depends, FastAPI, HTTPException, APIRouter, Form
 from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sql_app import crud, models, schemas
-from ..database import SessionLocal, engine
+from sql_app import async_crud, crud, models, schemas
+from ..database import AsyncReadSessionLocal, SessionLocal, engine
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
 from fastapi_jwt_auth import AuthJWT
@@ -28,22 +29,27 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
 @usblogs_web.get("/logs-web", response_class=HTMLResponse)
-async def read_logs(request: Request, skip: int = 0, db: Session = Depends(get_db),
+async def read_logs(request: Request, skip: int = 0, db: AsyncSession = Depends(get_async_db),
                     Authorize: AuthJWT = Depends()):
     """
     Returns template with all usb logs currently saved in database with its pcs, teams and licenses.
     """
     Authorize.jwt_optional()
     current_user = Authorize.get_jwt_subject()
-    logs = crud.get_logs(db, skip=skip)
+    logs = await async_crud.get_logs(db, skip=skip)
     pcs = []
     for log in logs:
         if log.pc_id not in pcs:
             pcs.append(log.pc_id)
-    pc_obj = crud.find_pcs(db, pcs)
-    teams = crud.get_teams(db, skip=skip)
-    licenses = crud.get_licenses(db, skip=skip)
+    pc_obj = await async_crud.find_pcs(db, pcs)
+    teams = await async_crud.get_teams(db, skip=skip)
+    licenses = await async_crud.get_licenses(db, skip=skip)
     if current_user == "admin":
         return templates.TemplateResponse("logs.html", {"request": request, "logs": logs, "pcs": pc_obj, "teams": teams,
                                                         "licenses": licenses, "user": current_user, "pc_val": "",
@@ -56,8 +62,8 @@ async def read_logs(request: Request, skip: int = 0, db: Session = Depends(get_d
 
 
 @usblogs_web.post("/logs-web", response_class=HTMLResponse)
-async def filter_logs(request: Request, pc: str = Form("all"), team: str = Form("all"), lic: str = Form("all"),
-                      skip: int = 0, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def filter_logs(request: Request, pc: str = Form("all"), team: str = Form("all"), lic: str = Form("all"),
+                skip: int = 0, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
     """
     Endpoint used for filtering usb logs by user given form inputs.
     """
@@ -28,8 +28,8 @@ def get_db():
 
 
 @users.get("/users-web", response_class=HTMLResponse)
-async def read_usrs(request: Request, skip: int = 0, db: Session = Depends(get_db),
-                   Authorize: AuthJWT = Depends()):
+def read_usrs(request: Request, skip: int = 0, db: Session = Depends(get_db),
+             Authorize: AuthJWT = Depends()):
     """
     Returns template with all users currently saved in database
     """
@@ -43,7 +43,7 @@ async def read_usrs(request: Request, skip: int = 0, db: Session = Depends(get_d
 
 
 @users.get("/user-role/{usr_id}", response_class=HTMLResponse)
-async def connect_pc_team(usr_id: int, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def connect_pc_team(usr_id: int, db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
     """
     Changes role of user to either guest or admin depending on old role.
     """
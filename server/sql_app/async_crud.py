@@ -0,0 +1,61 @@
+from sqlalchemy import desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from . import models
+
+
+async def get_logs(db: AsyncSession, skip: int = 0):
+    """
+    Returns all usb logs in database ordered by timestamp together with their devices (teams and licenses)
+    and pcs. Async sessions cannot load relationships lazily, so everything read by templates is loaded eagerly
+    """
+    device = selectinload(models.USBLog.device)
+    result = await db.execute(select(models.USBLog)
+                              .options(device.selectinload(models.Device.team),
+                                       device.selectinload(models.Device.licenses)
+                                       .selectinload(models.DeviceLicense.licenses),
+                                       selectinload(models.USBLog.pc))
+                              .order_by(desc(models.USBLog.timestamp)).offset(skip))
+    return result.scalars().all()
+
+
+async def get_ld_logs(db: AsyncSession, skip: int = 0):
+    """
+    Returns all ld debugger logs in database ordered by timestamp together with their head and body devices
+    (teams and license types) and pcs
+    """
+    head_device = selectinload(models.LDLog.head_device)
+    body_device = selectinload(models.LDLog.body_device)
+    result = await db.execute(select(models.LDLog)
+                              .options(head_device.selectinload(models.HeadDevice.team),
+                                       head_device.selectinload(models.HeadDevice.hlicense_t),
+                                       body_device.selectinload(models.BodyDevice.team),
+                                       body_device.selectinload(models.BodyDevice.blicense_t),
+                                       selectinload(models.LDLog.ldpc))
+                              .order_by(desc(models.LDLog.timestamp)).offset(skip))
+    return result.scalars().all()
+
+
+async def find_pcs(db: AsyncSession, pcs: []):
+    """
+    Finds all pcs with ids in given id array
+    """
+    result = await db.execute(select(models.PC).filter(models.PC.id.in_(pcs)))
+    return result.scalars().all()
+
+
+async def get_teams(db: AsyncSession, skip: int = 0):
+    """
+    returns all teams currently saved in database
+    """
+    result = await db.execute(select(models.Team).offset(skip))
+    return result.scalars().all()
+
+
+async def get_licenses(db: AsyncSession, skip: int = 0):
+    """
+    returns all licenses in database
+    """
+    result = await db.execute(select(models.License).offset(skip))
+    return result.scalars().all()
+
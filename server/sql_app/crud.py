@@ -1,8 +1,10 @@
 from datetime import datetime, date
 
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc
 from . import models, schemas
+from .identity_cache import identity_cache, DEVICE, HEAD_DEVICE, BODY_DEVICE
 
 
 def get_device(db: Session, device_id: int):
@@ -240,6 +242,7 @@ def update_device(db: Session, device_id: int, team: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -260,6 +263,7 @@ def update_device_inv(db: Session, device_id: int, inv: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -280,6 +284,7 @@ def update_device_com(db: Session, device_id: int, comm: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -518,6 +523,7 @@ def update_bodydevice_lbt(db: Session, device_id: int, l_id: int):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(BODY_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -533,6 +539,7 @@ def update_bodydevice_team(db: Session, device_id: int, team_id: int):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(BODY_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -547,6 +554,7 @@ def update_bodydevice_inv(db: Session, device_id: int, dev_inv: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(BODY_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -561,6 +569,7 @@ def update_bodydevice_comm(db: Session, device_id: int, comm: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(BODY_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -576,6 +585,7 @@ def update_headdevice_lbtype(db: Session, device_id: int, l_type: int):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(HEAD_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -591,6 +601,7 @@ def update_headdevice_team(db: Session, device_id: int, team_id: int):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(HEAD_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -605,6 +616,7 @@ def update_headdevice_inv(db: Session, device_id: int, dev_inv: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(HEAD_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -619,6 +631,7 @@ def update_headdevice_comm(db: Session, device_id: int, comm: str):
     for key, value in new.items():
         setattr(old_dev, key, value)
     db.commit()
+    identity_cache.invalidate(HEAD_DEVICE, old_dev.id)
     db.refresh(old_dev)
     return old_dev
 
@@ -634,13 +647,29 @@ def create_ld_logs(db: Session, item: schemas.LDTempBase, head_id: int, body_id:
     """
     Creates new ld log for ld_logs database table
     """
-    db_ld = models.LDLog(pc_id=pc_id, timestamp=date, status=item.status, head_id=head_id, body_id=body_id)
+    db_ld = models.LDLog(pc_id=pc_id, timestamp=date, status=item.status, head_id=head_id, body_id=body_id,
+                         event_id=item.event_id)
     db.add(db_ld)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # the same event has been stored by a concurrent request in the meantime
+        db.rollback()
+        existing = find_ld_log_by_event_id(db, item.event_id)
+        if existing is None:
+            raise
+        return existing
     db.refresh(db_ld)
     return db_ld
 
 
+def find_ld_log_by_event_id(db: Session, event_id: str):
+    """
+    Finds ld log by unique id of the event it was created from
+    """
+    return db.query(models.LDLog).filter(models.LDLog.event_id == event_id).first()
+
+
 def get_logs(db: Session, skip: int = 0):
     """
     Returns all usb logs in database ordered by timestamp
@@ -1095,13 +1124,29 @@ def create_device_logs(db: Session, item: schemas.USBTempBase, dev_id: int, pc_i
     """
     Creates new USB log for usb_logs database table
     """
-    db_log = models.USBLog(pc_id=pc_id, timestamp=date, status=item.status, device_id=dev_id)
+    db_log = models.USBLog(pc_id=pc_id, timestamp=date, status=item.status, device_id=dev_id,
+                           event_id=item.event_id)
     db.add(db_log)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # the same event has been stored by a concurrent request in the meantime
+        db.rollback()
+        existing = find_log_by_event_id(db, item.event_id)
+        if existing is None:
+            raise
+        return existing
     db.refresh(db_log)
     return db_log
 
 
+def find_log_by_event_id(db: Session, event_id: str):
+    """
+    Finds USB log by unique id of the event it was created from
+    """
+    return db.query(models.USBLog).filter(models.USBLog.event_id == event_id).first()
+
+
 def get_users(db: Session, skip: int = 0):
     """
     Returns all users saved in database
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from .settings import settings
+
+# kinds of rows whose ids are cached
+DEVICE = "device"
+PC = "pc"
+HEAD_DEVICE = "head_device"
+BODY_DEVICE = "body_device"
+
+# maximum number of cached ids
+IDENTITY_CACHE_SIZE = settings.identity_cache_size
+
+# number of seconds after which cached id expires
+IDENTITY_CACHE_TTL_SECONDS = settings.identity_cache_ttl_seconds
+
+
+class IdentityCache:
+    """
+    Bounded LRU cache mapping natural keys of rows (serial number of a device, username and hostname of a pc)
+    to their primary keys, so the same few hundred devices and pcs sent by clients are not looked up in
+    database with every log. Each uvicorn worker has a cache of its own. This is safe, because the id of a row
+    never changes for its natural key (the keys are unique and never edited); web views invalidate the ids of
+    rows they change in their own worker and entries expire after ttl_seconds in the other ones. A log
+    referencing an id which is no longer valid is rejected by a foreign key, so callers retry without cache
+    """
+
+    def __init__(self, max_size: int = IDENTITY_CACHE_SIZE, ttl_seconds: float = IDENTITY_CACHE_TTL_SECONDS,
+                 clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind: str, key):
+        """
+        Returns cached id of row of given kind with given natural key or None if it is not cached
+        """
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            if entry is None or entry[1] <= self._clock():
+                if entry is not None:
+                    del self._entries[(kind, key)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((kind, key))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, kind: str, key, row_id: int):
+        """
+        Caches id of row of given kind with given natural key. Least recently used entry is evicted
+        if the cache is full
+        """
+        with self._lock:
+            self._entries[(kind, key)] = (row_id, self._clock() + self.ttl_seconds)
+            self._entries.move_to_end((kind, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, kind: str, row_id: int = None):
+        """
+        Removes cached id of row of given kind (all rows of given kind if row_id is None)
+        """
+        with self._lock:
+            for cache_key in [cache_key for cache_key, entry in self._entries.items()
+                              if cache_key[0] == kind and (row_id is None or entry[0] == row_id)]:
+                del self._entries[cache_key]
+
+    def clear(self):
+        """
+        Removes all cached ids
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns hit and miss counters and current size of the cache
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self._entries), "max_size": self.max_size}
+
+
+# cache shared by all requests handled by this worker
+identity_cache = IdentityCache()
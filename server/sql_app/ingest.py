@@ -0,0 +1,241 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select, literal, true, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import crud, models, schemas
+from .identity_cache import identity_cache, DEVICE, PC, HEAD_DEVICE, BODY_DEVICE
+
+
+def supports_upsert(db: Session):
+    """
+    Returns True if database behind given session supports INSERT ... ON CONFLICT statements used by this module
+    (PostgreSQL). Other databases (e.g. local SQLite used for testing) are served by functions in crud.py
+    """
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def device_id_select(device: schemas.DeviceTemp):
+    """
+    Returns query of id of device with given serial number. The device is created by INSERT ... ON CONFLICT
+    DO NOTHING unless it already exists, an existing row is found by the select it is combined with, so
+    the row is never rewritten. The query returns no row if the device was created by a concurrent
+    transaction which committed after the statement started (the caller has to repeat the statement)
+    """
+    inserted = insert(models.Device).values(vendor_id=device.vendor_id, product_id=device.product_id,
+                                            serial_number=device.serial_number, inventory_number="", comment="") \
+        .on_conflict_do_nothing(index_elements=[models.Device.serial_number]) \
+        .returning(models.Device.id).cte("device_insert")
+    existing = select(models.Device.id).where(models.Device.serial_number == device.serial_number)
+    return union_all(select(inserted.c.id), existing).limit(1)
+
+
+def pc_id_select(username: str, hostname: str):
+    """
+    Returns query of id of pc with given username and hostname. The pc is created unless it already exists
+    (see device_id_select)
+    """
+    inserted = insert(models.PC).values(username=username, hostname=hostname) \
+        .on_conflict_do_nothing(index_elements=[models.PC.username, models.PC.hostname]) \
+        .returning(models.PC.id).cte("pc_insert")
+    existing = select(models.PC.id).where(models.PC.username == username, models.PC.hostname == hostname)
+    return union_all(select(inserted.c.id), existing).limit(1)
+
+
+def ingest_usb_log(db: Session, log: schemas.USBTempBase, date: datetime, use_cache: bool = True,
+                   retry: bool = True):
+    """
+    Saves log sent by keyman detecting client with a single statement in one transaction. Device and pc are
+    resolved (and created if necessary) in common table expressions of the statement inserting the log,
+    so concurrent requests never create duplicate devices or pcs. Ids of devices and pcs found in identity
+    cache are used directly, so their rows are not touched at all. Returns saved log, or the log saved before
+    if the event has already been logged
+    """
+    pc_key = (log.username, log.hostname)
+    device_id = identity_cache.get(DEVICE, log.device.serial_number) if use_cache else None
+    pc_id = identity_cache.get(PC, pc_key) if use_cache else None
+
+    device = device_id_select(log.device).cte("device_row") if device_id is None else None
+    pc = pc_id_select(log.username, log.hostname).cte("pc_row") if pc_id is None else None
+    values = select(pc.c.id if pc is not None else literal(pc_id, models.USBLog.pc_id.type),
+                    device.c.id if device is not None else literal(device_id, models.USBLog.device_id.type),
+                    literal(date, models.USBLog.timestamp.type),
+                    literal(log.status, models.USBLog.status.type),
+                    literal(log.event_id, models.USBLog.event_id.type)).where(true())
+    stmt = insert(models.USBLog).from_select(["pc_id", "device_id", "timestamp", "status", "event_id"], values) \
+        .on_conflict_do_nothing(index_elements=[models.USBLog.event_id]) \
+        .returning(*models.USBLog.__table__.columns)
+    try:
+        row = db.execute(stmt).first()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if device is not None and pc is not None:
+            raise
+        # cached id refers to a row which no longer exists (foreign key violation)
+        if device_id is not None:
+            identity_cache.invalidate(DEVICE, device_id)
+        if pc_id is not None:
+            identity_cache.invalidate(PC, pc_id)
+        return ingest_usb_log(db, log, date, use_cache=False, retry=retry)
+    except Exception:
+        db.rollback()
+        raise
+    if row is None:
+        # the event has already been logged (the log was not inserted)
+        existing = crud.find_log_by_event_id(db, log.event_id)
+        if existing is not None or not retry:
+            return existing
+        # device or pc was created by a concurrent transaction the statement did not see yet
+        return ingest_usb_log(db, log, date, use_cache=use_cache, retry=False)
+    identity_cache.put(DEVICE, log.device.serial_number, row.device_id)
+    identity_cache.put(PC, pc_key, row.pc_id)
+    return row
+
+
+def ingest_usb_logs(db: Session, logs: List[schemas.USBTempBase], dates: List[datetime], use_cache: bool = True):
+    """
+    Saves batch of logs sent by keyman detecting clients in one transaction. Devices and pcs missing in identity
+    cache are created by one multi-row INSERT ... ON CONFLICT DO NOTHING per table and their ids are selected
+    afterwards, then all logs are saved by one multi-row insert which skips events that have already been
+    logged (or are repeated within the batch). Works on PostgreSQL and SQLite. Returns number of saved logs
+    """
+    cached = []
+    try:
+        device_ids = _device_ids(db, {log.device.serial_number: log.device for log in logs}, use_cache, cached)
+        pc_ids = _pc_ids(db, {(log.username, log.hostname) for log in logs}, use_cache, cached)
+        rows = [{"pc_id": pc_ids[(log.username, log.hostname)], "device_id": device_ids[log.device.serial_number],
+                 "timestamp": date, "status": log.status, "event_id": log.event_id}
+                for log, date in zip(logs, dates)]
+        created = 0
+        if rows:
+            stmt = _insert(db, models.USBLog).values(rows) \
+                .on_conflict_do_nothing(index_elements=[models.USBLog.event_id])
+            created = db.execute(stmt).rowcount
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not cached:
+            raise
+        # cached id refers to a row which no longer exists (foreign key violation)
+        for kind, row_id in cached:
+            identity_cache.invalidate(kind, row_id)
+        return ingest_usb_logs(db, logs, dates, use_cache=False)
+    except Exception:
+        db.rollback()
+        raise
+    for serial_number, device_id in device_ids.items():
+        identity_cache.put(DEVICE, serial_number, device_id)
+    for pc_key, pc_id in pc_ids.items():
+        identity_cache.put(PC, pc_key, pc_id)
+    return created
+
+
+def _insert(db: Session, model):
+    """
+    Returns INSERT statement of given model supporting ON CONFLICT clause of database behind given session
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return insert(model)
+
+
+def _device_ids(db: Session, devices: dict, use_cache: bool, cached: list):
+    """
+    Returns ids of given devices (serial number -> device), missing devices are created. Ids taken from
+    identity cache are appended to cached list
+    """
+    device_ids = _cached_ids(DEVICE, devices, use_cache, cached)
+    missing = sorted(serial_number for serial_number in devices if serial_number not in device_ids)
+    if missing:
+        # rows are inserted in the same order by all transactions, so concurrent batches do not deadlock
+        values = [{"vendor_id": devices[serial_number].vendor_id, "product_id": devices[serial_number].product_id,
+                   "serial_number": serial_number, "inventory_number": "", "comment": ""}
+                  for serial_number in missing]
+        db.execute(_insert(db, models.Device).values(values)
+                   .on_conflict_do_nothing(index_elements=[models.Device.serial_number]))
+        device_ids.update(db.query(models.Device.serial_number, models.Device.id)
+                          .filter(models.Device.serial_number.in_(missing)).all())
+    return device_ids
+
+
+def _pc_ids(db: Session, pcs: set, use_cache: bool, cached: list):
+    """
+    Returns ids of given pcs (pairs of username and hostname), missing pcs are created. Ids taken from
+    identity cache are appended to cached list
+    """
+    pc_ids = _cached_ids(PC, pcs, use_cache, cached)
+    missing = sorted(pc_key for pc_key in pcs if pc_key not in pc_ids)
+    if missing:
+        db.execute(_insert(db, models.PC).values([{"username": username, "hostname": hostname}
+                                                  for username, hostname in missing])
+                   .on_conflict_do_nothing(index_elements=[models.PC.username, models.PC.hostname]))
+        rows = db.query(models.PC.username, models.PC.hostname, models.PC.id) \
+            .filter(models.PC.username.in_({username for username, _ in missing})).all()
+        pc_ids.update({(row.username, row.hostname): row.id for row in rows
+                       if (row.username, row.hostname) in pcs})
+    return pc_ids
+
+
+def _cached_ids(kind: str, keys, use_cache: bool, cached: list):
+    """
+    Returns ids of given keys found in identity cache (key -> id)
+    """
+    ids = {}
+    if use_cache:
+        for key in keys:
+            row_id = identity_cache.get(kind, key)
+            if row_id is not None:
+                ids[key] = row_id
+                cached.append((kind, row_id))
+    return ids
+
+
+def resolve_device_id(db: Session, device: schemas.DeviceTemp):
+    """
+    Returns id of given device, the device is created if it does not exist yet
+    """
+    return _resolve_id(DEVICE, device.serial_number, lambda: crud.find_device(db, device),
+                       lambda: crud.create_device(db=db, device=device))
+
+
+def resolve_pc_id(db: Session, username: str, hostname: str):
+    """
+    Returns id of pc with given username and hostname, the pc is created if it does not exist yet
+    """
+    return _resolve_id(PC, (username, hostname), lambda: crud.find_pc(db, username, hostname),
+                       lambda: crud.create_pc(db=db, user=username, host=hostname))
+
+
+def resolve_head_device_id(db: Session, device: schemas.HeadDeviceTemp):
+    """
+    Returns id of given head device, the device is created if it does not exist yet
+    """
+    return _resolve_id(HEAD_DEVICE, device.serial_number, lambda: crud.find_head_device(db, device),
+                       lambda: crud.create_head_device(db, device))
+
+
+def resolve_body_device_id(db: Session, device: schemas.BodyDeviceTemp):
+    """
+    Returns id of given body device, the device is created if it does not exist yet
+    """
+    return _resolve_id(BODY_DEVICE, device.serial_number, lambda: crud.find_body_device(db, device),
+                       lambda: crud.create_body_device(db, device))
+
+
+def _resolve_id(kind: str, key, find, create):
+    """
+    Returns cached id of row of given kind with given natural key. If it is not cached, the row is found
+    (or created) in database and its id is cached
+    """
+    row_id = identity_cache.get(kind, key)
+    if row_id is None:
+        row = find()
+        if row is None:
+            row = create()
+        row_id = row.id
+        identity_cache.put(kind, key, row_id)
+    return row_id
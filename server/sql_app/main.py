@@ -15,11 +15,15 @@ from sql_app.api.bodydevices_web import body_device_web
 from sql_app.api.headdevices_web import head_device_web
 from sql_app.api.users_web import users
 from sql_app.api.licenses_types_web import lauterbach_types_web
+from sql_app.middleware import BodyDecodingMiddleware
 from fastapi import FastAPI
 
 
 app = FastAPI()
 
+# decompression of compressed (gzip, zstd) bodies sent by clients (msgpack is decoded by MsgpackRoute)
+app.add_middleware(BodyDecodingMiddleware)
+
 # including routers for endpoints used by clients
 app.include_router(device)
 app.include_router(licenses)
@@ -0,0 +1,151 @@
+import io
+import zlib
+
+import msgpack
+import zstandard
+from fastapi import Request
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+
+# maximum size of decoded request body (protection against decompression bombs)
+MAX_DECODED_BODY_SIZE = 16 * 1024 * 1024
+
+# content types of msgpack encoded request bodies
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class BodyTooLarge(Exception):
+    """
+    Raised when decoded request body exceeds MAX_DECODED_BODY_SIZE
+    """
+    pass
+
+
+def _gunzip(body: bytes):
+    """
+    Decompresses gzip compressed body
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, MAX_DECODED_BODY_SIZE + 1)
+    if len(data) > MAX_DECODED_BODY_SIZE:
+        raise BodyTooLarge()
+    return data
+
+
+def _unzstd(body: bytes):
+    """
+    Decompresses zstd compressed body
+    """
+    with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+        data = reader.read(MAX_DECODED_BODY_SIZE + 1)
+    if len(data) > MAX_DECODED_BODY_SIZE:
+        raise BodyTooLarge()
+    return data
+
+
+# decompressors of supported content encodings
+DECOMPRESSORS = {
+    "gzip": _gunzip,
+    "zstd": _unzstd
+}
+
+
+class BodyDecodingMiddleware:
+    """
+    ASGI middleware decompressing request bodies sent by clients (gzip or zstd, Content-Encoding header).
+    Msgpack encoded bodies are left as they are, they are decoded by routes of MsgpackRoute
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding == "identity":
+            await self.app(scope, receive, send)
+            return
+
+        if content_encoding not in DECOMPRESSORS:
+            response = PlainTextResponse(f"Unsupported content encoding {content_encoding}", status_code=415)
+            await response(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        try:
+            body = DECOMPRESSORS[content_encoding](body)
+        except BodyTooLarge:
+            response = PlainTextResponse("Request body is too large", status_code=413)
+            await response(scope, receive, send)
+            return
+        except (ValueError, zlib.error, zstandard.ZstdError):
+            response = PlainTextResponse("Request body could not be decoded", status_code=400)
+            await response(scope, receive, send)
+            return
+
+        # replaces headers describing the original body with headers of decompressed body
+        raw_headers = [(name, value) for name, value in scope["headers"]
+                       if name not in (b"content-encoding", b"content-length")]
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+        scope = dict(scope, headers=raw_headers)
+
+        body_sent = False
+
+        async def receive_decoded():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_decoded, send)
+
+
+class MsgpackRequest(Request):
+    """
+    Request whose msgpack encoded body is decoded straight into python objects (no conversion to JSON)
+    """
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = msgpack.unpackb(await self.body(), raw=False)
+        return self._json
+
+
+class MsgpackRoute(APIRoute):
+    """
+    Route accepting msgpack encoded bodies as well as JSON. Body of msgpack request is decoded by MsgpackRequest,
+    validation of the endpoint is the same for both encodings
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def msgpack_route_handler(request: Request):
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type in MSGPACK_CONTENT_TYPES:
+                # FastAPI reads body of JSON requests only, so the request pretends to be one
+                raw_headers = [(name, value) for name, value in request.scope["headers"] if name != b"content-type"]
+                raw_headers.append((b"content-type", b"application/json"))
+                request = MsgpackRequest(dict(request.scope, headers=raw_headers), request.receive)
+            return await handler(request)
+
+        return msgpack_route_handler
+
+
+async def _read_body(receive):
+    """
+    Reads whole request body
+    """
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -13,7 +13,8 @@ class Device(Base):
     id = Column(Integer, primary_key=True, index=True)
     vendor_id = Column(String, index=True, nullable=False)
     product_id = Column(String, index=True, nullable=False)
-    serial_number = Column(String, index=True, nullable=False)
+    # unique, so devices can be created by INSERT ... ON CONFLICT without duplicates
+    serial_number = Column(String, unique=True, index=True, nullable=False)
     inventory_number = Column(String, index=True, nullable=True)
     comment = Column(String, index=True, nullable=True)
 
@@ -37,6 +38,8 @@ class USBLog(Base):
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String, index=True, nullable=False)
     device_id = Column(Integer, ForeignKey("devices.id"))
+    # unique id of the event (generated by the client), the same event is never stored twice
+    event_id = Column(String, unique=True, index=True, nullable=True)
 
     # relationships for foreign keys, thus connecting table with devices and pc
     # tables
@@ -95,6 +98,8 @@ class PC(Base):
     Class defining database table pc
     """
     __tablename__ = "pc"
+    # unique, so pcs can be created by INSERT ... ON CONFLICT without duplicates
+    __table_args__ = (UniqueConstraint("username", "hostname", name="uq_pc_username_hostname"),)
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, index=True, nullable=False)
@@ -172,6 +177,8 @@ class LDLog(Base):
     status = Column(String, index=True, nullable=False)
     head_id = Column(Integer, ForeignKey("head_devices.id"))
     body_id = Column(Integer, ForeignKey("body_devices.id"))
+    # unique id of the event (generated by the client), the same event is never stored twice
+    event_id = Column(String, unique=True, index=True, nullable=True)
 
     # relationships for foreign keys, thus connecting table with pc, head_devices and body_devices
     # tables
@@ -243,12 +243,21 @@ class USBTempBase(BaseModel):
     timestamp: str
     device: DeviceTemp
     status: str
+    event_id: Optional[str] = None
 
 
 class USBTempCreate(USBTempBase):
     pass
 
 
+class USBTempBatchResult(BaseModel):
+    """
+    Class used for responding to batches of keyman detecting client messages
+    """
+    created: int
+    duplicates: int = 0
+
+
 class USBTemp(USBTempBase):
     id: int
     device_id: int
@@ -267,6 +276,7 @@ class LDTempBase(BaseModel):
     head_device: HeadDeviceTemp
     body_device: BodyDeviceTemp
     status: str
+    event_id: Optional[str] = None
 
 
 class LDTempCreate(LDTempBase):
@@ -0,0 +1,464 @@
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from threading import Condition, Event, Lock, Thread
+
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+from . import ingest, schemas
+from .settings import settings
+
+try:
+    import fcntl
+except ImportError:
+    # spool files rely on flock, which is not available on Windows
+    fcntl = None
+
+# write-behind mode of /usb-logs endpoints is enabled by INGEST_WRITE_BEHIND=1
+WRITE_BEHIND_ENABLED = settings.ingest_write_behind
+
+# maximum number of logs waiting in queue, requests are rejected (503) when it is full
+QUEUE_SIZE = settings.ingest_queue_size
+
+# maximum number of logs saved in one transaction (group commit)
+BATCH_SIZE = settings.ingest_batch_size
+
+# maximum number of milliseconds the writer waits for a batch to fill up
+FLUSH_INTERVAL_MS = settings.ingest_flush_interval_ms
+
+# directory of spool files (queued logs survive a crash of the server), spooling is disabled if empty
+SPOOL_DIR = settings.ingest_spool_dir
+
+# whether the spool file is fsynced before a request is answered
+SPOOL_FSYNC = settings.ingest_spool_fsync
+
+# file logs rejected by the database are moved to (dead-letter.jsonl in spool directory if empty)
+DEAD_LETTER_FILE = settings.ingest_dead_letter_file or (os.path.join(SPOOL_DIR, "dead-letter.jsonl")
+                                                        if SPOOL_DIR else "")
+
+# maximum number of seconds between two attempts to save a batch when database fails
+MAX_RETRY_DELAY_SECONDS = 30
+
+# minimum number of bytes of saved logs at the head of spool file before the file is compacted
+SPOOL_COMPACT_BYTES = 1024 * 1024
+
+
+class Spool:
+    """
+    Append-only file of logs waiting in queue of one worker. Each line holds one log. Logs are saved in the order
+    they were appended, so saved logs always form the head of the file. The file is truncated once all logs
+    are saved, and rewritten without the head once the head makes up half of the file, so it does not grow
+    under steady load. Every worker has a file of its own which it keeps locked, so files left behind
+    by crashed workers can be recognized (they are not locked) and their logs queued again. Logs are saved
+    idempotently (by event id), so a log that is replayed after it has already been saved is skipped.
+    Appending requests share fsyncs (group fsync): a request waiting for an fsync in progress is covered
+    by the next one, which syncs lines of all requests appended in the meantime
+    """
+
+    def __init__(self, directory: str, fsync: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.path = os.path.join(directory, f"ingest-{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+        # the file is locked before it gets its name, so other workers never take it for an orphan
+        temp_path = os.path.join(directory, f".new-{os.path.basename(self.path)}")
+        self._file = _create_locked(temp_path)
+        os.rename(temp_path, self.path)
+        self._sizes = deque()   # sizes of lines of logs which are not saved yet
+        self._size = 0          # size of the file
+        self._saved_size = 0    # size of lines of saved logs at the head of the file
+        self._lock = Lock()     # guards the file and the sizes
+        self._appended = 0      # number of appends written to the file
+        self._synced = 0        # number of appends known to be fsynced
+        self._syncing = False   # whether an fsync is in progress
+        self._sync_condition = Condition()
+
+    def append(self, items: list, on_written=None):
+        """
+        Appends logs (pairs of log and parsed timestamp) to the file and waits until they are fsynced.
+        on_written is called right after the logs are written, before any other logs are, so logs
+        can be queued in the same order as they are in the file
+        """
+        lines = [_serialize(log, date) for log, date in items]
+        with self._lock:
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            self._sizes.extend(len(line) for line in lines)
+            self._size += sum(len(line) for line in lines)
+            self._appended += 1
+            sequence = self._appended
+            if on_written is not None:
+                on_written()
+        if self.fsync:
+            self._sync(sequence)
+
+    def _sync(self, sequence: int):
+        """
+        Waits until given append is fsynced. If no fsync is in progress, the file is fsynced by this thread,
+        otherwise the thread waits for the fsync in progress and for the next one if the first does not
+        cover the append
+        """
+        with self._sync_condition:
+            while self._syncing and self._synced < sequence:
+                self._sync_condition.wait()
+            if self._synced >= sequence:
+                return
+            self._syncing = True
+        synced = None
+        try:
+            with self._lock:
+                target = self._appended
+                # the descriptor is duplicated, so compaction can replace the file while it is fsynced
+                fd = os.dup(self._file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            synced = target
+        finally:
+            with self._sync_condition:
+                self._syncing = False
+                if synced is not None:
+                    self._synced = max(self._synced, synced)
+                self._sync_condition.notify_all()
+
+    def acknowledge(self, count: int):
+        """
+        Marks given number of logs at the head of the file as saved. The file is truncated if all its logs
+        are saved and compacted if saved logs make up most of it
+        """
+        with self._lock:
+            self._acknowledge(count)
+
+    def _acknowledge(self, count: int):
+        """
+        Marks given number of logs at the head of the file as saved (the lock is held)
+        """
+        for _ in range(min(count, len(self._sizes))):
+            self._saved_size += self._sizes.popleft()
+        if not self._sizes:
+            self._file.truncate(0)
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size = self._saved_size = 0
+        elif self._saved_size >= SPOOL_COMPACT_BYTES and self._saved_size * 2 >= self._size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Replaces the file by a new one holding only logs which are not saved yet. The new file is locked
+        before it replaces the old one, so other workers never see it unlocked
+        """
+        temp_path = os.path.join(self.directory, f".compact-{os.path.basename(self.path)}")
+        new_file = _create_locked(temp_path)
+        with open(self.path, "rb") as old_file:
+            old_file.seek(self._saved_size)
+            shutil.copyfileobj(old_file, new_file)
+        new_file.flush()
+        if self.fsync:
+            os.fsync(new_file.fileno())
+        os.replace(temp_path, self.path)
+        self._file.close()
+        self._file = new_file
+        self._size -= self._saved_size
+        self._saved_size = 0
+
+    def claim_orphans(self):
+        """
+        Returns logs of spool files left behind by workers that are no longer running. The logs are moved
+        into file of this worker and the orphaned files are removed
+        """
+        items = []
+        for path in glob.glob(os.path.join(self.directory, "ingest-*.jsonl")):
+            if path == self.path:
+                continue
+            try:
+                file = open(path, "rb")
+            except OSError:
+                continue
+            with file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # the file belongs to a running worker
+                    continue
+                orphaned = [item for item in (_deserialize(line) for line in file) if item is not None]
+                self.append(orphaned)
+                os.remove(path)
+            logging.info(f"{len(orphaned)} queued logs recovered from {path}")
+            items += orphaned
+        return items
+
+    def close(self):
+        """
+        Closes the file, the file is removed if it holds no logs
+        """
+        with self._lock:
+            empty = os.fstat(self._file.fileno()).st_size == 0
+            self._file.close()
+            if empty:
+                os.remove(self.path)
+
+
+def _create_locked(path: str):
+    """
+    Creates empty file opened for appending and locks it
+    """
+    file = open(path, "ab")
+    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    file.truncate(0)
+    return file
+
+
+def _serialize(log: schemas.USBTempBase, date: datetime):
+    """
+    Returns line of spool file holding given log
+    """
+    return json.dumps({"log": log.dict(), "date": date.isoformat()}).encode("utf-8") + b"\n"
+
+
+def _deserialize(line: bytes):
+    """
+    Returns log and parsed timestamp held by given line of spool file (None if the line is damaged)
+    """
+    try:
+        data = json.loads(line)
+        return schemas.USBTempBase(**data["log"]), datetime.fromisoformat(data["date"])
+    except (ValueError, KeyError, TypeError):
+        logging.warning(f"damaged line of spool file skipped: {line!r}")
+        return None
+
+
+class WriteBehindWriter:
+    """
+    Bounded in-process queue of validated logs and a background thread saving them in group commits.
+    The writer takes up to batch_size logs at once (waiting at most flush_interval_ms for the batch to fill up)
+    and saves them with multi-row inserts in one transaction (ingest.ingest_usb_logs), so a burst of
+    requests costs a few commits instead of one commit per request. When the queue is full, submit refuses
+    the logs, so the clients back off and send them again later. A batch rejected by the database is saved
+    log by log and logs rejected again are moved to dead letter file, so one invalid log cannot stop the writer
+    """
+
+    def __init__(self, session_maker, max_size: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 flush_interval_ms: float = FLUSH_INTERVAL_MS, spool: Spool = None, dead_letter_file: str = None):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_ms / 1000
+        self._session_maker = session_maker
+        self._spool = spool
+        self._dead_letter_file = dead_letter_file
+        self._pending = deque()
+        self._in_flight = 0
+        self._reserved = 0      # number of logs being spooled, they count towards the size of the queue
+        self._condition = Condition()
+        self._stopping = Event()
+        self._thread = None
+
+        self.queued = 0
+        self.rejected = 0
+        self.written = 0
+        self.duplicates = 0
+        self.flushes = 0
+        self.retries = 0
+        self.failures = 0
+
+    def start(self):
+        """
+        Starts the writer thread. Logs left in spool files of crashed workers are queued first
+        """
+        if self._spool is not None:
+            recovered = self._spool.claim_orphans()
+            with self._condition:
+                self._pending.extend(recovered)
+        self._thread = Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: list):
+        """
+        Queues logs (pairs of log and parsed timestamp). Either all logs are queued (and spooled) or none
+        of them. Returns False if there is not enough room in the queue. The room is reserved first, so
+        the logs are written to spool file and fsynced without holding the queue lock
+        """
+        with self._condition:
+            if len(self._pending) + self._reserved + len(items) > self.max_size or self._stopping.is_set():
+                self.rejected += len(items)
+                return False
+            self._reserved += len(items)
+
+        queued = False
+
+        def enqueue():
+            nonlocal queued
+            with self._condition:
+                self._reserved -= len(items)
+                self._pending.extend(items)
+                self.queued += len(items)
+                self._condition.notify()
+            queued = True
+
+        try:
+            if self._spool is not None:
+                self._spool.append(items, enqueue)
+            else:
+                enqueue()
+        finally:
+            if not queued:
+                with self._condition:
+                    self._reserved -= len(items)
+                    self._condition.notify()
+        return True
+
+    def stop(self, timeout: float = 10):
+        """
+        Saves logs left in queue and stops the writer thread. Logs that could not be saved stay in spool file
+        """
+        self._stopping.set()
+        with self._condition:
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning("write-behind writer did not stop in time, queued logs stay in spool file")
+                return
+        if self._spool is not None:
+            self._spool.close()
+
+    def stats(self):
+        """
+        Returns counters of the writer and current depth of the queue
+        """
+        with self._condition:
+            return {"depth": len(self._pending), "in_flight": self._in_flight, "max_size": self.max_size,
+                    "queued": self.queued, "rejected": self.rejected, "written": self.written,
+                    "duplicates": self.duplicates, "flushes": self.flushes, "retries": self.retries,
+                    "failures": self.failures}
+
+    def _run(self):
+        """
+        Saves batches of queued logs until the writer is stopped and the queue is empty (thread)
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            saved = self._write(batch)
+            with self._condition:
+                self._in_flight -= len(batch)
+            if not saved:
+                # the writer is stopping, the logs stay in spool file
+                return
+            if self._spool is not None:
+                self._spool.acknowledge(len(batch))
+
+    def _next_batch(self):
+        """
+        Waits for queued logs and returns up to batch_size of them (None if the writer is stopping
+        and the queue is empty and no logs are being spooled)
+        """
+        with self._condition:
+            while not self._pending:
+                if self._stopping.is_set() and not self._reserved:
+                    return None
+                self._condition.wait()
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(self._pending) < self.batch_size and not self._stopping.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._in_flight += len(batch)
+            return batch
+
+    def _write(self, batch: list):
+        """
+        Saves batch of logs. If the database rejects the batch, its logs are saved one by one and those
+        rejected again are moved to dead letter file. Returns False if the writer was stopped before
+        the batch could be saved
+        """
+        saved = self._save(batch)
+        if saved is None:
+            return False
+        if not saved:
+            if len(batch) == 1:
+                self._dead_letter(batch)
+                return True
+            for item in batch:
+                if not self._write([item]):
+                    return False
+        return True
+
+    def _save(self, batch: list):
+        """
+        Saves batch of logs in one transaction. Attempts failed because of unavailable database are repeated
+        (with growing delay). Returns True if the batch was saved, False if the database rejected it and None
+        if the writer was stopped before the batch could be saved
+        """
+        delay = 0.5
+        while True:
+            db = self._session_maker()
+            try:
+                created = ingest.ingest_usb_logs(db, [log for log, _ in batch], [date for _, date in batch])
+                with self._condition:
+                    self.written += created
+                    self.duplicates += len(batch) - created
+                    self.flushes += 1
+                return True
+            except Exception as error:
+                db.rollback()
+                if not _is_transient(error):
+                    logging.error(f"saving of {len(batch)} queued logs was rejected by database: {error}")
+                    return False
+                logging.exception(f"saving of {len(batch)} queued logs failed")
+                with self._condition:
+                    self.retries += 1
+            finally:
+                db.close()
+            if self._stopping.wait(delay):
+                return None
+            delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+
+    def _dead_letter(self, items: list):
+        """
+        Moves logs rejected by the database to dead letter file (they are logged if there is no such file)
+        """
+        with self._condition:
+            self.failures += len(items)
+        lines = b"".join(_serialize(log, date) for log, date in items)
+        if self._dead_letter_file:
+            try:
+                with open(self._dead_letter_file, "ab") as file:
+                    file.write(lines)
+                logging.error(f"{len(items)} logs rejected by database moved to {self._dead_letter_file}")
+                return
+            except OSError:
+                logging.exception(f"writing to dead letter file {self._dead_letter_file} failed")
+        logging.error(f"{len(items)} logs rejected by database dropped: {lines!r}")
+
+
+def _is_transient(error: Exception):
+    """
+    Returns True if saving of logs failed because the database is not available (the attempt should be
+    repeated), False if the database rejected the logs themselves
+    """
+    if isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def create_writer(session_maker):
+    """
+    Returns writer configured by environment variables (None if write-behind mode is disabled)
+    """
+    if not WRITE_BEHIND_ENABLED:
+        return None
+    if SPOOL_DIR and fcntl is None:
+        raise RuntimeError("INGEST_SPOOL_DIR is not supported on this platform (fcntl is not available)")
+    spool = Spool(SPOOL_DIR, SPOOL_FSYNC) if SPOOL_DIR else None
+    return WriteBehindWriter(session_maker, spool=spool, dead_letter_file=DEAD_LETTER_FILE or None)
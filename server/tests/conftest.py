@@ -0,0 +1,30 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The tests run against a temporary sqlite database. It has to be configured before sql_app is imported,
+# as the engines are created when the modules are imported.
+_directory = tempfile.mkdtemp(prefix="usb-api-tests-")
+for _name in ("DATABASE_ASYNC_URL", "DATABASE_REPLICA_URL", "DATABASE_REPLICA_ASYNC_URL", "INGEST_WRITE_BEHIND",
+              "INGEST_SPOOL_DIR", "INGEST_DEAD_LETTER_FILE"):
+    os.environ.pop(_name, None)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'test.db')}"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_directory, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    from sql_app import models
+    from sql_app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,61 @@
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from sql_app import database
+
+
+def _pool(connect_seconds=0.0, **kwargs):
+    def connect():
+        time.sleep(connect_seconds)
+        return sqlite3.connect(":memory:", check_same_thread=False)
+
+    pool = database.MeteredQueuePool(connect, **kwargs)
+    pool.metrics = database.PoolMetrics()
+    return pool
+
+
+def test_database_1():
+    # Opening a new connection is not waiting for the pool.
+    pool = _pool(connect_seconds=0.2, pool_size=1, max_overflow=0)
+    pool.connect().close()
+    pool.connect().close()
+
+    stats = pool.metrics.snapshot()
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 0
+    assert stats["wait_seconds_max"] < 0.1
+
+
+def test_database_2():
+    pool = _pool(pool_size=1, max_overflow=0, timeout=0.2)
+    connection = pool.connect()
+    threading.Timer(0.1, connection.close).start()
+
+    # The second checkout waits until the first connection is returned, the third one times out.
+    second = pool.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool.connect()
+    second.close()
+
+    stats = pool.metrics.snapshot()
+    assert stats["checkouts"] == 3
+    assert stats["timeouts"] == 1
+    assert 0.05 < stats["wait_seconds_total"] - stats["wait_seconds_max"] < 0.2
+    assert stats["wait_seconds_max"] >= 0.2
+
+
+def test_database_3():
+    # The asyncio driver is not needed until an async session is used.
+    code = "import sys; sys.modules['aiosqlite'] = sys.modules['asyncpg'] = None; import sql_app.database"
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    session = database.AsyncReadSessionLocal()
+    assert isinstance(session, AsyncSession)
+    assert "primary_async" in database._async_session_makers
@@ -0,0 +1,78 @@
+import uuid
+
+from sql_app import crud, ingest, schemas
+from sql_app.api.usb_logs import parse_timestamp
+from sql_app.identity_cache import DEVICE, PC, IdentityCache, identity_cache
+
+
+class ClockMock:
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+def test_identity_cache_1():
+    cache = IdentityCache(max_size=2, ttl_seconds=60, clock=ClockMock())
+
+    assert cache.get(DEVICE, "A") is None
+    cache.put(DEVICE, "A", 1)
+    cache.put(PC, ("user", "host"), 1)
+    assert cache.get(DEVICE, "A") == 1
+
+    # The least recently used entry is evicted.
+    cache.put(DEVICE, "B", 2)
+    assert cache.get(PC, ("user", "host")) is None
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 1, "size": 2, "max_size": 2}
+
+
+def test_identity_cache_2():
+    clock = ClockMock()
+    cache = IdentityCache(ttl_seconds=60, clock=clock)
+    cache.put(DEVICE, "A", 1)
+
+    clock.time = 59
+    assert cache.get(DEVICE, "A") == 1
+    clock.time = 60
+    assert cache.get(DEVICE, "A") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_identity_cache_3():
+    cache = IdentityCache(clock=ClockMock())
+    cache.put(DEVICE, "A", 1)
+    cache.put(DEVICE, "B", 2)
+    cache.put(PC, ("user", "host"), 1)
+
+    cache.invalidate(DEVICE, 1)
+    assert cache.get(DEVICE, "A") is None
+    assert cache.get(PC, ("user", "host")) == 1
+
+    cache.invalidate(DEVICE)
+    assert cache.get(DEVICE, "B") is None
+
+
+def _log(serial_number):
+    return schemas.USBTempBase(username="user", hostname="host", timestamp="2022-04-07T10:11:02+00:00",
+                               device={"vendor_id": "064F", "product_id": "2AF9", "serial_number": serial_number},
+                               status="connected", event_id=uuid.uuid4().hex)
+
+
+def test_identity_cache_4(db):
+    serial_number = uuid.uuid4().hex
+    date = parse_timestamp("2022-04-07T10:11:02+00:00")
+    ingest.ingest_usb_logs(db, [_log(serial_number)], [date])
+    device_id = identity_cache.get(DEVICE, serial_number)
+    assert device_id is not None
+
+    # The ids of the following logs of the same device and pc are taken from the cache.
+    hits = identity_cache.stats()["hits"]
+    assert ingest.ingest_usb_logs(db, [_log(serial_number)], [date]) == 1
+    assert identity_cache.stats()["hits"] == hits + 2
+
+    # A device changed from the web views is no longer cached.
+    team = crud.create_team(db, uuid.uuid4().hex)
+    crud.update_device(db, device_id, team.id)
+    assert identity_cache.get(DEVICE, serial_number) is None
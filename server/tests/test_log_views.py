@@ -0,0 +1,109 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sql_app import async_crud, models
+from sql_app.api.auth import auth
+from sql_app.api.ld_logs_web import ldlogs_web
+from sql_app.api.usb_logs_web import usblogs_web
+from sql_app.database import AsyncReadSessionLocal
+
+# directory the templates are looked up from
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.chdir(SERVER_DIR)
+    app = FastAPI()
+    app.include_router(auth)
+    app.include_router(usblogs_web)
+    app.include_router(ldlogs_web)
+    return TestClient(app)
+
+
+@pytest.fixture
+def usb_log(db):
+    suffix = uuid.uuid4().hex
+    team = models.Team(name=f"team-{suffix}")
+    device = models.Device(vendor_id="064F", product_id="2AF9", serial_number=f"serial-{suffix}", team=team)
+    license = models.License(name=f"license-{suffix}", license_id=suffix)
+    pc = models.PC(username=f"user-{suffix}", hostname=f"host-{suffix}")
+    log = models.USBLog(device=device, pc=pc, status="connected", event_id=suffix,
+                        timestamp=datetime(2022, 4, 7, 10, 11, 2, tzinfo=timezone.utc))
+    db.add_all([log, models.DeviceLicense(device_lic=device, licenses=license, assigned_datetime="2022-04-07")])
+    db.commit()
+    return log
+
+
+@pytest.fixture
+def ld_log(db):
+    suffix = uuid.uuid4().hex
+    team = models.Team(name=f"team-{suffix}")
+    license_type = models.LauterbachType(name=f"type-{suffix}")
+    head = models.HeadDevice(serial_number=f"head-{suffix}", team=team, hlicense_t=license_type)
+    body = models.BodyDevice(serial_number=f"body-{suffix}", team=team, blicense_t=license_type)
+    pc = models.PC(username=f"user-{suffix}", hostname=f"host-{suffix}")
+    log = models.LDLog(head_device=head, body_device=body, ldpc=pc, status="connected", event_id=suffix,
+                       timestamp=datetime(2022, 4, 7, 10, 11, 2, tzinfo=timezone.utc))
+    db.add(log)
+    db.commit()
+    return log
+
+
+def test_log_views_1(client, usb_log):
+    response = client.get("/logs-web")
+
+    assert response.status_code == 200
+    assert usb_log.pc.hostname in response.text
+    assert usb_log.device.serial_number in response.text
+    assert usb_log.device.team.name in response.text
+
+
+def test_log_views_2(client, ld_log):
+    response = client.get("/ldlogs-web")
+
+    assert response.status_code == 200
+    assert ld_log.ldpc.hostname in response.text
+    assert ld_log.head_device.serial_number in response.text
+    assert ld_log.body_device.serial_number in response.text
+
+
+def test_log_views_3(usb_log):
+    async def get_logs():
+        async with AsyncReadSessionLocal() as db:
+            logs = await async_crud.get_logs(db)
+            pcs = await async_crud.find_pcs(db, [usb_log.pc_id])
+        return logs, pcs
+
+    logs, pcs = asyncio.run(get_logs())
+
+    # Everything the templates read is loaded eagerly (async sessions cannot load it lazily).
+    log, = [log for log in logs if log.id == usb_log.id]
+    assert log.device.team.name == usb_log.device.team.name
+    assert [device_license.licenses.name for device_license in log.device.licenses] == \
+           [usb_log.device.licenses[0].licenses.name]
+    assert log.pc.hostname == usb_log.pc.hostname
+    assert [pc.id for pc in pcs] == [usb_log.pc_id]
+    assert [log.timestamp for log in logs] == sorted((log.timestamp for log in logs), reverse=True)
+
+
+def test_log_views_4(ld_log):
+    async def get_ld_logs():
+        async with AsyncReadSessionLocal() as db:
+            return await async_crud.get_ld_logs(db), await async_crud.get_teams(db), \
+                await async_crud.get_licenses(db)
+
+    logs, teams, licenses = asyncio.run(get_ld_logs())
+
+    log, = [log for log in logs if log.id == ld_log.id]
+    assert log.head_device.team.name == ld_log.head_device.team.name
+    assert log.head_device.hlicense_t.name == ld_log.head_device.hlicense_t.name
+    assert log.body_device.blicense_t.name == ld_log.body_device.blicense_t.name
+    assert log.ldpc.hostname == ld_log.ldpc.hostname
+    assert ld_log.head_device.team.name in [team.name for team in teams]
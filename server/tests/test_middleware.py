@@ -0,0 +1,82 @@
+import gzip
+import json
+import uuid
+import zlib
+from unittest import mock
+
+import msgpack
+import pytest
+import zstandard
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sql_app import middleware
+from sql_app.api.usb_logs import usblogs
+from sql_app.middleware import BodyDecodingMiddleware
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.add_middleware(BodyDecodingMiddleware)
+    app.include_router(usblogs)
+    return TestClient(app)
+
+
+def _logs():
+    return [{"username": "user", "hostname": "host", "timestamp": "2022-04-07T10:11:02+00:00",
+             "device": {"vendor_id": "064F", "product_id": "2AF9", "serial_number": uuid.uuid4().hex},
+             "status": "connected", "event_id": uuid.uuid4().hex} for _ in range(2)]
+
+
+def _post(client, body: bytes, content_type="application/json", content_encoding=None):
+    headers = {"content-type": content_type}
+    if content_encoding is not None:
+        headers["content-encoding"] = content_encoding
+    return client.post("/api/v1/usb-logs/batch", data=body, headers=headers)
+
+
+def test_middleware_1(client):
+    response = _post(client, gzip.compress(json.dumps(_logs()).encode()), content_encoding="gzip")
+
+    assert response.status_code == 200
+    assert response.json() == {"created": 2, "duplicates": 0}
+
+
+def test_middleware_2(client):
+    body = zstandard.ZstdCompressor().compress(json.dumps(_logs()).encode())
+    response = _post(client, body, content_encoding="zstd")
+
+    assert response.status_code == 200
+    assert response.json() == {"created": 2, "duplicates": 0}
+
+
+def test_middleware_3(client):
+    logs = _logs()
+    response = _post(client, msgpack.packb(logs), content_type="application/msgpack")
+    assert response.json() == {"created": 2, "duplicates": 0}
+
+    # msgpack may be compressed as well, it is decoded by the route after the middleware decompressed it
+    response = _post(client, zstandard.ZstdCompressor().compress(msgpack.packb(logs)),
+                     content_type="application/x-msgpack", content_encoding="zstd")
+    assert response.json() == {"created": 0, "duplicates": 2}
+
+
+def test_middleware_4(client):
+    response = _post(client, zlib.compress(json.dumps(_logs()).encode()), content_encoding="deflate")
+
+    assert response.status_code == 415
+
+
+def test_middleware_5(client):
+    assert _post(client, b"not gzip at all", content_encoding="gzip").status_code == 400
+    assert _post(client, b"not zstd at all", content_encoding="zstd").status_code == 400
+
+
+def test_middleware_6(client):
+    # a small body that decompresses into a huge one (decompression bomb)
+    body = gzip.compress(b" " * 2048)
+    with mock.patch.object(middleware, "MAX_DECODED_BODY_SIZE", 1024):
+        assert _post(client, body, content_encoding="gzip").status_code == 413
+        assert _post(client, zstandard.ZstdCompressor().compress(b" " * 2048),
+                     content_encoding="zstd").status_code == 413
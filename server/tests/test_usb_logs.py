@@ -0,0 +1,72 @@
+import uuid
+
+import msgpack
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sql_app import ingest, models, schemas
+from sql_app.api.usb_logs import parse_timestamp, usblogs
+from sql_app.middleware import BodyDecodingMiddleware
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(BodyDecodingMiddleware)
+    app.include_router(usblogs)
+    return TestClient(app)
+
+
+def _log(serial_number, event_id=None, status="connected"):
+    return {"username": "user", "hostname": "host", "timestamp": "2022-04-07T10:11:02.123+00:00",
+            "device": {"vendor_id": "064F", "product_id": "2AF9", "serial_number": serial_number},
+            "status": status, "event_id": event_id or uuid.uuid4().hex}
+
+
+def _count(db, event_ids):
+    return db.query(models.USBLog).filter(models.USBLog.event_id.in_(event_ids)).count()
+
+
+def test_usb_logs_1(client, db):
+    log = _log(uuid.uuid4().hex)
+
+    first = client.post("/api/v1/usb-logs", json=log)
+    # The same event sent again (e.g. after a lost response) is not saved twice.
+    second = client.post("/api/v1/usb-logs", json=log)
+
+    assert first.status_code == second.status_code == 200
+    assert first.json()["id"] == second.json()["id"]
+    assert _count(db, [log["event_id"]]) == 1
+
+
+def test_usb_logs_2(client, db):
+    serial_number = uuid.uuid4().hex
+    saved = _log(serial_number)
+    client.post("/api/v1/usb-logs", json=saved)
+    logs = [_log(serial_number, status="disconnected"), saved, _log(uuid.uuid4().hex)]
+
+    response = client.post("/api/v1/usb-logs/batch", json=logs + [logs[0]])
+    # Duplicates within the batch and events saved earlier are skipped.
+    assert response.json() == {"created": 2, "duplicates": 2}
+    assert _count(db, [log["event_id"] for log in logs]) == 3
+
+    response = client.post("/api/v1/usb-logs/batch", data=msgpack.packb(logs),
+                           headers={"content-type": "application/msgpack"})
+    assert response.json() == {"created": 0, "duplicates": 3}
+    assert db.query(models.Device).filter(models.Device.serial_number == serial_number).count() == 1
+
+
+def test_usb_logs_3(db):
+    log = schemas.USBTempBase(**_log(uuid.uuid4().hex))
+    date = parse_timestamp(log.timestamp)
+
+    # Logs without the id of the event get one made of their content.
+    assert ingest.ingest_usb_logs(db, [log, log.copy()], [date, date]) == 1
+    assert ingest.ingest_usb_logs(db, [log], [date]) == 0
+
+
+def test_usb_logs_4():
+    assert str(parse_timestamp("2022-04-07T12:11:02.123+02:00")) == "2022-04-07 10:11:02.123000+00:00"
+    assert str(parse_timestamp("2022-04-07T10:11:02Z")) == "2022-04-07 10:11:02+00:00"
+    assert parse_timestamp("2022-04-07 12:11:02").utcoffset().total_seconds() == 0
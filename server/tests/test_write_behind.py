@@ -0,0 +1,161 @@
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from sql_app import ingest, models, schemas, write_behind
+from sql_app.api.usb_logs import parse_timestamp
+from sql_app.database import SessionLocal
+
+pytest.importorskip("fcntl")
+
+
+def _item(serial_number=None):
+    log = schemas.USBTempBase(username="user", hostname="host", timestamp="2022-04-07T10:11:02+00:00",
+                              device={"vendor_id": "064F", "product_id": "2AF9",
+                                      "serial_number": serial_number or uuid.uuid4().hex},
+                              status="connected", event_id=uuid.uuid4().hex)
+    return log, parse_timestamp(log.timestamp)
+
+
+def _wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def _saved(db, items):
+    return db.query(models.USBLog).filter(models.USBLog.event_id.in_([log.event_id for log, _ in items])).count()
+
+
+def test_write_behind_1(tmp_path, db):
+    # Spool file left behind by a crashed worker (with a line it did not finish writing).
+    items = [_item(), _item()]
+    orphan = tmp_path / "ingest-1-dead.jsonl"
+    orphan.write_bytes(b"".join(write_behind._serialize(log, date) for log, date in items) + b'{"log": {"user')
+
+    writer = write_behind.WriteBehindWriter(SessionLocal, flush_interval_ms=0,
+                                            spool=write_behind.Spool(str(tmp_path), fsync=False))
+    writer.start()
+    _wait_until(lambda: writer.stats()["written"] == 2)
+    writer.stop()
+
+    assert _saved(db, items) == 2
+    # The orphaned file is removed and the file of the worker is removed once all its logs are saved.
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_behind_2(tmp_path):
+    running = write_behind.Spool(str(tmp_path), fsync=False)
+    running.append([_item()])
+
+    # The file of a running worker is locked, so it is not taken for an orphan.
+    spool = write_behind.Spool(str(tmp_path), fsync=False)
+    assert spool.claim_orphans() == []
+    assert os.path.getsize(running.path) > 0
+
+    running.close()
+    spool.close()
+
+
+def test_write_behind_3(tmp_path):
+    spool = write_behind.Spool(str(tmp_path), fsync=False)
+    items = [_item() for _ in range(4)]
+    spool.append(items)
+    line_size = os.path.getsize(spool.path) // 4
+
+    # Once the saved logs make up half of the file, the file is rewritten without them.
+    with mock.patch.object(write_behind, "SPOOL_COMPACT_BYTES", 1):
+        spool.acknowledge(1)
+        assert os.path.getsize(spool.path) == 4 * line_size
+        spool.acknowledge(1)
+        assert os.path.getsize(spool.path) == 2 * line_size
+        spool.append([_item()])
+        spool.acknowledge(3)
+    assert os.path.getsize(spool.path) == 0
+
+    spool.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_write_behind_4(tmp_path, db):
+    poison = _item("poison")
+    items = [_item(), poison, _item()]
+    ingest_usb_logs = ingest.ingest_usb_logs
+
+    def ingest_mock(session, logs, dates, use_cache=True):
+        if any(log.device.serial_number == "poison" for log in logs):
+            raise IntegrityError("INSERT", {}, Exception("rejected"))
+        return ingest_usb_logs(session, logs, dates, use_cache)
+
+    dead_letter_file = tmp_path / "dead-letter.jsonl"
+    writer = write_behind.WriteBehindWriter(SessionLocal, flush_interval_ms=50, dead_letter_file=str(dead_letter_file))
+    with mock.patch.object(ingest, "ingest_usb_logs", ingest_mock):
+        writer.start()
+        assert writer.submit(items)
+        _wait_until(lambda: writer.stats()["failures"] == 1)
+        writer.stop()
+
+    # The rejected log is moved aside and the rest of the batch is saved.
+    assert _saved(db, items) == 2
+    assert writer.stats()["written"] == 2
+    assert write_behind._deserialize(dead_letter_file.read_bytes())[0] == poison[0]
+
+
+def test_write_behind_5(db):
+    items = [_item()]
+    ingest_usb_logs = ingest.ingest_usb_logs
+    attempts = []
+
+    def ingest_mock(session, logs, dates, use_cache=True):
+        attempts.append(len(logs))
+        if len(attempts) == 1:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        return ingest_usb_logs(session, logs, dates, use_cache)
+
+    writer = write_behind.WriteBehindWriter(SessionLocal, flush_interval_ms=0)
+    with mock.patch.object(ingest, "ingest_usb_logs", ingest_mock):
+        writer.start()
+        assert writer.submit(items)
+        _wait_until(lambda: writer.stats()["written"] == 1)
+        writer.stop()
+
+    # The database was not available, so the same batch is saved again later (nothing is dead-lettered).
+    assert attempts == [1, 1]
+    assert writer.stats()["retries"] == 1
+    assert writer.stats()["failures"] == 0
+    assert _saved(db, items) == 1
+
+
+def test_write_behind_6(tmp_path, db):
+    fsync = os.fsync
+    fsyncs = []
+
+    def slow_fsync(fd):
+        fsyncs.append(fd)
+        time.sleep(0.05)
+        fsync(fd)
+
+    requests = [[_item()] for _ in range(16)]
+    writer = write_behind.WriteBehindWriter(SessionLocal, flush_interval_ms=0,
+                                            spool=write_behind.Spool(str(tmp_path), fsync=True))
+    with mock.patch.object(write_behind.os, "fsync", slow_fsync):
+        writer.start()
+        start = time.monotonic()
+        with ThreadPoolExecutor(len(requests)) as executor:
+            assert all(executor.map(writer.submit, requests))
+        elapsed = time.monotonic() - start
+        request_fsyncs = len(fsyncs)
+        _wait_until(lambda: writer.stats()["written"] == len(requests))
+        writer.stop()
+
+    # Concurrent requests share fsyncs instead of waiting for each other's fsync one by one.
+    assert elapsed < len(requests) * 0.05 / 2
+    assert request_fsyncs < len(requests)
+    assert _saved(db, [item for items in requests for item in items]) == len(requests)
+    assert os.listdir(tmp_path) == []